@@ -0,0 +1,84 @@
+"""
+Archive Writer - Saves generated images to disk in the background (write-behind)
+"""
+import os
+import queue
+import threading
+import config
+from storage_manager import StorageManager
+
+
+class ArchiveWriter:
+    def __init__(self, directory=None, enabled=None, on_error=None, storage=None):
+        self.directory = directory or config.GENERATED_DIR
+        self.storage = storage or StorageManager(self.directory)
+        self.enabled = config.ARCHIVE_GENERATED if enabled is None else enabled
+        self.on_error = on_error
+        self.queue = queue.Queue()
+        self.written = 0
+        self.failures = []
+        self.thread = None
+
+    def submit(self, data, filename):
+        """Queue encoded image bytes for archiving, returns the future file path
+
+        Never blocks on disk and never raises for storage problems - failures
+        are reported through on_error and recorded in self.failures.
+        """
+        if not self.enabled:
+            return None
+
+        self._ensure_thread()
+        filepath = self.storage.path_for(filename)
+        self.queue.put((data, filepath))
+        return filepath
+
+    def _ensure_thread(self):
+        """Start the writer thread on first use"""
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, name='archive-writer', daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        """Write queued images one at a time"""
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                data, filepath = item
+                self._write(data, filepath)
+            finally:
+                self.queue.task_done()
+
+    def _write(self, data, filepath):
+        """Write one file, reporting instead of raising on failure"""
+        try:
+            # Compaction must not remove the shard or count the .tmp file mid-write
+            with self.storage.lock:
+                os.makedirs(os.path.dirname(filepath), exist_ok=True)
+                tmp_path = filepath + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, filepath)
+            self.written += 1
+        except OSError as e:
+            print(f"⚠️ Archive write failed for {filepath}: {e}")
+            self.failures.append((filepath, str(e)))
+            if self.on_error:
+                try:
+                    self.on_error(filepath, e)
+                except Exception as callback_error:
+                    print(f"Error in archive error callback: {callback_error}")
+
+    def flush(self):
+        """Block until every queued image has been written"""
+        if self.thread is not None:
+            self.queue.join()
+
+    def close(self):
+        """Finish pending writes and stop the writer thread"""
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        self.thread = None
@@ -0,0 +1,142 @@
+"""
+Batch Generation - Submits the scheduled daily generation as a Message Batch
+
+The 13:00 job isn't interactive, so its request goes out BATCH_LEAD_MINUTES
+early through the (cheaper, asynchronous) Message Batches API. At delivery
+time the batch is polled with backoff; if it hasn't finished by the deadline
+it is cancelled and the caller falls back to the live path.
+
+Collected variants go through the same validation, duplicate check and
+outcome metrics as a live call; the ones that don't make it are requested
+again live, so the day still gets the full count.
+
+The pending batch (with the picked specs) is kept in config.BATCH_STATE_FILE so a restart between
+submission and delivery doesn't lose it.
+"""
+import asyncio
+import json
+import os
+import time
+import config
+
+CUSTOM_ID = 'daily'
+# Batches expire after 24 hours, so an older pending batch can't be collected
+BATCH_MAX_AGE = 24 * 60 * 60
+
+
+class BatchGenerator:
+    def __init__(self, creator, state_file=None, client=None):
+        self.creator = creator
+        self.state_file = state_file or config.BATCH_STATE_FILE
+        self._client = client
+
+    @property
+    def batches(self):
+        """messages.batches of the async client (the creator's shared one by default)"""
+        client = self._client or self.creator.async_client
+        return client.messages.batches
+
+    def _load_state(self):
+        """The pending batch, or None"""
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if time.time() - state.get('submitted_at', 0) > BATCH_MAX_AGE:
+            return None  # Left over from a day that was never delivered
+        return state
+
+    def _save_state(self, state):
+        os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+        with open(self.state_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+
+    def _clear_state(self):
+        try:
+            os.remove(self.state_file)
+        except FileNotFoundError:
+            pass
+
+    def pending(self):
+        """ID of the submitted, not yet collected batch, if any"""
+        state = self._load_state()
+        return state['batch_id'] if state else None
+
+    async def submit(self, count, news_context=None):
+        """Submit today's generation request as a batch, returns the batch ID"""
+        specs = self.creator.pick_variants(count)
+        request = self.creator._generation_request(count, news_context, specs)
+        batch = await self.batches.create(requests=[{'custom_id': CUSTOM_ID, 'params': request}])
+        self._save_state({
+            'batch_id': batch.id,
+            'submitted_at': time.time(),
+            'specs': specs,
+            'news_context': news_context
+        })
+        return batch.id
+
+    async def _wait_until_ended(self, batch_id, deadline):
+        """Poll with exponential backoff until the batch ends, False if the deadline passes first"""
+        delay = config.BATCH_POLL_INITIAL
+        while True:
+            batch = await self.batches.retrieve(batch_id)
+            if batch.processing_status == 'ended':
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, config.BATCH_POLL_MAX)
+
+    async def collect(self, timeout=None):
+        """Variants from the pending batch, or [] if there is none or it missed the deadline
+
+        Waits up to timeout seconds (BATCH_DEADLINE_MINUTES by default) for an
+        unfinished batch. A batch that misses it is cancelled. Variants that
+        came back malformed, repeated or missing are generated again live.
+        """
+        state = self._load_state()
+        if state is None:
+            return []
+
+        batch_id = state['batch_id']
+        specs = state['specs']
+        timeout = config.BATCH_DEADLINE_MINUTES * 60 if timeout is None else timeout
+        try:
+            if not await self._wait_until_ended(batch_id, time.monotonic() + timeout):
+                print(f"Batch {batch_id} missed its deadline, cancelling")
+                await self.batches.cancel(batch_id)
+                return []
+
+            variants = None
+            async for entry in await self.batches.results(batch_id):
+                if entry.custom_id != CUSTOM_ID:
+                    continue
+                if entry.result.type != 'succeeded':
+                    print(f"Batch {batch_id} request {entry.result.type}")
+                    continue
+                message = entry.result.message
+                variants, outcome = self.creator._salvage(message, len(specs))
+                self.creator.metrics.record(
+                    'batch', getattr(message, 'usage', None),
+                    (time.time() - state['submitted_at']) * 1000, getattr(message, 'model', None), **outcome
+                )
+            if variants is None:
+                return []
+
+            missing = [idx for idx, variant in enumerate(variants) if variant is None]
+            if missing:
+                print(f"Batch {batch_id}: {len(missing)} variants unusable, generating them live")
+                pairs = await self.creator.agenerate_pairs(
+                    [specs[idx] for idx in missing], state['news_context'], first_attempt=1
+                )
+                for idx, (_, variant) in zip(missing, pairs):
+                    variants[idx] = variant
+            return [variant for variant in variants if variant is not None]
+
+        except Exception as e:
+            print(f"Error collecting batch {batch_id}: {e}")
+            return []
+        finally:
+            self._clear_state()
@@ -0,0 +1,293 @@
+"""
+Renderer benchmark - times every DesignGenerator style per stage and resolution
+
+Runs offline (no API keys needed):
+    python benchmark.py                                  # print JSON results
+    python benchmark.py --output bench.json              # save results
+    python benchmark.py --compare bench.json             # fail if a stage regressed
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+import config
+from design_generator import DesignGenerator
+from image_encoder import ImageEncoder
+
+STAGES = ['background', 'layout', 'text', 'branding', 'encode']
+
+DEFAULT_RESOLUTIONS = ['1080x1920', '720x1280', '540x960']
+
+# Fixed Georgian content so runs are comparable
+FIXTURES = [
+    {
+        'format': 'myth_vs_reality',
+        'title': 'მითი VS რეალობა',
+        'main_text': 'მითი: ბავშვი ტირილით გამოგცდის.\nრეალობა: ტირილი მისი ენაა - ის გეუბნება, რომ რაღაც სჭირდება.\nმოუსმინე და დაარქვი გრძნობას სახელი.'
+    },
+    {
+        'format': 'quick_tip',
+        'title': 'ერთი წუთის წესი',
+        'main_text': 'სანამ ბავშვს რამეს მოსთხოვ, ერთი წუთით ჩაერთე მის თამაშში. თანამშრომლობა გაცილებით მარტივი ხდება, როცა ის გრძნობს, რომ დაინახე.'
+    },
+    {
+        'format': 'self_assessment',
+        'title': 'რამდენად გისმენს შენი შვილი?',
+        'main_text': 'რამდენჯერ იმეორებ ერთსა და იმავე თხოვნას? ხმას უწევ თუ ჩაიმუხლები და თვალებში უყურებ? შენი პასუხი ბევრს ამბობს.'
+    }
+]
+
+
+class StageTimer:
+    """Collects seconds per stage for the render in progress"""
+
+    def __init__(self):
+        self.totals = {}
+
+    def start(self, stage):
+        pass
+
+    def record(self, stage, seconds):
+        self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+
+    def reset(self):
+        self.totals = {}
+
+
+def _status_kb(field):
+    """Read a memory field (VmRSS, VmHWM) of this process from /proc, in KB"""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    raise KeyError(field)
+
+
+def _reset_peak():
+    """Reset this process's RSS high-water mark (VmHWM) to its current RSS"""
+    with open('/proc/self/clear_refs', 'w') as f:
+        f.write('5')
+
+
+class StagePeaks:
+    """Collects peak memory per stage (KB above the RSS when the stage began)
+
+    The high-water mark is reset when a stage starts; a nested stage folds
+    its peak into the enclosing one before resetting. Linux /proc only.
+    """
+
+    def __init__(self):
+        self.peaks = {}
+        self.open = []  # [start RSS, highest HWM seen] per stage in progress
+
+    def start(self, stage):
+        if self.open:
+            self.open[-1][1] = max(self.open[-1][1], _status_kb('VmHWM'))
+        _reset_peak()
+        self.open.append([_status_kb('VmRSS'), 0])
+
+    def record(self, stage, seconds):
+        start, highest = self.open.pop()
+        highest = max(highest, _status_kb('VmHWM'))
+        if self.open:
+            self.open[-1][1] = max(self.open[-1][1], highest)
+        self.peaks[stage] = max(self.peaks.get(stage, 0), highest - start)
+
+
+def _measure_render(width, height, style, conn):
+    """Child process body for render_peak_kb"""
+    generator = DesignGenerator(width=width, height=height, scale=width / config.IMAGE_WIDTH)
+    encoder = ImageEncoder()
+    # Warm render fills the layer and font caches, which are not per-render cost
+    encoder.encode(generator.generate_image(FIXTURES[0], style), style)
+
+    # Measure one steady-state render + encode, the whole of it and per stage
+    peaks = StagePeaks()
+    generator.profiler = peaks
+    peaks.start('render')
+    img = generator.generate_image(FIXTURES[0], style)
+    peaks.start('encode')
+    encoder.encode(img, style)
+    peaks.record('encode', 0)
+    peaks.record('render', 0)
+    total = peaks.peaks.pop('render')
+    conn.send((total, peaks.peaks))
+    conn.close()
+
+
+def render_peak_kb(width, height, style):
+    """Peak memory one render + encode allocates on top of a warm renderer (KB)
+
+    Returns (total, {stage: peak}). Runs in a fresh process so other renders
+    don't skew the high-water mark. glibc is told to mmap large buffers so
+    freed memory is returned rather than silently reused. Needs Linux /proc;
+    returns (None, None) elsewhere.
+    """
+    if not os.path.exists('/proc/self/clear_refs'):
+        return None, None
+
+    ctx = multiprocessing.get_context('spawn')
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_measure_render, args=(width, height, style, child_conn))
+
+    previous = os.environ.get('MALLOC_MMAP_THRESHOLD_')
+    os.environ['MALLOC_MMAP_THRESHOLD_'] = '131072'
+    try:
+        process.start()
+    finally:
+        if previous is None:
+            del os.environ['MALLOC_MMAP_THRESHOLD_']
+        else:
+            os.environ['MALLOC_MMAP_THRESHOLD_'] = previous
+    child_conn.close()
+
+    try:
+        return parent_conn.recv()
+    except (EOFError, OSError):
+        return None, None
+    finally:
+        process.join()
+
+
+def parse_resolution(value):
+    """'1080x1920' -> (1080, 1920)"""
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def bench_style(generator, encoder, timer, style, repeat):
+    """Render every fixture repeat times, returns averaged per-stage numbers"""
+    stage_sums = {stage: 0.0 for stage in STAGES}
+    total = 0.0
+    encoded_bytes = 0
+    renders = 0
+
+    for _ in range(repeat):
+        for content in FIXTURES:
+            timer.reset()
+            start = time.perf_counter()
+            img = generator.generate_image(content, style)
+
+            timer.start('encode')
+            encode_start = time.perf_counter()
+            encoded = encoder.encode(img, style)
+            timer.record('encode', time.perf_counter() - encode_start)
+            total += time.perf_counter() - start
+
+            for stage in STAGES:
+                stage_sums[stage] += timer.totals.get(stage, 0.0)
+            encoded_bytes += encoded.size
+            renders += 1
+
+    return {
+        'stages_ms': {stage: round(stage_sums[stage] / renders * 1000, 3) for stage in STAGES},
+        'total_ms': round(total / renders * 1000, 3),
+        'encoded_kb': round(encoded_bytes / renders / 1024, 1),
+        'format': encoded.format
+    }
+
+
+def run_benchmark(resolutions=None, styles=None, repeat=3):
+    """Benchmark styles at each resolution, returns a JSON-serializable dict"""
+    resolutions = resolutions or DEFAULT_RESOLUTIONS
+    styles = styles or list(config.VISUAL_STYLE_DISTRIBUTION.keys())
+    results = {}
+
+    for resolution in resolutions:
+        width, height = parse_resolution(resolution)
+        generator = DesignGenerator(width=width, height=height, scale=width / config.IMAGE_WIDTH)
+        encoder = ImageEncoder()
+        timer = StageTimer()
+        generator.profiler = timer
+
+        results[resolution] = {}
+        for style in styles:
+            # First render fills the layer cache; measure it separately
+            timer.reset()
+            start = time.perf_counter()
+            generator.generate_image(FIXTURES[0], style)
+            cold_ms = round((time.perf_counter() - start) * 1000, 3)
+
+            entry = bench_style(generator, encoder, timer, style, repeat)
+            entry['cold_ms'] = cold_ms
+            entry['render_peak_kb'], entry['stages_peak_kb'] = render_peak_kb(width, height, style)
+            results[resolution][style] = entry
+
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'repeat': repeat,
+        'results': results
+    }
+
+
+def compare(current, baseline, threshold=0.25, min_delta_ms=2.0):
+    """List stages that got slower than baseline by more than threshold
+
+    Differences below min_delta_ms are treated as noise.
+    """
+    regressions = []
+    for resolution, styles in current['results'].items():
+        for style, entry in styles.items():
+            base_entry = baseline.get('results', {}).get(resolution, {}).get(style)
+            if not base_entry:
+                continue
+            checks = dict(entry['stages_ms'], total=entry['total_ms'])
+            base_checks = dict(base_entry['stages_ms'], total=base_entry['total_ms'])
+            for stage, value in checks.items():
+                base_value = base_checks.get(stage)
+                if base_value is None:
+                    continue
+                if value - base_value > min_delta_ms and value > base_value * (1 + threshold):
+                    regressions.append({
+                        'resolution': resolution,
+                        'style': style,
+                        'stage': stage,
+                        'baseline_ms': base_value,
+                        'current_ms': value
+                    })
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark DesignGenerator styles')
+    parser.add_argument('--resolutions', nargs='+', default=DEFAULT_RESOLUTIONS,
+                        help='WIDTHxHEIGHT values, e.g. 1080x1920 540x960')
+    parser.add_argument('--styles', nargs='+', help='Styles to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='Renders per fixture')
+    parser.add_argument('--output', help='Write JSON results to this file')
+    parser.add_argument('--compare', help='Baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed slowdown per stage (0.25 = 25%%)')
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.resolutions, args.styles, args.repeat)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for r in regressions:
+            print(f"❌ {r['resolution']} {r['style']} {r['stage']}: "
+                  f"{r['baseline_ms']} ms -> {r['current_ms']} ms", file=sys.stderr)
+        if regressions:
+            return 1
+        print("✅ No stage regressed past the threshold", file=sys.stderr)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
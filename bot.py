@@ -6,7 +6,7 @@ import os
 import json
 from datetime import datetime
 import pytz
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ContextTypes
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from aiohttp import web
@@ -14,15 +14,40 @@ import asyncio
 
 import config
 from content_creator import ContentCreator
-from design_generator import DesignGenerator
 from news_tracker import NewsTracker
+from archive_writer import ArchiveWriter
+from storage_manager import StorageManager
+from render_service import RenderService, RenderQueueFull
+from render_spec import encode_spec, decode_spec
+from carousel_renderer import wants_carousel
+from batch_generation import BatchGenerator
+from variant_pool import VariantPool
+
+# Telegram limit for one send_media_group call
+ALBUM_MAX_ITEMS = 10
+
+
+async def iterate_variants(variants):
+    """Iterate a list or an async stream of variants the same way"""
+    if hasattr(variants, '__aiter__'):
+        async for variant in variants:
+            yield variant
+    else:
+        for variant in variants:
+            yield variant
+
 
 class ParentingBot:
     def __init__(self):
         self.content_creator = ContentCreator()
-        self.design_generator = DesignGenerator()
+        self.batch_generator = BatchGenerator(self.content_creator)
+        self.render_service = RenderService()
+        self.storage_manager = StorageManager()
+        self.archive_writer = ArchiveWriter(storage=self.storage_manager)
+        self.variant_pool = VariantPool(self.content_creator, self.render_service, is_busy=self._is_busy)
         self.news_tracker = NewsTracker()
         self.current_variants = {}
+        self.generation_tasks = {}  # chat_id -> task running /generate for that chat
         self.scheduler = None
         self.load_stats()
     
@@ -76,12 +101,30 @@ class ParentingBot:
     
     async def generate_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /generate command"""
+        chat_id = update.effective_chat.id
+        
+        # A new /generate replaces the one still running for this chat
+        previous = self.generation_tasks.get(chat_id)
+        if previous is not None and not previous.done():
+            previous.cancel()
+            await update.message.reply_text("⏹ წინა გენერაცია გაუქმდა")
+        task = asyncio.current_task()
+        self.generation_tasks[chat_id] = task
+        
         await update.message.reply_text("⏳ ვგენერირებ კონტენტს... გთხოვ დაელოდე 30-60 წამს...")
         
         try:
-            await self._generate_and_send(update.effective_chat.id, context)
+            await self._generate_and_send(chat_id, context)
+        except asyncio.CancelledError:
+            if self.generation_tasks.get(chat_id) is task:
+                raise  # Not cancelled by a newer /generate
+        except RenderQueueFull:
+            await update.message.reply_text("⏳ ბევრი სურათი მუშავდება ერთდროულად. სცადე ცოტა ხანში /generate")
         except Exception as e:
             await update.message.reply_text(f"❌ შეცდომა: {str(e)}\nსცადე თავიდან /generate")
+        finally:
+            if self.generation_tasks.get(chat_id) is task:
+                del self.generation_tasks[chat_id]
     
     async def scheduled_generation(self, context: ContextTypes.DEFAULT_TYPE):
         """Scheduled daily content generation"""
@@ -96,97 +139,392 @@ class ParentingBot:
         await context.bot.send_message(chat_id=chat_id, text=greeting)
         
         try:
-            await self._generate_and_send(chat_id, context)
+            # Use the batch submitted earlier; a missing or late batch falls back to a live call
+            variants = None
+            if config.BATCH_GENERATION:
+                variants = await self.batch_generator.collect() or None
+                if variants is None:
+                    print("Batch generation unavailable, generating live")
+            await self._generate_and_send(chat_id, context, variants)
         except Exception as e:
             await context.bot.send_message(
                 chat_id=chat_id, 
                 text=f"❌ შეცდომა გენერაციისას: {str(e)}"
             )
     
-    async def _generate_and_send(self, chat_id, context):
-        """Generate content and send to user"""
-        # Check if we should include news
-        news_context = None
+    async def submit_scheduled_batch(self):
+        """Submit the daily generation as a message batch ahead of GENERATION_HOUR"""
+        if self.batch_generator.pending():
+            return
+        try:
+            batch_id = await self.batch_generator.submit(config.get_variants_count(), await self._news_context())
+            print(f"📦 Daily generation submitted as batch {batch_id}")
+        except Exception as e:
+            print(f"Error submitting generation batch: {e}")
+    
+    async def _news_context(self):
+        """Formatted recent news on news days, otherwise None"""
         if self.news_tracker.should_check_news_today():
-            news_list = self.news_tracker.check_news()
+            news_list = await asyncio.to_thread(self.news_tracker.check_news)
             if news_list:
-                news_context = self.news_tracker.format_news_context(news_list)
+                return self.news_tracker.format_news_context(news_list)
+        return None
+    
+    async def _generate_and_send(self, chat_id, context, variants=None):
+        """Generate content (unless variants are given) and send to user"""
+        # Generate content: streamed variants are rendered while the model writes the rest
+        if variants is None:
+            variants_count = config.get_variants_count()
+            news_context = await self._news_context()
+            # Pooled variants were written without news, so news days always go to the model
+            if config.VARIANT_POOL and news_context is None:
+                variants = self.variant_pool.take(variants_count) or None
+            if variants is None and config.FANOUT_GENERATION:
+                # Parallel requests, variants arrive in the order they finish
+                variants = self.content_creator.afanout_content_ideas(
+                    count=variants_count,
+                    news_context=news_context
+                )
+            elif variants is None and config.STREAM_GENERATION:
+                variants = self.content_creator.astream_content_ideas(
+                    count=variants_count,
+                    news_context=news_context
+                )
+            elif variants is None:
+                variants = await self.content_creator.agenerate_content_ideas(
+                    count=variants_count,
+                    news_context=news_context
+                )
         
-        # Generate content
-        variants_count = config.get_variants_count()
-        variants = self.content_creator.generate_content_ideas(
-            count=variants_count,
-            news_context=news_context
-        )
+        # Generate images and send
+        session_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.current_variants[chat_id] = {}
         
-        if not variants:
+        # Previews are rendered small; the full image waits for ❤️/👍 or a download
+        scale = config.PREVIEW_SCALE if config.PREVIEW_MODE else 1.0
+        
+        if config.ALBUM_DELIVERY:
+            received = await self._send_album(chat_id, context, variants, session_id, scale)
+        else:
+            received = await self._send_variants_individually(chat_id, context, variants, session_id, scale)
+        
+        if not received:
             await context.bot.send_message(
                 chat_id=chat_id,
                 text="❌ ვერ მოხერხდა კონტენტის გენერაცია. სცადე თავიდან."
             )
             return
         
-        # Generate images and send
-        session_id = datetime.now().strftime('%Y%m%d_%H%M%S')
-        self.current_variants[chat_id] = {}
+        self.save_stats()
+    
+    async def _send_variants_individually(self, chat_id, context, variants, session_id, scale=1.0):
+        """Send each variant as its own photo with its own keyboard, returns variants received
         
+        Every variant starts rendering as soon as it arrives; photos go out in
+        variant order.
+        """
         header = f"""
 📅 {datetime.now().strftime('%d.%m.%Y')} | დღევანდელი კონტენტი
 ━━━━━━━━━━━━━━━━━━━━━━━━━━
         """
-        await context.bot.send_message(chat_id=chat_id, text=header)
+        preview = scale < 1.0
+        renders = asyncio.Queue()
+        
+        async def send_in_order():
+            header_sent = False
+            while True:
+                item = await renders.get()
+                if item is None:
+                    return
+                if not header_sent:
+                    await context.bot.send_message(chat_id=chat_id, text=header)
+                    header_sent = True
+                await self._send_rendered_variant(chat_id, context, session_id, preview, *item)
+        
+        sender = asyncio.ensure_future(send_in_order())
+        received = 0
+        try:
+            async for variant in iterate_variants(variants):
+                received += 1
+                if wants_carousel(variant):
+                    task = asyncio.ensure_future(self._render_carousel(variant))
+                else:
+                    task = asyncio.ensure_future(self._render_variant(variant, scale))
+                renders.put_nowait((received, variant, task))
+        except BaseException:
+            sender.cancel()
+            raise
+        renders.put_nowait(None)
+        await sender
+        
+        if received:
+            footer = """
+━━━━━━━━━━━━━━━━━━━━━━━━━━
+რომელი მოგწონს? შეაფასე ღილაკებით! 
+        """
+            await context.bot.send_message(chat_id=chat_id, text=footer)
+        return received
+    
+    async def _send_rendered_variant(self, chat_id, context, session_id, preview, idx, variant, render_task):
+        """Wait for one variant's render and send it as a photo (or a carousel) with its keyboard"""
+        try:
+            result = await render_task
+            if wants_carousel(variant):
+                message = await self._send_carousel(chat_id, context, idx, variant, result)
+                self._store_variant(chat_id, idx, variant, result[0], session_id)
+                self._archive_extra_slides(result, f"{session_id}_variant_{idx}")
+                self.current_variants[chat_id][idx]['message_id'] = message.message_id
+                return
+            
+            # Prepare caption
+            caption = self._format_variant_caption(variant, idx)
+            
+            # Create keyboard
+            keyboard = self._create_variant_keyboard(idx, preview=preview)
+            
+            # Send photo
+            message = await context.bot.send_photo(
+                chat_id=chat_id,
+                photo=result.data,
+                caption=caption,
+                reply_markup=keyboard,
+                parse_mode='HTML'
+            )
+            
+            self._store_variant(chat_id, idx, variant, result, session_id, preview=preview)
+            self.current_variants[chat_id][idx]['message_id'] = message.message_id
+            
+        except Exception as e:
+            print(f"Error generating variant {idx}: {e}")
+            await context.bot.send_message(
+                chat_id=chat_id,
+                text=f"❌ ვარიანტი {idx} - შეცდომა გენერაციისას"
+            )
+    
+    async def _send_album(self, chat_id, context, variants, session_id, scale=1.0):
+        """Render variants concurrently and deliver them as one album plus one keyboard message
+        
+        Returns the number of variants received. Renders start as variants arrive.
+        Carousels can't go inside an album; they follow it as their own messages.
+        """
+        preview = scale < 1.0
+        
+        async def render_variant(idx, variant):
+            return idx, variant, await self._render_variant(variant, scale)
         
-        for idx, variant in enumerate(variants, 1):
+        pending = []
+        expected = []
+        carousels = []
+        received = 0
+        try:
+            async for variant in iterate_variants(variants):
+                received += 1
+                if wants_carousel(variant):
+                    carousels.append((received, variant, asyncio.ensure_future(self._render_carousel(variant))))
+                else:
+                    expected.append(received)
+                    pending.append(asyncio.ensure_future(render_variant(received, variant)))
+        except BaseException:
+            for future in pending + [task for _, _, task in carousels]:
+                future.cancel()
+            raise
+        
+        # Add each variant to the album as soon as its render is ready
+        album = {}
+        for future in asyncio.as_completed(pending):
             try:
-                # Generate image
-                img = self.design_generator.generate_image(variant)
-                
-                filename = f"{session_id}_variant_{idx}.png"
-                filepath = self.design_generator.save_image(img, filename)
-                
-                # Prepare caption
-                caption = self._format_variant_caption(variant, idx)
-                
-                # Create keyboard
-                keyboard = self._create_variant_keyboard(idx)
-                
-                # Send photo
-                with open(filepath, 'rb') as photo:
-                    await context.bot.send_photo(
-                        chat_id=chat_id,
-                        photo=photo,
-                        caption=caption,
-                        reply_markup=keyboard,
-                        parse_mode='HTML'
-                    )
-                
-                # Store variant for later reference
-                self.current_variants[chat_id][idx] = {
-                    'content': variant,
-                    'filepath': filepath,
-                    'session_id': session_id
-                }
-                
-                # Update stats
-                self.stats['total_generated'] += 1
-                format_type = variant.get('format', 'unknown')
-                self.stats['by_format'][format_type] = \
-                    self.stats['by_format'].get(format_type, 0) + 1
-                
+                idx, variant, result = await future
             except Exception as e:
-                print(f"Error generating variant {idx}: {e}")
-                await context.bot.send_message(
+                print(f"Error generating album variant: {e}")
+                continue
+            self._store_variant(chat_id, idx, variant, result, session_id, album=True, preview=preview)
+            album[idx] = InputMediaPhoto(
+                media=result.data,
+                caption=self._format_variant_caption(variant, idx),
+                parse_mode='HTML'
+            )
+        
+        failed = [idx for idx in expected if idx not in album]
+        indices = sorted(album)
+        
+        if len(indices) == 1:
+            # Telegram albums need at least two items
+            idx = indices[0]
+            message = await context.bot.send_photo(
+                chat_id=chat_id,
+                photo=album[idx].media,
+                caption=album[idx].caption,
+                reply_markup=self._create_variant_keyboard(idx, preview=preview),
+                parse_mode='HTML'
+            )
+            self.current_variants[chat_id][idx]['message_id'] = message.message_id
+            self.current_variants[chat_id][idx]['album'] = False
+        elif indices:
+            # Album order follows variant numbers, whatever order renders finished in
+            for chunk_start in range(0, len(indices), ALBUM_MAX_ITEMS):
+                chunk = indices[chunk_start:chunk_start + ALBUM_MAX_ITEMS]
+                messages = await context.bot.send_media_group(
                     chat_id=chat_id,
-                    text=f"❌ ვარიანტი {idx} - შეცდომა გენერაციისას"
+                    media=[album[idx] for idx in chunk]
                 )
+                for idx, message in zip(chunk, messages):
+                    self.current_variants[chat_id][idx]['message_id'] = message.message_id
         
-        self.save_stats()
+        summary = f"📅 {datetime.now().strftime('%d.%m.%Y')} | დღევანდელი კონტენტი"
+        if failed:
+            summary += "\n❌ შეცდომა გენერაციისას: " + ", ".join(str(idx) for idx in failed)
         
-        footer = """
-━━━━━━━━━━━━━━━━━━━━━━━━━━
-რომელი მოგწონს? შეაფასე ღილაკებით! 
+        if len(indices) > 1:
+            summary += "\n\nრომელი მოგწონს? შეაფასე ღილაკებით!"
+            await context.bot.send_message(
+                chat_id=chat_id,
+                text=summary,
+                reply_markup=self._create_album_keyboard(chat_id)
+            )
+        elif failed:
+            await context.bot.send_message(chat_id=chat_id, text=summary)
+        
+        for item in carousels:
+            await self._send_rendered_variant(chat_id, context, session_id, False, *item)
+        return received
+    
+    async def _render_variant(self, variant, scale=1.0):
+        """Render a variant, variants taken from the pool come already rendered"""
+        result = self.variant_pool.prerendered(variant, scale)
+        if result is not None:
+            return result
+        return await self.render_service.render(variant, scale=scale)
+    
+    async def _render_carousel(self, variant, style=None):
+        """Render a carousel variant at full size: its slides, or one animated post"""
+        if config.CAROUSEL_DELIVERY == 'animation':
+            return [await self.render_service.render_animation(variant, style)]
+        return await self.render_service.render_carousel(
+            variant, style, max_slides=min(config.CAROUSEL_MAX_SLIDES, ALBUM_MAX_ITEMS)
+        )
+    
+    async def _send_carousel(self, chat_id, context, idx, variant, results, heading=None):
+        """Send a carousel: slides as one media group plus a keyboard message, or one animated post
+        
+        Returns the message that carries the keyboard.
         """
-        await context.bot.send_message(chat_id=chat_id, text=footer)
+        caption = self._format_variant_caption(variant, idx)
+        if heading:
+            caption = f"{heading}\n\n{caption}"
+        keyboard = self._create_variant_keyboard(idx)
+        if config.CAROUSEL_DELIVERY == 'animation':
+            result = results[0]
+            filename = f"variant_{idx}.{result.extension}"
+            # Telegram plays GIFs inline; an animated WebP goes out as a file
+            if result.format == 'GIF':
+                message = await context.bot.send_animation(
+                    chat_id=chat_id, animation=result.data, filename=filename,
+                    caption=caption, reply_markup=keyboard, parse_mode='HTML'
+                )
+            else:
+                message = await context.bot.send_document(
+                    chat_id=chat_id, document=result.data, filename=filename,
+                    caption=caption, reply_markup=keyboard, parse_mode='HTML'
+                )
+        else:
+            media = [InputMediaPhoto(media=result.data) for result in results]
+            media[0] = InputMediaPhoto(media=results[0].data, caption=caption, parse_mode='HTML')
+            await context.bot.send_media_group(chat_id=chat_id, media=media)
+            message = await context.bot.send_message(
+                chat_id=chat_id,
+                text=f"🎠 ვარიანტი {idx}: {len(results)} სლაიდი",
+                reply_markup=keyboard
+            )
+        return message
+    
+    def _archive_extra_slides(self, results, name):
+        """Archive a carousel's slides after the cover next to it, as name_slide2, name_slide3, ..."""
+        for number, result in enumerate(results[1:], 2):
+            self._archive_result(result, f"{name}_slide{number}")
+    
+    async def _send_new_version(self, chat_id, context, idx, content, heading, kind, style=None):
+        """Render a new version of a variant at full size, send it and point the variant's buttons at it
+        
+        Carousel formats are sent as carousels again. kind names the archived
+        file ({session}_{kind}_{idx}).
+        """
+        session_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+        name = f"{session_id}_{kind}_{idx}"
+        if wants_carousel(content):
+            results = await self._render_carousel(content, style)
+            message = await self._send_carousel(chat_id, context, idx, content, results, heading)
+            result = results[0]
+            filepath = self._archive_result(result, name)
+            self._archive_extra_slides(results, name)
+        else:
+            if style is None:
+                result = await self._render_variant(content)
+            else:
+                result = await self.render_service.render(content, style=style)
+            filepath = self._archive_result(result, name)
+            message = await context.bot.send_photo(
+                chat_id=chat_id,
+                photo=result.data,
+                caption=f"{heading}\n\n{self._format_variant_caption(content, idx)}",
+                reply_markup=self._create_variant_keyboard(idx),
+                parse_mode='HTML'
+            )
+        self._replace_variant(chat_id, idx, content, result, session_id, filepath, message)
+    
+    def _is_busy(self):
+        """A generation or render is running - the variant pool waits for idle time"""
+        return bool(self.generation_tasks) or self.render_service.pending > 0
+    
+    def _store_variant(self, chat_id, idx, variant, result, session_id, album=False, preview=False):
+        """Archive a rendered variant, remember it for the buttons and update stats
+
+        Previews are not archived - only the full-resolution master is.
+        """
+        # Archive in the background, upload straight from memory
+        filepath = None if preview else self._archive_result(result, f"{session_id}_variant_{idx}")
+        
+        # Store variant for later reference
+        self.current_variants[chat_id][idx] = {
+            'content': variant,
+            'filepath': filepath,
+            'style': result.style,
+            'session_id': session_id,
+            'album': album,
+            'preview': preview,
+            'spec': result.spec
+        }
+        
+        # Update stats
+        self.stats['total_generated'] += 1
+        format_type = variant.get('format', 'unknown')
+        self.stats['by_format'][format_type] = \
+            self.stats['by_format'].get(format_type, 0) + 1
+    
+    def _replace_variant(self, chat_id, idx, content, result, session_id, filepath, message):
+        """Point a variant's buttons at a new full-resolution render sent as its own message
+
+        Everything describing the old render (spec, preview, album, message) is replaced,
+        so a later ❤️ or ⬇️ acts on the image the user is looking at.
+        """
+        self.current_variants.setdefault(chat_id, {})[idx] = {
+            'content': content,
+            'filepath': filepath,
+            'style': result.style,
+            'session_id': session_id,
+            'album': False,
+            'preview': False,
+            'spec': result.spec,
+            'message_id': message.message_id
+        }
+    
+    def _archive_result(self, result, name):
+        """Queue the archive copy of a render, returns its future file path"""
+        if config.ARCHIVE_MODE == 'spec' and result.spec is not None:
+            # A few hundred bytes instead of the image; /restore re-renders it
+            return self.archive_writer.submit(encode_spec(result.spec), f"{name}.json")
+        if result.archive_data is not None:
+            return self.archive_writer.submit(result.archive_data, f"{name}.png")
+        return self.archive_writer.submit(result.data, f"{name}.{result.extension}")
     
     def _format_variant_caption(self, variant, idx):
         """Format caption for variant"""
@@ -212,8 +550,8 @@ class ParentingBot:
         
         return caption.strip()
     
-    def _create_variant_keyboard(self, variant_idx):
-        """Create inline keyboard for variant"""
+    def _create_variant_keyboard(self, variant_idx, preview=False):
+        """Create inline keyboard for variant, with a download button for previews"""
         keyboard = [
             [
                 InlineKeyboardButton("❤️", callback_data=f"rate_{variant_idx}_love"),
@@ -229,6 +567,36 @@ class ParentingBot:
                 InlineKeyboardButton("🎨 სტილის შეცვლა", callback_data=f"style_{variant_idx}"),
             ]
         ]
+        if preview:
+            keyboard[2].append(
+                InlineKeyboardButton("⬇️ სრული ხარისხი", callback_data=f"full_{variant_idx}")
+            )
+        return InlineKeyboardMarkup(keyboard)
+    
+    def _create_album_keyboard(self, chat_id):
+        """Create one keyboard for a whole album, with a block of buttons per variant
+
+        Rated variants lose their rating row, the other buttons stay.
+        """
+        keyboard = []
+        for idx, stored in sorted(self.current_variants.get(chat_id, {}).items()):
+            if not stored.get('album'):
+                continue
+            if not stored.get('rated'):
+                keyboard.append([
+                    InlineKeyboardButton(f"{idx} ❤️", callback_data=f"rate_{idx}_love"),
+                    InlineKeyboardButton("👍", callback_data=f"rate_{idx}_like"),
+                    InlineKeyboardButton("😐", callback_data=f"rate_{idx}_ok"),
+                    InlineKeyboardButton("👎", callback_data=f"rate_{idx}_dislike"),
+                ])
+            actions = [
+                InlineKeyboardButton(f"{idx} 🔄", callback_data=f"regen_{idx}"),
+                InlineKeyboardButton("✏️", callback_data=f"edit_{idx}"),
+                InlineKeyboardButton("🎨", callback_data=f"style_{idx}"),
+            ]
+            if stored.get('preview'):
+                actions.append(InlineKeyboardButton("⬇️", callback_data=f"full_{idx}"))
+            keyboard.append(actions)
         return InlineKeyboardMarkup(keyboard)
     
     async def button_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -239,16 +607,21 @@ class ParentingBot:
         data = query.data
         chat_id = update.effective_chat.id
         
-        if data.startswith('rate_'):
-            await self._handle_rating(query, data, chat_id)
-        elif data.startswith('regen_'):
-            await self._handle_regenerate(query, data, chat_id, context)
-        elif data.startswith('edit_'):
-            await self._handle_edit_request(query, data, chat_id)
-        elif data.startswith('style_'):
-            await self._handle_style_change(query, data, chat_id, context)
+        try:
+            if data.startswith('rate_'):
+                await self._handle_rating(query, data, chat_id, context)
+            elif data.startswith('regen_'):
+                await self._handle_regenerate(query, data, chat_id, context)
+            elif data.startswith('edit_'):
+                await self._handle_edit_request(query, data, chat_id)
+            elif data.startswith('style_'):
+                await self._handle_style_change(query, data, chat_id, context)
+            elif data.startswith('full_'):
+                await self._handle_full_resolution(query, data, chat_id, context)
+        except RenderQueueFull:
+            await query.message.reply_text("⏳ ბევრი სურათი მუშავდება ერთდროულად. სცადე ცოტა ხანში")
     
-    async def _handle_rating(self, query, data, chat_id):
+    async def _handle_rating(self, query, data, chat_id, context):
         """Handle rating feedback"""
         parts = data.split('_')
         variant_idx = int(parts[1])
@@ -263,7 +636,8 @@ class ParentingBot:
         
         # Get variant
         if chat_id in self.current_variants and variant_idx in self.current_variants[chat_id]:
-            variant = self.current_variants[chat_id][variant_idx]['content']
+            stored = self.current_variants[chat_id][variant_idx]
+            variant = stored['content']
             
             # Record feedback
             self.content_creator.record_feedback(variant, rating_emoji[rating])
@@ -273,14 +647,68 @@ class ParentingBot:
             self.stats['by_rating'][rating] = self.stats['by_rating'].get(rating, 0) + 1
             self.save_stats()
             
-            await query.edit_message_reply_markup(reply_markup=None)
+            first_rating = not stored.get('rated')
+            stored['rated'] = True
+            
+            # Approved previews get their full-resolution master
+            swapped = False
+            if stored.get('preview') and rating in ('love', 'like'):
+                await self._send_full_resolution(chat_id, variant_idx, context)
+                swapped = True
+            
+            if stored.get('album'):
+                # Shared album keyboard: only drop this variant's rating row
+                if first_rating or swapped:
+                    await query.edit_message_reply_markup(reply_markup=self._create_album_keyboard(chat_id))
+            elif not swapped:
+                # A swapped message already lost its keyboard with the media edit
+                await query.edit_message_reply_markup(reply_markup=None)
             await query.message.reply_text(
-                f"✅ შეფასება მიღებულია: {rating_emoji[rating]}\n"
+                f"✅ შეფასება მიღებულია ({variant_idx}): {rating_emoji[rating]}\n"
                 f"გმადლობთ! ეს დამეხმარება გავაუმჯობესო შემდეგი გენერაციები."
             )
         else:
             await query.message.reply_text("❌ ვარიანტი ვერ მოიძებნა. სცადე ახალი გენერაცია /generate")
     
+    async def _handle_full_resolution(self, query, data, chat_id, context):
+        """Handle download request: swap a preview for its full-resolution render"""
+        variant_idx = int(data.split('_')[1])
+        
+        if chat_id not in self.current_variants or variant_idx not in self.current_variants[chat_id]:
+            await query.message.reply_text("❌ ვარიანტი ვერ მოიძებნა")
+            return
+        
+        stored = self.current_variants[chat_id][variant_idx]
+        if not stored.get('preview'):
+            return
+        
+        await self._send_full_resolution(chat_id, variant_idx, context)
+        if stored.get('album'):
+            await query.edit_message_reply_markup(reply_markup=self._create_album_keyboard(chat_id))
+    
+    async def _send_full_resolution(self, chat_id, idx, context):
+        """Render a preview variant at full resolution and swap it into its message"""
+        stored = self.current_variants[chat_id][idx]
+        result = await self.render_service.render_spec(stored['spec'], scale=1.0)
+        stored['filepath'] = self._archive_result(result, f"{stored['session_id']}_variant_{idx}")
+        stored['preview'] = False
+        
+        # Individual messages keep their own keyboard, minus the download button
+        keyboard = None
+        if not stored.get('album') and not stored.get('rated'):
+            keyboard = self._create_variant_keyboard(idx)
+        
+        await context.bot.edit_message_media(
+            chat_id=chat_id,
+            message_id=stored['message_id'],
+            media=InputMediaPhoto(
+                media=result.data,
+                caption=self._format_variant_caption(stored['content'], idx),
+                parse_mode='HTML'
+            ),
+            reply_markup=keyboard
+        )
+    
     async def _handle_regenerate(self, query, data, chat_id, context):
         """Handle regeneration request"""
         variant_idx = int(data.split('_')[1])
@@ -288,34 +716,11 @@ class ParentingBot:
         await query.message.reply_text("⏳ ვქმნი ახალ ვერსიას...")
         
         if chat_id in self.current_variants and variant_idx in self.current_variants[chat_id]:
-            # Generate new version
-            new_content = self.content_creator.generate_content_ideas(count=1)[0]
-            
-            # Generate image
-            img = self.design_generator.generate_image(new_content)
-            session_id = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"{session_id}_regen_{variant_idx}.png"
-            filepath = self.design_generator.save_image(img, filename)
-            
-            # Send
-            caption = self._format_variant_caption(new_content, variant_idx)
-            keyboard = self._create_variant_keyboard(variant_idx)
+            # New version: a ready one from the pool, otherwise generate it
+            pooled = self.variant_pool.take(1) if config.VARIANT_POOL else []
+            new_content = pooled[0] if pooled else (await self.content_creator.agenerate_content_ideas(count=1))[0]
             
-            with open(filepath, 'rb') as photo:
-                await context.bot.send_photo(
-                    chat_id=chat_id,
-                    photo=photo,
-                    caption=f"🔄 ახალი ვერსია:\n\n{caption}",
-                    reply_markup=keyboard,
-                    parse_mode='HTML'
-                )
-            
-            # Update stored variant
-            self.current_variants[chat_id][variant_idx] = {
-                'content': new_content,
-                'filepath': filepath,
-                'session_id': session_id
-            }
+            await self._send_new_version(chat_id, context, variant_idx, new_content, "🔄 ახალი ვერსია:", 'regen')
     
     async def _handle_edit_request(self, query, data, chat_id):
         """Handle edit request"""
@@ -339,31 +744,19 @@ class ParentingBot:
         variant = self.current_variants[chat_id][variant_idx]
         content = variant['content']
         
-        # Get different style
+        # Get different style: the next one after the current style
         current_styles = list(config.VISUAL_STYLE_DISTRIBUTION.keys())
-        new_style = current_styles[0]
+        current_style = variant.get('style')
+        if current_style in current_styles:
+            new_style = current_styles[(current_styles.index(current_style) + 1) % len(current_styles)]
+        else:
+            new_style = current_styles[0]
         
         await query.message.reply_text(f"🎨 ვცვლი სტილს... ახალი: {new_style}")
         
         # Generate with new style
-        img = self.design_generator.generate_image(content, style=new_style)
-        session_id = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{session_id}_style_{variant_idx}.png"
-        filepath = self.design_generator.save_image(img, filename)
-        
-        caption = self._format_variant_caption(content, variant_idx)
-        keyboard = self._create_variant_keyboard(variant_idx)
-        
-        with open(filepath, 'rb') as photo:
-            await context.bot.send_photo(
-                chat_id=chat_id,
-                photo=photo,
-                caption=f"🎨 ახალი სტილი ({new_style}):\n\n{caption}",
-                reply_markup=keyboard,
-                parse_mode='HTML'
-            )
-        
-        variant['filepath'] = filepath
+        await self._send_new_version(chat_id, context, variant_idx, content,
+                                     f"🎨 ახალი სტილი ({new_style}):", 'style', style=new_style)
     
     async def handle_text_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle text messages for editing"""
@@ -377,15 +770,18 @@ class ParentingBot:
                 variant_num = parts[0].replace('edit', '')
                 try:
                     variant_idx = int(variant_num)
-                    feedback_text = parts[1]
-                    
+                except ValueError:
+                    return  # Not an edit command after all
+                feedback_text = parts[1]
+                
+                try:
                     if chat_id in self.current_variants and variant_idx in self.current_variants[chat_id]:
                         await update.message.reply_text("⏳ ვამუშავებ შენს კომენტარებს...")
                         
                         original = self.current_variants[chat_id][variant_idx]['content']
                         
                         # Regenerate with feedback
-                        new_content = self.content_creator.regenerate_with_feedback(
+                        new_content = await self.content_creator.aregenerate_with_feedback(
                             original, feedback_text
                         )
                         
@@ -393,32 +789,46 @@ class ParentingBot:
                         self.content_creator.add_custom_edit(feedback_text)
                         
                         # Generate new image
-                        img = self.design_generator.generate_image(new_content)
-                        session_id = datetime.now().strftime('%Y%m%d_%H%M%S')
-                        filename = f"{session_id}_edited_{variant_idx}.png"
-                        filepath = self.design_generator.save_image(img, filename)
-                        
-                        caption = self._format_variant_caption(new_content, variant_idx)
-                        keyboard = self._create_variant_keyboard(variant_idx)
-                        
-                        with open(filepath, 'rb') as photo:
-                            await context.bot.send_photo(
-                                chat_id=chat_id,
-                                photo=photo,
-                                caption=f"✏️ რედაქტირებული ვერსია:\n\n{caption}",
-                                reply_markup=keyboard,
-                                parse_mode='HTML'
-                            )
-                        
-                        self.current_variants[chat_id][variant_idx] = {
-                            'content': new_content,
-                            'filepath': filepath,
-                            'session_id': session_id
-                        }
+                        await self._send_new_version(chat_id, context, variant_idx, new_content,
+                                                     "✏️ რედაქტირებული ვერსია:", 'edited')
                     else:
                         await update.message.reply_text("❌ ვარიანტი ვერ მოიძებნა")
-                except:
-                    pass
+                except RenderQueueFull:
+                    await update.message.reply_text("⏳ ბევრი სურათი მუშავდება ერთდროულად. სცადე ცოტა ხანში")
+                except Exception as e:
+                    print(f"Error editing variant {variant_idx}: {e}")
+                    await update.message.reply_text("❌ რედაქტირება ვერ მოხერხდა, სცადე თავიდან")
+    
+    async def restore_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /restore SESSION - re-render archived variants from their render specs"""
+        if not context.args:
+            await update.message.reply_text("გამოყენება: /restore 20250101_130000")
+            return
+        
+        prefix = context.args[0]
+        names = [name for name in await asyncio.to_thread(self.storage_manager.find, prefix)
+                 if name.endswith('.json')]
+        if not names:
+            await update.message.reply_text("❌ სესია ვერ მოიძებნა")
+            return
+        
+        await update.message.reply_text(f"⏳ ვაღდგენ {len(names)} სურათს...")
+        for name in names:
+            try:
+                data = await asyncio.to_thread(self.storage_manager.read, name)
+                spec = decode_spec(data)
+                result = await self.render_service.render_spec(spec, scale=1.0)
+                await context.bot.send_photo(
+                    chat_id=update.effective_chat.id,
+                    photo=result.data,
+                    caption=name[:-len('.json')]
+                )
+            except RenderQueueFull:
+                await update.message.reply_text("⏳ ბევრი სურათი მუშავდება ერთდროულად. სცადე ცოტა ხანში")
+                return
+            except Exception as e:
+                print(f"Error restoring {name}: {e}")
+                await update.message.reply_text(f"❌ {name} - შეცდომა აღდგენისას")
     
     async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show statistics"""
@@ -446,6 +856,45 @@ class ParentingBot:
         for rating, count in self.stats.get('by_rating', {}).items():
             stats_text += f"\n  • {rating}: {count}"
         
+        storage = await asyncio.to_thread(self.storage_manager.get_stats)
+        stats_text += (f"\n\n🗄 არქივი: {storage['files']} ფაილი "
+                       f"({(storage['bytes'] + storage['bundle_bytes']) // (1024 * 1024)} MB), "
+                       f"{storage['bundles']} შეკუმშული პაკეტი")
+
+        encoding = self.render_service.encode_stats.get_stats()
+        if encoding:
+            stats_text += "\n\n🖼 სურათები სტილების მიხედვით:"
+            for style, encoded in sorted(encoding.items()):
+                stats_text += (f"\n  • {style}: {encoded['format']}, {encoded['avg_kb']:.0f} KB, "
+                               f"encode {encoded['avg_ms']:.0f}ms ({encoded['count']})")
+
+        api_usage = self.content_creator.metrics.get_stats()
+        if api_usage:
+            stats_text += "\n\n🤖 Claude API:"
+            for kind, usage in api_usage.items():
+                stats_text += (f"\n  • {kind}: {usage['calls']} call, {usage['avg_ms'] / 1000:.1f}s avg, ${usage['cost_usd']:.3f}, "
+                               f"cache {usage['cache_hit_rate']:.0%} hits / {usage['cached_share']:.0%} tokens, "
+                               f"parse fail {usage['parse_failure_rate']:.0%}, retry {usage['retry_rate']:.0%}")
+
+        if config.FANOUT_GENERATION:
+            fanout = self.content_creator.fanout.get_stats()
+            stats_text += (f"\n  • fan-out: {fanout['base_ms'] / 1000:.1f}s + {fanout['per_variant_ms'] / 1000:.1f}s/ვარიანტი, "
+                           f"errors {fanout['error_rate']:.0%}, requests {fanout['requests_per_generation']}")
+
+        duplicates = self.content_creator.duplicates.get_stats()
+        if duplicates['duplicates']:
+            stats_text += f"\n\n♻️ გამეორებული თემები გამოტოვებულია: {duplicates['duplicates']} ({duplicates['indexed']} ინდექსში)"
+
+        if config.VARIANT_POOL:
+            pool = self.variant_pool.get_stats()
+            stats_text += (f"\n\n⚡ მზა ვარიანტები: {pool['size']}/{pool['capacity']}, "
+                           f"hit {pool['hit_rate']:.0%} ({pool['hits']}/{pool['hits'] + pool['misses']}), "
+                           f"ვადაგასული {pool['expired']}, გაუქმებული {pool['invalidated']}, "
+                           f"გამეორებული {pool['repeated']}")
+
+        if self.archive_writer.failures:
+            stats_text += f"\n\n⚠️ არქივის შეცდომები: {len(self.archive_writer.failures)}"
+        
         await update.message.reply_text(stats_text)
     
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -456,6 +905,7 @@ class ParentingBot:
 🔧 ბრძანებები:
 /generate - ახალი კონტენტის გენერაცია
 /stats - სტატისტიკა
+/restore სესია - არქივიდან სურათების აღდგენა
 /help - ეს დახმარება
 
 💡 როგორ გამოვიყენო:
@@ -488,8 +938,45 @@ class ParentingBot:
             minute=config.GENERATION_MINUTE,
             args=[application]
         )
+        if config.BATCH_GENERATION:
+            submit_at = (config.GENERATION_HOUR * 60 + config.GENERATION_MINUTE - config.BATCH_LEAD_MINUTES) % (24 * 60)
+            self.scheduler.add_job(
+                self.submit_scheduled_batch,
+                'cron',
+                hour=submit_at // 60,
+                minute=submit_at % 60
+            )
+        self.scheduler.add_job(
+            self.compact_storage,
+            'interval',
+            hours=config.STORAGE_COMPACT_HOURS
+        )
         self.scheduler.start()
         print(f"⏰ Scheduler started - Daily generation at {config.GENERATION_HOUR}:{config.GENERATION_MINUTE:02d}")
+        
+        # Start render workers now so the first /generate doesn't wait for them
+        await self.render_service.warm_up()
+        print(f"🖼 Render workers ready: {self.render_service.workers}")
+        
+        if config.VARIANT_POOL:
+            self.variant_pool.start()
+            print(f"⚡ Variant pool started: {self.variant_pool.size} variants")
+    
+    async def compact_storage(self):
+        """Background housekeeping of archived images (runs off the event loop)"""
+        try:
+            result = await asyncio.to_thread(self.storage_manager.compact)
+            if any(result.values()):
+                print(f"🗄 Storage compaction: {result}")
+        except Exception as e:
+            print(f"Error compacting storage: {e}")
+    
+    async def post_shutdown(self, application: Application):
+        """Stop background workers"""
+        self.variant_pool.stop()
+        self.render_service.shutdown()
+        self.archive_writer.close()
+        await self.content_creator.aclose()
     
     async def health_check(self, request):
         """Health check endpoint for Render"""
@@ -511,18 +998,21 @@ class ParentingBot:
     def run(self):
         """Run the bot"""
         # Create application
-        application = Application.builder().token(config.TELEGRAM_BOT_TOKEN).build()
+        # Concurrent updates: buttons and /stats keep working during a long /generate
+        application = Application.builder().token(config.TELEGRAM_BOT_TOKEN).concurrent_updates(True).build()
         
         # Add handlers
         application.add_handler(CommandHandler("start", self.start_command))
         application.add_handler(CommandHandler("generate", self.generate_command))
         application.add_handler(CommandHandler("stats", self.stats_command))
         application.add_handler(CommandHandler("help", self.help_command))
+        application.add_handler(CommandHandler("restore", self.restore_command))
         application.add_handler(CallbackQueryHandler(self.button_callback))
         application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_text_message))
         
         # Register post_init to start scheduler after event loop is ready
         application.post_init = self.post_init
+        application.post_shutdown = self.post_shutdown
         
         # Start health check web server
         asyncio.get_event_loop().create_task(self.start_web_server())
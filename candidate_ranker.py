@@ -0,0 +1,79 @@
+"""
+Candidate Ranker - Scores drafted variants locally so only the best reach the final model
+
+A candidate's score mixes how well its texts fit the image (length), how new
+it is compared to earlier content (duplicate index) and how much the learned
+format/tone preferences favour it.
+"""
+import numpy as np
+from duplicate_index import content_text, signature
+
+# Comfortable character ranges; the prompt asks for at most 200 characters of main text
+IDEAL_LENGTHS = {
+    'title': (10, 60),
+    'main_text': (60, 200)
+}
+
+WEIGHTS = {
+    'length': 0.4,
+    'novelty': 0.35,
+    'preference': 0.25
+}
+
+
+def length_score(variant):
+    """1.0 when every text is in its ideal range, falling linearly with the distance outside it"""
+    scores = []
+    for field, (low, high) in IDEAL_LENGTHS.items():
+        length = len(variant.get(field, ''))
+        if length < low:
+            scores.append(length / low)
+        elif length > high:
+            scores.append(max(0.0, 1 - (length - high) / high))
+        else:
+            scores.append(1.0)
+    return sum(scores) / len(scores)
+
+
+def preference_score(variant, spec, weights):
+    """Learned weight of the variant's format and tone, relative to the favourite (0-1)"""
+    scores = []
+    for group, value in (('formats', variant.get('format')), ('tones', (spec or {}).get('tone'))):
+        group_weights = weights.get(group, {})
+        top = max(group_weights.values(), default=0)
+        if top > 0 and value in group_weights:
+            scores.append(max(group_weights[value], 0) / top)
+    return sum(scores) / len(scores) if scores else 0.0
+
+
+def score(variant, spec, weights, similarity):
+    """Overall score of one candidate; similarity is to the closest earlier variant (0-1)"""
+    return (WEIGHTS['length'] * length_score(variant)
+            + WEIGHTS['novelty'] * (1 - similarity)
+            + WEIGHTS['preference'] * preference_score(variant, spec, weights))
+
+
+def pick(candidates, count, weights, duplicates, threshold):
+    """The count best (spec, variant) candidates, best first
+
+    Candidates that nearly repeat earlier content, or a better candidate of
+    the same batch, are left out.
+    """
+    ranked = []
+    for spec, variant in candidates:
+        similarity = duplicates.similarity(variant)
+        if similarity < threshold:
+            ranked.append((score(variant, spec, weights, similarity), spec, variant))
+    ranked.sort(key=lambda item: item[0], reverse=True)
+
+    picked = []
+    picked_signatures = []
+    for _, spec, variant in ranked:
+        sig = signature(content_text(variant))
+        if any(np.mean(sig == other) >= threshold for other in picked_signatures):
+            continue
+        picked.append((spec, variant))
+        picked_signatures.append(sig)
+        if len(picked) == count:
+            break
+    return picked
@@ -0,0 +1,191 @@
+"""
+Carousel Renderer - Multi-slide carousels and animated WebP/GIF posts built on DesignGenerator
+"""
+import io
+import math
+import re
+import time
+from PIL import GifImagePlugin, Image, ImageChops
+import config
+from design_generator import DesignGenerator
+from image_encoder import ImageEncoder, EncodedImage, EXTENSIONS
+
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def split_slides(content, max_slides=None, slide_chars=None):
+    """Split content into slides: a title cover, then main text chunks
+
+    Chunks follow the text's own lines (or sentences for a single paragraph)
+    and are merged while they fit slide_chars. Overflow goes on the last slide.
+    """
+    max_slides = max_slides or config.CAROUSEL_MAX_SLIDES
+    slide_chars = slide_chars or config.CAROUSEL_SLIDE_CHARS
+    main_text = content.get('main_text', '')
+
+    pieces = [p.strip() for p in main_text.split('\n') if p.strip()]
+    if len(pieces) == 1:
+        pieces = [p for p in SENTENCE_END.split(pieces[0]) if p]
+
+    chunks = []
+    for piece in pieces:
+        if chunks and len(chunks[-1]) + 1 + len(piece) <= slide_chars:
+            chunks[-1] += '\n' + piece
+        else:
+            chunks.append(piece)
+
+    # Keep the cover plus at most max_slides - 1 text slides
+    limit = max(max_slides - 1, 1)
+    if len(chunks) > limit:
+        chunks = chunks[:limit - 1] + ['\n'.join(chunks[limit - 1:])]
+
+    slides = [dict(content, main_text='')]
+    slides.extend(dict(content, title='', main_text=chunk) for chunk in chunks)
+    return slides
+
+
+def write_gif(frames, fp, loop=0):
+    """Write (frame, duration_ms) pairs to fp as a looping GIF, one frame at a time
+
+    Every frame after the first is stored as the region that differs from the
+    previous one, with its own colour table. Only the previous frame is kept,
+    so memory doesn't grow with the frame count (Pillow's save_all collects
+    every frame first). Returns the number of frames.
+
+    Uses GifImagePlugin's getheader/getdata, which aren't a stable API -
+    requirements.txt pins the Pillow releases this is tested against.
+    """
+    previous = None
+    count = 0
+    for frame, duration in frames:
+        if previous is None:
+            first = frame.convert('P', palette=Image.Palette.ADAPTIVE)
+            header, _ = GifImagePlugin.getheader(first, info={'loop': loop, 'duration': duration})
+            chunks = header + GifImagePlugin.getdata(first, duration=duration)
+        else:
+            # An unchanged frame still needs a (1x1) image to carry its duration
+            bbox = ImageChops.difference(previous, frame).getbbox() or (0, 0, 1, 1)
+            delta = frame.crop(bbox).convert('P', palette=Image.Palette.ADAPTIVE)
+            chunks = GifImagePlugin.getdata(delta, offset=bbox[:2], duration=duration,
+                                            include_color_table=True)
+        for chunk in chunks:
+            fp.write(chunk)
+        previous = frame
+        count += 1
+    fp.write(b';')
+    return count
+
+
+def wants_carousel(content):
+    """Whether a content format is delivered as a carousel (unless CAROUSEL_DELIVERY is off)"""
+    return config.CAROUSEL_DELIVERY != 'off' and content.get('format') in config.CAROUSEL_FORMATS
+
+
+class CarouselRenderer:
+    def __init__(self, encoder=None, generators=None):
+        self.encoder = encoder or ImageEncoder()
+        # scale -> DesignGenerator (keeps its layer cache and fonts), can be shared with other renders
+        self.generators = {} if generators is None else generators
+
+    def _generator(self, scale):
+        """Get the shared generator for a scale"""
+        generator = self.generators.get(scale)
+        if generator is None:
+            generator = DesignGenerator(scale=scale)
+            self.generators[scale] = generator
+        return generator
+
+    def iter_slides(self, content, style=None, scale=1.0):
+        """Yield slide images one at a time, all in the same style"""
+        style = style or DesignGenerator.pick_style()
+        generator = self._generator(scale)
+        for slide in split_slides(content):
+            yield generator.generate_image(slide, style)
+
+    def render_sequence(self, content, style=None, scale=1.0):
+        """Yield an encoded still per slide (image sequence for photo carousels)
+
+        Only one decoded slide is alive at a time.
+        """
+        style = style or DesignGenerator.pick_style()
+        for img in self.iter_slides(content, style, scale):
+            yield self.encoder.encode(img, style)
+
+    def plan_animation(self, slide_count, scale=None, transition_frames=None):
+        """Pick (scale, transition frames) so raw frames fit ANIMATION_MAX_BYTES
+
+        WebP holds every frame until it is written; GIF is written frame by
+        frame (see write_gif) but shares the plan so both formats look the
+        same. Transitions are dropped first, then the resolution is lowered.
+        """
+        scale = config.ANIMATION_SCALE if scale is None else scale
+        steps = config.ANIMATION_TRANSITION_FRAMES if transition_frames is None else transition_frames
+
+        def frame_bytes(s):
+            return round(config.IMAGE_WIDTH * s) * round(config.IMAGE_HEIGHT * s) * 3
+
+        def total(s, n):
+            return (slide_count + (slide_count - 1) * n) * frame_bytes(s)
+
+        while steps > 0 and total(scale, steps) > config.ANIMATION_MAX_BYTES:
+            steps -= 1
+        if total(scale, steps) > config.ANIMATION_MAX_BYTES:
+            scale *= math.sqrt(config.ANIMATION_MAX_BYTES / total(scale, steps))
+            scale = math.floor(scale * 100) / 100
+        return scale, steps
+
+    def iter_frames(self, slides, steps):
+        """Yield (frame, duration_ms) for slides with crossfades between them
+
+        A transition blends only the region that differs between two slides;
+        the rest of each frame is the previous slide as is.
+        """
+        previous = None
+        for img in slides:
+            if previous is not None:
+                yield from self._transition(previous, img, steps)
+            yield img, config.ANIMATION_SLIDE_MS
+            previous = img
+
+    def _transition(self, before, after, steps):
+        """Crossfade frames between two slides, blending only the changed region"""
+        if steps <= 0:
+            return
+        bbox = ImageChops.difference(before, after).getbbox()
+        if bbox is None:
+            return
+        old_region, new_region = before.crop(bbox), after.crop(bbox)
+        for i in range(1, steps + 1):
+            frame = before.copy()
+            frame.paste(Image.blend(old_region, new_region, i / (steps + 1)), bbox[:2])
+            yield frame, config.ANIMATION_TRANSITION_MS
+
+    def render_animation(self, content, style=None, fmt=None):
+        """Render content as an animated WebP or GIF, returns EncodedImage
+
+        Frames are generated lazily. GIF frames are written as they come and
+        dropped; Pillow's WebP writer collects every frame first, which
+        plan_animation bounds.
+        """
+        style = style or DesignGenerator.pick_style()
+        fmt = (fmt or config.ANIMATION_FORMAT).upper()
+        if fmt not in ('WEBP', 'GIF'):
+            raise ValueError(f"Unsupported animation format: {fmt}")
+
+        slide_count = len(split_slides(content))
+        scale, steps = self.plan_animation(slide_count)
+
+        start = time.perf_counter()
+        frames = self.iter_frames(self.iter_slides(content, style, scale), steps)
+        buffer = io.BytesIO()
+        if fmt == 'GIF':
+            write_gif(frames, buffer)
+        else:
+            images, durations = zip(*frames)
+            images[0].save(buffer, fmt, save_all=True, append_images=images[1:], duration=list(durations),
+                           loop=0, quality=config.OUTPUT_QUALITY, method=4)
+        data = buffer.getvalue()
+        encode_ms = (time.perf_counter() - start) * 1000
+
+        self.encoder.record(style, fmt, encode_ms, len(data))
+        return EncodedImage(data, fmt, EXTENSIONS[fmt], encode_ms, len(data))
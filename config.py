@@ -13,6 +13,43 @@ ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 ADMIN_CHAT_ID = os.getenv('ADMIN_CHAT_ID')
 
+# Claude API client: request timeout (seconds), retries and max requests in flight
+ANTHROPIC_TIMEOUT = float(os.getenv('ANTHROPIC_TIMEOUT', 120))
+ANTHROPIC_MAX_RETRIES = int(os.getenv('ANTHROPIC_MAX_RETRIES', 2))
+ANTHROPIC_MAX_CONCURRENCY = int(os.getenv('ANTHROPIC_MAX_CONCURRENCY', 2))
+
+# Claude models. Finals (and feedback rewrites) use FINAL_MODEL; with TIERED_GENERATION
+# on, DRAFT_OVERSAMPLE x the needed variants are drafted on DRAFT_MODEL, ranked locally
+# and only the best are polished on FINAL_MODEL
+FINAL_MODEL = os.getenv('FINAL_MODEL', 'claude-sonnet-4-20250514')
+DRAFT_MODEL = os.getenv('DRAFT_MODEL', 'claude-3-5-haiku-20241022')
+TIERED_GENERATION = os.getenv('TIERED_GENERATION', 'false').lower() == 'true'
+DRAFT_OVERSAMPLE = float(os.getenv('DRAFT_OVERSAMPLE', 2))
+DRAFT_MAX_TOKENS = int(os.getenv('DRAFT_MAX_TOKENS', 8000))
+
+# USD per million input/output tokens, for the cost in /stats (cache writes cost 1.25x
+# input, cache reads 0.1x input, batch calls half)
+MODEL_PRICES = {
+    'claude-sonnet-4-20250514': (3.00, 15.00),
+    'claude-3-5-haiku-20241022': (0.80, 4.00)
+}
+
+# Ask for content through a forced tool call (schema-shaped JSON) and re-request only the
+# variants that come back malformed, repeated or missing, up to GENERATION_RETRIES times
+STRUCTURED_OUTPUT = os.getenv('STRUCTURED_OUTPUT', 'true').lower() == 'true'
+GENERATION_RETRIES = int(os.getenv('GENERATION_RETRIES', 1))
+
+# Split a generation into parallel per-variant (or small group) requests when recent
+# latency says it is faster; rate limits and FANOUT_MAX_REQUESTS cap the split
+FANOUT_GENERATION = os.getenv('FANOUT_GENERATION', 'false').lower() == 'true'
+FANOUT_MAX_REQUESTS = int(os.getenv('FANOUT_MAX_REQUESTS', 6))
+# Above this share of failed requests, groups are split further
+FANOUT_ERROR_RATE = float(os.getenv('FANOUT_ERROR_RATE', 0.3))
+FANOUT_SAMPLES = int(os.getenv('FANOUT_SAMPLES', 30))
+
+# Mark the stable system prompt (persona, rules, JSON schema) for provider prompt caching
+PROMPT_CACHING = os.getenv('PROMPT_CACHING', 'true').lower() == 'true'
+
 # Timezone
 TIMEZONE = os.getenv('TIMEZONE', 'Asia/Tbilisi')
 
@@ -20,6 +57,15 @@ TIMEZONE = os.getenv('TIMEZONE', 'Asia/Tbilisi')
 GENERATION_HOUR = int(os.getenv('GENERATION_HOUR', 13))
 GENERATION_MINUTE = int(os.getenv('GENERATION_MINUTE', 0))
 
+# Scheduled generation through the Message Batches API: submitted BATCH_LEAD_MINUTES
+# before GENERATION_HOUR, polled with backoff (seconds) at delivery, and replaced by a
+# live call if it hasn't finished BATCH_DEADLINE_MINUTES after the delivery time
+BATCH_GENERATION = os.getenv('BATCH_GENERATION', 'false').lower() == 'true'
+BATCH_LEAD_MINUTES = int(os.getenv('BATCH_LEAD_MINUTES', 120))
+BATCH_DEADLINE_MINUTES = float(os.getenv('BATCH_DEADLINE_MINUTES', 5))
+BATCH_POLL_INITIAL = float(os.getenv('BATCH_POLL_INITIAL', 5))
+BATCH_POLL_MAX = float(os.getenv('BATCH_POLL_MAX', 60))
+
 # News checking
 NEWS_CHECK_DAYS = [int(d) for d in os.getenv('NEWS_CHECK_DAYS', '0,3').split(',')]
 
@@ -28,6 +74,32 @@ LEARNING_PHASE_DAYS = int(os.getenv('LEARNING_PHASE_DAYS', 14))
 LEARNING_VARIANTS = int(os.getenv('LEARNING_VARIANTS', 6))
 NORMAL_VARIANTS = int(os.getenv('NORMAL_VARIANTS', 3))
 
+# Stream the Claude response and start rendering each variant as soon as it is written
+STREAM_GENERATION = os.getenv('STREAM_GENERATION', 'true').lower() == 'true'
+
+# Pool of pre-generated, pre-rendered variants served instantly by /generate and 🔄;
+# refilled in the background while the bot is idle (costs API calls ahead of use)
+VARIANT_POOL = os.getenv('VARIANT_POOL', 'false').lower() == 'true'
+VARIANT_POOL_SIZE = int(os.getenv('VARIANT_POOL_SIZE', 6))
+VARIANT_POOL_REFILL_BATCH = int(os.getenv('VARIANT_POOL_REFILL_BATCH', 3))
+VARIANT_POOL_TTL_HOURS = float(os.getenv('VARIANT_POOL_TTL_HOURS', 48))
+VARIANT_POOL_IDLE_SECONDS = float(os.getenv('VARIANT_POOL_IDLE_SECONDS', 60))
+# Entries are dropped once format/tone weights move this much (sum of absolute changes)
+VARIANT_POOL_PREFERENCE_DRIFT = float(os.getenv('VARIANT_POOL_PREFERENCE_DRIFT', 0.25))
+
+# Skip variants that nearly repeat earlier content (MinHash similarity of title + text)
+# and list the latest DUPLICATE_AVOID_TOPICS titles in the prompt as topics to avoid
+DUPLICATE_CHECK = os.getenv('DUPLICATE_CHECK', 'true').lower() == 'true'
+DUPLICATE_THRESHOLD = float(os.getenv('DUPLICATE_THRESHOLD', 0.5))
+DUPLICATE_AVOID_TOPICS = int(os.getenv('DUPLICATE_AVOID_TOPICS', 15))
+
+# Send a session's variants as one Telegram album plus a single rating keyboard
+ALBUM_DELIVERY = os.getenv('ALBUM_DELIVERY', 'true').lower() == 'true'
+
+# Send low-resolution previews first, render full resolution on ❤️/👍 or download
+PREVIEW_MODE = os.getenv('PREVIEW_MODE', 'true').lower() == 'true'
+PREVIEW_SCALE = float(os.getenv('PREVIEW_SCALE', 0.5))
+
 # Content settings
 BRANDING = "Nika Gablishvili - Psychologist | ნიკა გაბლიშვილი - ფსიქოკონსულტანტი"
 
@@ -72,12 +144,135 @@ COLOR_PALETTES = {
     'story_card': ['#FFF5E1', '#FFD3B5', '#FFAA85', '#FF8C5A']
 }
 
+# Style templates, compiled into layout plans by layout_plan.py
+# Coordinates are for 1080x1920 and scaled; negative values count from the right/bottom
+# edge, None stretches to it. Colors are palette indexes or literal colors.
+STYLE_TEMPLATES = {
+    'minimalist': {
+        'background': [
+            {'type': 'solid', 'color': 'white'},
+            {'type': 'rect', 'box': [0, 0, None, 40], 'fill': 2}
+        ],
+        'text': [
+            {'field': 'title', 'font': 'title', 'y': 200, 'inset': 200, 'line_height': 100, 'color': 1},
+            {'field': 'main_text', 'font': 'main', 'gap': 100, 'inset': 200, 'line_height': 80,
+             'color': 1, 'fit_bottom': 160}
+        ]
+    },
+    'warm_cozy': {
+        'background': [
+            {'type': 'gradient', 'kind': 'vertical', 'colors': [0, 1]},
+            {'type': 'rounded_rect', 'box': [100, 300, -100, -400], 'fill': 2, 'radius': 50}
+        ],
+        'text': [
+            {'field': 'title', 'font': 'title', 'y': 400, 'inset': 300, 'line_height': 100, 'color': 3},
+            {'field': 'main_text', 'font': 'main', 'gap': 80, 'inset': 300, 'line_height': 75,
+             'color': 3, 'fit_bottom': 460}
+        ]
+    },
+    'infographic': {
+        'background': [
+            {'type': 'solid', 'color': 0},
+            {'type': 'rect', 'box': [0, 0, None, 200], 'fill': 1}
+        ],
+        'text': [
+            {'field': 'title', 'font': 'title', 'y': 60, 'inset': 100, 'line_height': 90, 'color': 'white'},
+            {'field': 'main_text', 'font': 'main', 'y': 350, 'inset': 300, 'line_height': 70,
+             'color': 1, 'x': 220, 'text_offset': -20, 'spacing': 50, 'max_items': 5,
+             'bullet': {'x': 150, 'radius': 25, 'color': 2}}
+        ]
+    },
+    'gradient': {
+        'background': [
+            {'type': 'gradient', 'kind': 'diagonal', 'colors': [0, 1]},
+            {'type': 'overlay', 'color': [255, 255, 255, 100]}
+        ],
+        'text': [
+            {'field': 'title', 'font': 'title', 'y': 300, 'inset': 200, 'line_height': 100,
+             'color': 'white', 'shadow': {'offset': 3, 'color': [0, 0, 0, 100]}},
+            {'field': 'main_text', 'font': 'main', 'gap': 100, 'inset': 200, 'line_height': 75,
+             'color': 'white', 'fit_bottom': 160, 'shadow': {'offset': 2, 'color': [0, 0, 0, 100]}}
+        ]
+    },
+    'story_card': {
+        'background': [
+            {'type': 'solid', 'color': 0},
+            {'type': 'rounded_rect', 'box': [80, 250, -80, -350], 'fill': 'white', 'radius': 60},
+            {'type': 'rounded_rect', 'box': [90, 260, -70, -340], 'fill': 2, 'radius': 60},
+            {'type': 'rounded_rect', 'box': [80, 250, -80, -350], 'fill': 'white', 'radius': 60}
+        ],
+        'text': [
+            {'field': 'title', 'font': 'title', 'y': 350, 'inset': 300, 'line_height': 95, 'color': 3},
+            {'field': 'main_text', 'font': 'main', 'gap': 60, 'inset': 280, 'line_height': 70,
+             'color': '#333333', 'fit_bottom': 410}
+        ]
+    }
+}
+
 # Image settings
 IMAGE_WIDTH = 1080
 IMAGE_HEIGHT = 1920
 IMAGE_FORMAT = 'PNG'
 IMAGE_QUALITY = 95
 
+# Delivery encoding per style: 'png', 'png_palette' (quantized), 'jpeg' or 'webp'
+# Flat styles compress well as palette PNG, gradients need a lossy format
+OUTPUT_FORMAT_BY_STYLE = {
+    'minimalist': 'png_palette',
+    'warm_cozy': 'jpeg',
+    'infographic': 'png_palette',
+    'gradient': 'jpeg',
+    'story_card': 'png_palette'
+}
+OUTPUT_FORMAT_DEFAULT = os.getenv('OUTPUT_FORMAT_DEFAULT', 'jpeg')
+OUTPUT_QUALITY = int(os.getenv('OUTPUT_QUALITY', 90))
+OUTPUT_BYTE_BUDGET = int(os.getenv('OUTPUT_BYTE_BUDGET_KB', 512)) * 1024
+# Also archive a lossless PNG next to the delivered image
+ARCHIVE_LOSSLESS = os.getenv('ARCHIVE_LOSSLESS', 'false').lower() == 'true'
+
+# Shrink main text until it fits its card/box instead of overflowing
+AUTO_FIT_TEXT = os.getenv('AUTO_FIT_TEXT', 'true').lower() == 'true'
+AUTO_FIT_MIN_FONT_SIZE = int(os.getenv('AUTO_FIT_MIN_FONT_SIZE', 32))
+
+# Keep a copy of every generated image in GENERATED_DIR (written in the background)
+ARCHIVE_GENERATED = os.getenv('ARCHIVE_GENERATED', 'true').lower() == 'true'
+# What the archive keeps per variant: 'pixels' (encoded image) or 'spec' (small JSON
+# render spec, the image is re-rendered on demand with /restore)
+ARCHIVE_MODE = os.getenv('ARCHIVE_MODE', 'pixels')
+
+# GENERATED_DIR housekeeping: day shards older than ARCHIVE_AFTER_DAYS are bundled into
+# tar.gz files, data older than RETENTION_DAYS is deleted, then LRU eviction keeps MAX_MB
+STORAGE_ARCHIVE_AFTER_DAYS = int(os.getenv('STORAGE_ARCHIVE_AFTER_DAYS', 7))
+STORAGE_RETENTION_DAYS = int(os.getenv('STORAGE_RETENTION_DAYS', 180))
+STORAGE_MAX_BYTES = int(os.getenv('STORAGE_MAX_MB', 2048)) * 1024 * 1024
+STORAGE_COMPACT_HOURS = int(os.getenv('STORAGE_COMPACT_HOURS', 6))
+
+# Render worker processes (0 = render in a single background thread)
+RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', min(2, os.cpu_count() or 1)))
+# Max renders queued or running at once before new requests are rejected
+RENDER_QUEUE_LIMIT = int(os.getenv('RENDER_QUEUE_LIMIT', 24))
+
+# Cache of finished renders, keyed by content + style (memory tier, then disk)
+RENDER_CACHE_MAX_BYTES = int(os.getenv('RENDER_CACHE_MAX_MB', 32)) * 1024 * 1024
+RENDER_CACHE_DISK_MAX_BYTES = int(os.getenv('RENDER_CACHE_DISK_MAX_MB', 256)) * 1024 * 1024
+
+# Memory cap for pre-rendered static layers (backgrounds, cards, branding)
+LAYER_CACHE_MAX_BYTES = int(os.getenv('LAYER_CACHE_MAX_MB', 64)) * 1024 * 1024
+
+# Multi-slide carousels and animated posts (carousel_renderer.py)
+CAROUSEL_FORMATS = ['myth_vs_reality', 'self_assessment']
+# How those formats are sent: 'slides' (a photo album), 'animation' (one animated post) or 'off'
+CAROUSEL_DELIVERY = os.getenv('CAROUSEL_DELIVERY', 'slides')
+CAROUSEL_MAX_SLIDES = int(os.getenv('CAROUSEL_MAX_SLIDES', 6))
+CAROUSEL_SLIDE_CHARS = int(os.getenv('CAROUSEL_SLIDE_CHARS', 160))
+ANIMATION_FORMAT = os.getenv('ANIMATION_FORMAT', 'webp')  # 'webp' or 'gif'
+ANIMATION_SCALE = float(os.getenv('ANIMATION_SCALE', 0.5))
+ANIMATION_SLIDE_MS = int(os.getenv('ANIMATION_SLIDE_MS', 2500))
+ANIMATION_TRANSITION_FRAMES = int(os.getenv('ANIMATION_TRANSITION_FRAMES', 6))
+ANIMATION_TRANSITION_MS = int(os.getenv('ANIMATION_TRANSITION_MS', 60))
+# Raw frame memory an animation may hold; transitions, then resolution, shrink to fit
+ANIMATION_MAX_BYTES = int(os.getenv('ANIMATION_MAX_MB', 64)) * 1024 * 1024
+
 # Georgian fonts (system fonts on most Linux servers)
 GEORGIAN_FONTS = [
     'Noto Sans Georgian',
@@ -99,6 +294,10 @@ FEEDBACK_FILE = f'{DATA_DIR}/feedback.json'
 STATS_FILE = f'{DATA_DIR}/stats.json'
 GENERATED_DIR = f'{DATA_DIR}/generated'
 LEARNING_FILE = f'{DATA_DIR}/learning_preferences.json'
+RENDER_CACHE_DIR = f'{DATA_DIR}/render_cache'
+API_USAGE_FILE = f'{DATA_DIR}/api_usage.jsonl'
+BATCH_STATE_FILE = f'{DATA_DIR}/pending_batch.json'
+CONTENT_INDEX_FILE = f'{DATA_DIR}/content_index.jsonl'
 
 # Hashtags
 DEFAULT_HASHTAGS = [
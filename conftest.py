@@ -0,0 +1,74 @@
+"""
+Pytest configuration and shared fixtures
+"""
+from types import SimpleNamespace
+
+import pytest
+
+import config
+
+# test_bot.py is an interactive smoke script (needs real API keys), not a pytest module
+collect_ignore = ['test_bot.py']
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Point every data file the bot and the creator write at tmp_path, with a dummy API key"""
+    monkeypatch.setenv('ANTHROPIC_API_KEY', 'test-key')
+    monkeypatch.setattr(config, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(config, 'STATS_FILE', str(tmp_path / 'stats.json'))
+    monkeypatch.setattr(config, 'LEARNING_FILE', str(tmp_path / 'learning.json'))
+    monkeypatch.setattr(config, 'API_USAGE_FILE', str(tmp_path / 'api_usage.jsonl'))
+    monkeypatch.setattr(config, 'CONTENT_INDEX_FILE', str(tmp_path / 'content_index.jsonl'))
+    monkeypatch.setattr(config, 'BATCH_STATE_FILE', str(tmp_path / 'batch.json'))
+    monkeypatch.setattr(config, 'ARCHIVE_GENERATED', False)
+    return tmp_path
+
+
+@pytest.fixture
+def creator(data_dir, monkeypatch):
+    """ContentCreator with its files in tmp_path; the fake API clients repeat themselves,
+    so duplicate filtering is off unless a test turns it on"""
+    monkeypatch.setattr(config, 'DUPLICATE_CHECK', False)
+    from content_creator import ContentCreator
+    return ContentCreator()
+
+
+@pytest.fixture
+def render_service(data_dir):
+    """In-thread renderer with its cache in tmp_path"""
+    from render_cache import RenderCache
+    from render_service import RenderService
+    service = RenderService(workers=0, cache=RenderCache(disk_dir=str(data_dir)))
+    yield service
+    service.shutdown()
+
+
+@pytest.fixture
+def parenting_bot(data_dir, render_service, monkeypatch):
+    """ParentingBot rendering in-thread, with duplicate filtering off"""
+    monkeypatch.setattr(config, 'DUPLICATE_CHECK', False)
+    from bot import ParentingBot
+    instance = ParentingBot()
+    instance.render_service = render_service
+    instance.variant_pool.render_service = render_service
+    return instance
+
+
+@pytest.fixture
+def fake_client():
+    """Wrap a fake messages API (async create and/or stream) in an async client with the SDK's
+    raw-response surface; headers are the rate-limit headers every response carries, .fake is the wrapped API"""
+    def wrap(messages, headers=None):
+        async def raw_create(**request):
+            message = await messages.create(**request)
+
+            async def parse():
+                return message
+            return SimpleNamespace(headers=dict(headers or {}), parse=parse)
+
+        return SimpleNamespace(messages=SimpleNamespace(
+            with_raw_response=SimpleNamespace(create=raw_create),
+            stream=getattr(messages, 'stream', None)
+        ), fake=messages)
+    return wrap
@@ -2,16 +2,153 @@
 Content Creator - Generates parenting content using Claude API
 """
 import anthropic
+import asyncio
 import random
 import json
+import time
 from datetime import datetime
 import config
+from metrics import ApiMetrics
+from duplicate_index import DuplicateIndex
+from content_schema import TOOLS, VARIANTS_TOOL, VARIANT_TOOL, VariantError, validate_variant
+import candidate_ranker
+from fanout_policy import FanoutPolicy
+from stream_parser import VariantStreamParser
+
+# Everything that is the same on every call, sent as the system prompt so the
+# provider can cache it; generation and feedback requests share this prefix
+# (together with the tool list, which comes before it). The output rules
+# depend on STRUCTURED_OUTPUT: JSON text, or a forced tool call.
+_PERSONA = """შენ ხარ ნიკა გაბლიშვილი - გამოცდილი ფსიქოკონსულტანტი მშობლებისთვის, ჰარვარდის უნივერსიტეტის კურსდამთავრებული, 20 წლიანი პრაქტიკით.
+
+შენი ამოცანაა შექმნა TikTok კონტენტი ქართულ მშობლებისთვის. კონტენტი უნდა იყოს:
+- პრაქტიკული და გამოსადეგი
+- მეცნიერულად დასაბუთებული
+- ადვილად გასაგები
+- მოკლე და კონკრეტური (TikTok ფორმატი)
+
+"""
+
+_JSON_RULES = """ᲙᲠᲘᲢᲘᲙᲣᲚᲐᲓ ᲛᲜᲘᲨᲕᲜᲔᲚᲝᲕᲐᲜᲘ: 
+1. ყოველთვის პასუხობ მხოლოდ და მხოლოდ VALID JSON ფორმატში
+2. არ იყენებ markdown code blocks (```json)
+3. არ იყენებ არანაირ დამატებით ტექსტს JSON-ის გარეთ
+
+"""
+
+_TOOL_RULES = """ᲙᲠᲘᲢᲘᲙᲣᲚᲐᲓ ᲛᲜᲘᲨᲕᲜᲔᲚᲝᲕᲐᲜᲘ: 
+1. პასუხს აბრუნებ მხოლოდ მოთხოვნილი ხელსაწყოს (tool) გამოძახებით
+2. ხელსაწყოს input-ს ავსებ ქვემოთ აღწერილი სტრუქტურით
+3. ხელსაწყოს გამოძახების გარეთ ტექსტს არ წერ
+
+"""
+
+_STRUCTURE = """ახალი ვარიანტების გენერაციისას JSON სტრუქტურა:
+{
+  "variants": [
+    {
+      "format": "myth_vs_reality",
+      "title": "მოკლე სათაური",
+      "main_text": "ძირითადი ტექსტი რომელიც გამოჩნდება სურათზე (მაქსიმუმ 200 სიმბოლო)",
+      "caption": "Instagram/TikTok caption - უფრო დეტალური ახსნა (მაქსიმუმ 500 სიმბოლო)",
+      "hashtags": ["hashtag1", "hashtag2", "hashtag3"],
+      "visual_notes": "როგორ უნდა გამოიყურებოდეს ვიზუალურად - ფერები, ელემენტები"
+    }
+  ]
+}
+
+არსებული კონტენტის გაუმჯობესებისას (feedback) - ერთი ვარიანტის JSON სტრუქტურა:
+{
+  "format": "...",
+  "title": "...",
+  "main_text": "...",
+  "caption": "...",
+  "hashtags": ["..."],
+  "visual_notes": "..."
+}
+
+გაიხსენე: 
+- ტექსტი უნდა იყოს ᲥᲐᲠᲗᲣᲚᲐᲓ
+- მოკლე და კონკრეტული (TikTok vertical ფორმატი)
+- ემოციურად რეზონანსული მშობლებისთვის
+- პრაქტიკული - რაღაც რასაც დღესვე გამოიყენებენ
+
+"""
+
+SYSTEM_PROMPT = _PERSONA + _JSON_RULES + _STRUCTURE + "არ დაგავიწყდეს - მხოლოდ JSON, არაფერი სხვა!"
+TOOL_SYSTEM_PROMPT = _PERSONA + _TOOL_RULES + _STRUCTURE + "არ დაგავიწყდეს - პასუხი მხოლოდ ხელსაწყოს გამოძახებით!"
 
 class ContentCreator:
     def __init__(self):
-        self.client = anthropic.Anthropic(api_key=config.ANTHROPIC_API_KEY)
+        # Sync client for scripts, async client (one shared connection pool) for the bot
+        self.client = anthropic.Anthropic(
+            api_key=config.ANTHROPIC_API_KEY,
+            timeout=config.ANTHROPIC_TIMEOUT,
+            max_retries=config.ANTHROPIC_MAX_RETRIES
+        )
+        self._async_client = None
+        self._semaphore = None
+        self.metrics = ApiMetrics()
+        self.duplicates = DuplicateIndex()
+        self.fanout = FanoutPolicy()
         self.load_learning_preferences()
     
+    @property
+    def async_client(self):
+        """AsyncAnthropic client, created on first use inside the running event loop"""
+        if self._async_client is None:
+            self._async_client = anthropic.AsyncAnthropic(
+                api_key=config.ANTHROPIC_API_KEY,
+                timeout=config.ANTHROPIC_TIMEOUT,
+                max_retries=config.ANTHROPIC_MAX_RETRIES
+            )
+        return self._async_client
+    
+    @property
+    def semaphore(self):
+        """Limits API requests in flight to ANTHROPIC_MAX_CONCURRENCY"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(config.ANTHROPIC_MAX_CONCURRENCY)
+        return self._semaphore
+    
+    async def _create_message(self, **request):
+        """Call the API through the async client, at most ANTHROPIC_MAX_CONCURRENCY at once
+        
+        Rate-limit headers and 429s are passed on to the fan-out policy.
+        """
+        async with self.semaphore:
+            try:
+                response = await self.async_client.messages.with_raw_response.create(**request)
+            except anthropic.RateLimitError as e:
+                self.fanout.observe_rate_limited(e.response.headers)
+                raise
+            self.fanout.observe_headers(response.headers)
+            return await response.parse()
+    
+    def _record_usage(self, kind, message, start, **outcome):
+        """Log a response's token usage and prompt cache hits with the call's latency
+        
+        outcome: parse_failed, invalid_variants, repeated_variants, retry - see
+        ApiMetrics.record. Returns the logged entry.
+        """
+        return self.metrics.record(kind, getattr(message, 'usage', None),
+                            (time.perf_counter() - start) * 1000, getattr(message, 'model', config.FINAL_MODEL), **outcome)
+    
+    def _observe_generation(self, variants, entry):
+        """Pass a generation call to the fan-out policy
+        
+        Malformed or missing variants count against the request; near-duplicates
+        are well-formed output and don't.
+        """
+        ok = not entry.get('parse_failed') and not entry.get('invalid_variants')
+        self.fanout.observe(variants, entry['latency_ms'], ok=ok)
+    
+    async def aclose(self):
+        """Close the async client's connection pool"""
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+    
     def load_learning_preferences(self):
         """Load user's learned preferences"""
         try:
@@ -33,9 +170,8 @@ class ContentCreator:
         with open(config.LEARNING_FILE, 'w', encoding='utf-8') as f:
             json.dump(self.preferences, f, ensure_ascii=False, indent=2)
     
-    def get_weighted_choice(self, distribution_dict, preference_key):
-        """Get weighted random choice based on distribution and learning"""
-        # Adjust weights based on preferences
+    def _weights(self, distribution_dict, preference_key):
+        """Distribution adjusted by learned preferences, normalized to sum to 1"""
         weights = {}
         for key, base_weight in distribution_dict.items():
             preference_boost = self.preferences.get(preference_key, {}).get(key, 0)
@@ -43,14 +179,22 @@ class ContentCreator:
         
         # Normalize
         total = sum(weights.values())
-        weights = {k: v/total for k, v in weights.items()}
-        
+        return {k: v/total for k, v in weights.items()}
+    
+    def get_weighted_choice(self, distribution_dict, preference_key):
+        """Get weighted random choice based on distribution and learning"""
+        weights = self._weights(distribution_dict, preference_key)
         return random.choices(list(weights.keys()), weights=list(weights.values()))[0]
     
-    def generate_content_ideas(self, count=3, news_context=None):
-        """Generate content ideas using Claude API"""
-        
-        # Determine format, tone, age for each variant
+    def preference_weights(self):
+        """Current format and tone weights, as used for picking variants"""
+        return {
+            'formats': self._weights(config.FORMAT_DISTRIBUTION, 'liked_formats'),
+            'tones': self._weights(config.TONE_DISTRIBUTION, 'liked_tones')
+        }
+    
+    def pick_variants(self, count):
+        """Determine format, tone, age for each variant (weighted by learned preferences)"""
         variants = []
         for i in range(count):
             format_type = self.get_weighted_choice(config.FORMAT_DISTRIBUTION, 'liked_formats')
@@ -62,37 +206,356 @@ class ContentCreator:
                 'tone': tone,
                 'age_group': age_group
             })
+        return variants
+    
+    def _generation_request(self, count, news_context, specs=None, model=None):
+        """Build the messages.create arguments for a batch of content ideas
+        
+        specs fixes format/tone/age of each variant instead of picking them;
+        model defaults to FINAL_MODEL.
+        """
+        prompt = self._build_generation_prompt(specs or self.pick_variants(count), news_context)
+        model = model or config.FINAL_MODEL
+        return self._with_tool({
+            'model': model,
+            'max_tokens': config.DRAFT_MAX_TOKENS if model == config.DRAFT_MODEL else 4000,
+            'system': self._system(),
+            'messages': [{
+                "role": "user",
+                "content": prompt
+            }]
+        }, VARIANTS_TOOL)
+    
+    def _with_tool(self, request, tool):
+        """Force the answer through a tool call whose input follows the variant schema
         
-        # Build prompt for Claude
-        prompt = self._build_generation_prompt(variants, news_context)
+        Every request offers the same tool list, since tools are part of the
+        cached prefix; tool_choice picks the one to call.
+        """
+        if config.STRUCTURED_OUTPUT:
+            request['tools'] = TOOLS
+            request['tool_choice'] = {'type': 'tool', 'name': tool['name']}
+        return request
+    
+    def _parse_json(self, message):
+        """The JSON object of a response: the tool call input, or the text without markdown code blocks"""
+        for block in message.content:
+            if getattr(block, 'type', None) == 'tool_use':
+                return block.input
+        response_text = ''.join(getattr(block, 'text', '') for block in message.content)
+        response_text = response_text.replace('```json\n', '').replace('```\n', '').replace('```', '').strip()
+        return json.loads(response_text)
+    
+    def is_repeat(self, variant, record=True):
+        """Check a new variant against everything generated before, indexing it if it is new
+        
+        record=False only checks (the variant pool indexes its variants when they are handed out).
+        """
+        if not config.DUPLICATE_CHECK:
+            return False
+        if record:
+            duplicate_of = self.duplicates.check_and_add(variant)
+        else:
+            duplicate_of = self.duplicates.find_duplicate(variant)
+        if duplicate_of is not None:
+            print(f"Skipping near-duplicate of \"{duplicate_of}\": {variant.get('title')}")
+            return True
+        return False
+    
+    def _accept(self, variant, index=True, record=True):
+        """The validated variant if it is well-formed and new, otherwise None
         
-        # Call Claude API
+        index=False only validates (drafts are checked against the index when ranked).
+        """
         try:
-            message = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=4000,
-                messages=[{
-                    "role": "user",
-                    "content": prompt
-                }]
-            )
-            
-            response_text = message.content[0].text
-            
-            # Parse JSON response
-            # Remove markdown code blocks if present
-            response_text = response_text.replace('```json\n', '').replace('```\n', '').replace('```', '').strip()
-            
-            content_data = json.loads(response_text)
-            
-            return content_data.get('variants', [])
-            
+            variant = validate_variant(variant)
+        except VariantError as e:
+            print(f"Invalid variant: {e}")
+            return None
+        return None if index and self.is_repeat(variant, record) else variant
+    
+    def _salvage(self, message, expected, index=True, record=True):
+        """Usable variants of a response by position (None where invalid or repeated) and the parse outcome
+        
+        A response that doesn't parse at all leaves every position empty.
+        """
+        try:
+            variants = self._parse_json(message).get('variants')
+            if not isinstance(variants, list):
+                raise VariantError('no variants array')
+        except (ValueError, AttributeError) as e:
+            print(f"Error parsing content: {e}")
+            return [None] * expected, {'parse_failed': True, 'invalid_variants': 0, 'repeated_variants': 0}
+        
+        accepted = []
+        repeats = 0
+        for variant in variants[:expected]:
+            variant = self._accept(variant, index=False)
+            if variant is not None and index and self.is_repeat(variant, record):
+                variant = None
+                repeats += 1
+            accepted.append(variant)
+        accepted += [None] * (expected - len(accepted))
+        invalid = sum(1 for variant in accepted if variant is None) - repeats
+        return accepted, {'parse_failed': False, 'invalid_variants': invalid, 'repeated_variants': repeats}
+    
+    def filter_duplicates(self, variants):
+        """Drop variants that are malformed or nearly repeat earlier content"""
+        return [variant for variant in map(self._accept, variants) if variant is not None]
+    
+    def generate_content_ideas(self, count=3, news_context=None):
+        """Generate content ideas using Claude API"""
+        try:
+            start = time.perf_counter()
+            message = self.client.messages.create(**self._generation_request(count, news_context))
         except Exception as e:
             print(f"Error generating content: {e}")
             return []
+        
+        variants, outcome = self._salvage(message, count)
+        self._record_usage('generate', message, start, **outcome)
+        return [variant for variant in variants if variant is not None]
+    
+    async def agenerate_content_ideas(self, count=3, news_context=None, specs=None, first_attempt=0):
+        """Async generate_content_ideas - doesn't block the event loop, can be cancelled
+        
+        Returns the usable variants; see agenerate_pairs for retries and
+        tiered generation.
+        """
+        pairs = await self.agenerate_pairs(specs or self.pick_variants(count), news_context, first_attempt)
+        return [variant for _, variant in pairs if variant is not None]
+    
+    async def agenerate_pairs(self, specs, news_context=None, first_attempt=0, record=True):
+        """(spec, variant) for each requested spec, in order; variant is None where nothing usable came back
+        
+        Valid variants of a response are kept; only the ones that were
+        malformed, near-duplicates or missing are requested again, up to
+        GENERATION_RETRIES more times. first_attempt=1 makes the first
+        request count as a retry (of a stream that came up short).
+        
+        With TIERED_GENERATION, variants are drafted and ranked first (see
+        _agenerate_tiered) and the retries top up whatever that left
+        unfilled; if drafting produced nothing, every spec goes this way.
+        
+        record=False leaves the variants out of the duplicate index (see is_repeat).
+        """
+        pairs = [[spec, None] for spec in specs]
+        if config.TIERED_GENERATION and first_attempt == 0:
+            finals = await self._agenerate_tiered(specs, news_context, record)
+            for pair, final in zip(pairs, finals):
+                pair[:] = final  # A pick may come from an extra draft spec
+            if finals:
+                first_attempt = 1
+        missing = [idx for idx, (_, variant) in enumerate(pairs) if variant is None]
+        
+        for attempt in range(first_attempt, config.GENERATION_RETRIES + 1):
+            if not missing:
+                break
+            wanted = [pairs[idx][0] for idx in missing]
+            try:
+                start = time.perf_counter()
+                message = await self._create_message(**self._generation_request(len(wanted), news_context, wanted))
+            except Exception as e:
+                print(f"Error generating content: {e}")
+                self.fanout.observe(len(wanted), 0.0, ok=False)
+                break
+            
+            variants, outcome = self._salvage(message, len(wanted), record=record)
+            self._observe_generation(len(wanted), self._record_usage(
+                'generate', message, start, retry=attempt > 0, **outcome
+            ))
+            for idx, variant in zip(missing, variants):
+                pairs[idx][1] = variant
+            missing = [idx for idx in missing if pairs[idx][1] is None]
+        
+        return [tuple(pair) for pair in pairs]
+    
+    async def astream_content_ideas(self, count=3, news_context=None):
+        """Async generator of content ideas, each yielded as soon as the model finishes it
+        
+        Rendering and sending the first variants overlaps with the model
+        writing the rest. Variants that were malformed, repeated or never
+        arrived are requested again once the stream is done.
+        
+        The stream is read by its own task, which holds the API concurrency
+        slot only while reading; the consumer takes variants from a queue.
+        """
+        if config.TIERED_GENERATION:
+            # Nothing to stream: drafts have to be ranked before the finals are written
+            for variant in await self.agenerate_content_ideas(count=count, news_context=news_context):
+                yield variant
+            return
+        
+        specs = self.pick_variants(count)
+        ready = asyncio.Queue()
+        reader = asyncio.ensure_future(self._read_stream(count, news_context, specs, ready))
+        try:
+            while True:
+                variant = await ready.get()
+                if variant is None:
+                    break
+                yield variant
+            missing = await reader
+        finally:
+            reader.cancel()
+        
+        if missing:
+            for variant in await self.agenerate_content_ideas(
+                news_context=news_context, specs=[specs[idx] for idx in missing], first_attempt=1
+            ):
+                yield variant
+    
+    async def _read_stream(self, count, news_context, specs, ready):
+        """Stream one generation request into the ready queue (None when done)
+        
+        Returns the positions of the specs that still need a variant.
+        """
+        parser = VariantStreamParser()
+        received = 0
+        missing = []
+        repeats = 0
+        try:
+            async with self.semaphore:
+                start = time.perf_counter()
+                try:
+                    async with self.async_client.messages.stream(**self._generation_request(count, news_context, specs)) as stream:
+                        self.fanout.observe_headers(stream.response.headers)
+                        async for text in self._stream_json(stream):
+                            for variant in parser.feed(text):
+                                received += 1
+                                accepted = self._accept(variant, index=False) if received <= count else None
+                                if accepted is not None and self.is_repeat(accepted):
+                                    accepted = None
+                                    repeats += 1
+                                if accepted is None:
+                                    missing.append(received - 1)
+                                else:
+                                    ready.put_nowait(accepted)
+                        message = await stream.get_final_message()
+                except anthropic.RateLimitError as e:
+                    self.fanout.observe_rate_limited(e.response.headers)
+                    raise
+            self._observe_generation(count, self._record_usage(
+                'stream', message, start, parse_failed=received == 0,
+                invalid_variants=sum(1 for idx in missing if idx < count) - repeats + max(count - received, 0),
+                repeated_variants=repeats
+            ))
+        except Exception as e:
+            print(f"Error streaming content: {e}")
+            self.fanout.observe(count, 0.0, ok=False)
+        finally:
+            ready.put_nowait(None)
+        
+        return [idx for idx in missing if idx < count] + list(range(received, count))
+    
+    async def afanout_content_ideas(self, count=3, news_context=None):
+        """Async generator of content ideas from one or several parallel requests
+        
+        FanoutPolicy picks the split from observed latency, errors and rate
+        limits (each generation call reports to it, see _observe_generation).
+        Variants are yielded as each request finishes, so the first
+        ones can be rendered while slower requests are still running. A
+        single request is streamed when STREAM_GENERATION is on.
+        """
+        sizes = self.fanout.group_sizes(count)
+        
+        if len(sizes) == 1 and config.STREAM_GENERATION:
+            async for variant in self.astream_content_ideas(count=count, news_context=news_context):
+                yield variant
+            return
+        
+        specs = self.pick_variants(count)
+        groups = []
+        offset = 0
+        for size in sizes:
+            groups.append(specs[offset:offset + size])
+            offset += size
+        
+        tasks = [asyncio.ensure_future(self.agenerate_content_ideas(news_context=news_context, specs=group))
+                 for group in groups]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                for variant in await finished:
+                    yield variant
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def _agenerate_tiered(self, specs, news_context, record=True):
+        """Draft DRAFT_OVERSAMPLE x as many variants on DRAFT_MODEL, polish the best on FINAL_MODEL
+        
+        Drafts are ranked locally (candidate_ranker) by length fit, novelty and
+        learned preferences. Returns (spec, final) pairs, fewer than specs (or
+        none) if drafting came up short.
+        """
+        extra = max(round(len(specs) * config.DRAFT_OVERSAMPLE) - len(specs), 0)
+        candidate_specs = specs + self.pick_variants(extra)
+        try:
+            start = time.perf_counter()
+            message = await self._create_message(**self._generation_request(
+                len(candidate_specs), news_context, candidate_specs, model=config.DRAFT_MODEL
+            ))
+        except Exception as e:
+            print(f"Error drafting content: {e}")
+            return []
+        
+        drafts, outcome = self._salvage(message, len(candidate_specs), index=False)
+        self._record_usage('draft', message, start, **outcome)
+        threshold = config.DUPLICATE_THRESHOLD if config.DUPLICATE_CHECK else float('inf')
+        picks = candidate_ranker.pick(
+            [(spec, draft) for spec, draft in zip(candidate_specs, drafts) if draft is not None],
+            len(specs), self.preference_weights(), self.duplicates, threshold
+        )
+        if not picks:
+            return []
+        
+        try:
+            start = time.perf_counter()
+            message = await self._create_message(**self._polish_request(picks))
+            polished, outcome = self._salvage(message, len(picks), record=record)
+            self._record_usage('polish', message, start, **outcome)
+        except Exception as e:
+            print(f"Error polishing content: {e}")
+            polished = [None] * len(picks)
+        
+        # A draft stands in for a polish that failed
+        finals = []
+        for (spec, draft), final in zip(picks, polished):
+            if final is None and not self.is_repeat(draft, record):
+                final = draft
+            if final is not None:
+                finals.append((spec, final))
+        return finals
+    
+    def _polish_request(self, picks):
+        """Build the messages.create arguments for polishing ranked drafts on FINAL_MODEL"""
+        drafts = [dict(draft, tone=spec['tone'], age_group=spec['age_group']) for spec, draft in picks]
+        prompt = f"""ქვემოთ არის {len(drafts)} ვარიანტის მონახაზი. გააუმჯობესე თითოეული: შეინარჩუნე თემა, ფორმატი, ტონი და ასაკობრივი ჯგუფი, დახვეწე ენა, გახადე უფრო ზუსტი და პრაქტიკული.
+{json.dumps(drafts, ensure_ascii=False, indent=2)}{self._style_section()}
+
+დააბრუნე {{"variants": [...]}} JSON სტრუქტურა, ვარიანტები იმავე რიგით."""
+        return self._with_tool({
+            'model': config.FINAL_MODEL,
+            'max_tokens': 4000,
+            'system': self._system(),
+            'messages': [{
+                "role": "user",
+                "content": prompt
+            }]
+        }, VARIANTS_TOOL)
+    
+    async def _stream_json(self, stream):
+        """The response JSON as it streams: tool call input deltas, or plain text"""
+        if not config.STRUCTURED_OUTPUT:
+            async for text in stream.text_stream:
+                yield text
+            return
+        async for event in stream:
+            if event.type == 'input_json':
+                yield event.partial_json
     
     def _build_generation_prompt(self, variants, news_context):
-        """Build the prompt for Claude API"""
+        """Build the per-call user prompt (variants, news, style notes) for Claude API"""
         
         age_descriptions = {
             'preschool': 'სკოლამდელი ასაკი (3-7 წელი)',
@@ -125,108 +588,95 @@ class ContentCreator:
         
         news_section = ""
         if news_context:
-            news_section = f"""
-📰 ბოლოდროინდელი ნიუსები რომელზეც შეიძლება რეაგირება:
+            news_section = f"""📰 ბოლოდროინდელი ნიუსები რომელზეც შეიძლება რეაგირება:
 {news_context}
 
 შეგიძლია ამ ნიუსებზე დაფუძნებული კონტენტის შექმნა, მაგრამ არ არის სავალდებულო.
+
 """
         
-        custom_style_notes = "\n".join(self.preferences.get('custom_edits', [])[-10:]) if self.preferences.get('custom_edits') else ""
+        avoid_section = ""
+        recent_topics = self.duplicates.avoid_digest() if config.DUPLICATE_CHECK else []
+        if recent_topics:
+            avoid_section = "\n\n🚫 ეს თემები უკვე გაშუქდა, არ გაიმეორო:\n" + "\n".join(f"- {title}" for title in recent_topics)
         
-        style_section = ""
-        if custom_style_notes:
-            style_section = f"""
-💡 ნიკას სტილის ნოტები (შენი წინა რედაქტირებებიდან სწავლა):
-{custom_style_notes}
-"""
+        style_section = self._style_section()
         
-        prompt = f"""შენ ხარ ნიკა გაბლიშვილი - გამოცდილი ფსიქოკონსულტანტი მშობლებისთვის, ჰარვარდის უნივერსიტეტის კურსდამთავრებული, 20 წლიანი პრაქტიკით.
-
-შენი ამოცანაა შექმნა TikTok კონტენტი ქართულ მშობლებისთვის. კონტენტი უნდა იყოს:
-- პრაქტიკული და გამოსადეგი
-- მეცნიერულად დასაბუთებული
-- ადვილად გასაგები
-- მოკლე და კონკრეტური (TikTok ფორმატი)
-
-{news_section}
-
-გენერირება უნდა გააკეთო შემდეგი {len(variants)} ვარიანტისთვის:
-{''.join(variants_desc)}
-
-{style_section}
-
-ᲙᲠᲘᲢᲘᲙᲣᲚᲐᲓ ᲛᲜᲘᲨᲕᲜᲔᲚᲝᲕᲐᲜᲘ: 
-1. ყოველთვის პასუხობ მხოლოდ და მხოლოდ VALID JSON ფორმატში
-2. არ იყენებ markdown code blocks (```json)
-3. არ იყენებ არანაირ დამატებით ტექსტს JSON-ის გარეთ
-
-JSON სტრუქტურა:
-{{
-  "variants": [
-    {{
-      "format": "myth_vs_reality",
-      "title": "მოკლე სათაური",
-      "main_text": "ძირითადი ტექსტი რომელიც გამოჩნდება სურათზე (მაქსიმუმ 200 სიმბოლო)",
-      "caption": "Instagram/TikTok caption - უფრო დეტალური ახსნა (მაქსიმუმ 500 სიმბოლო)",
-      "hashtags": ["hashtag1", "hashtag2", "hashtag3"],
-      "visual_notes": "როგორ უნდა გამოიყურებოდეს ვიზუალურად - ფერები, ელემენტები"
-    }}
-  ]
-}}
-
-გაიხსენე: 
-- ტექსტი უნდა იყოს ᲥᲐᲠᲗᲣᲚᲐᲓ
-- მოკლე და კონკრეტული (TikTok vertical ფორმატი)
-- ემოციურად რეზონანსული მშობლებისთვის
-- პრაქტიკული - რაღაც რასაც დღესვე გამოიყენებენ
+        # Only the per-call parts; persona, rules and schema are in SYSTEM_PROMPT
+        prompt = f"""{news_section}გენერირება უნდა გააკეთო შემდეგი {len(variants)} ვარიანტისთვის:
+{''.join(variants_desc)}{avoid_section}{style_section}
 
-არ დაგავიწყდეს - მხოლოდ JSON, არაფერი სხვა!"""
+დააბრუნე {{"variants": [...]}} JSON სტრუქტურა."""
         
         return prompt
     
-    def regenerate_with_feedback(self, original_content, feedback_text):
-        """Regenerate content based on user feedback"""
+    def _style_section(self):
+        """Style notes learned from the user's recent edits, as a prompt section"""
+        custom_style_notes = "\n".join(self.preferences.get('custom_edits', [])[-10:]) if self.preferences.get('custom_edits') else ""
         
-        prompt = f"""შენ ხარ ნიკა გაბლიშვილი - ფსიქოკონსულტანტი მშობლებისთვის.
+        style_section = ""
+        if custom_style_notes:
+            style_section = f"""
 
-წინა კონტენტი იყო:
+💡 ნიკას სტილის ნოტები (შენი წინა რედაქტირებებიდან სწავლა):
+{custom_style_notes}"""
+        return style_section
+    
+    def _system(self):
+        """The stable system prefix, marked for prompt caching"""
+        block = {'type': 'text', 'text': TOOL_SYSTEM_PROMPT if config.STRUCTURED_OUTPUT else SYSTEM_PROMPT}
+        if config.PROMPT_CACHING:
+            block['cache_control'] = {'type': 'ephemeral'}
+        return [block]
+    
+    def _feedback_request(self, original_content, feedback_text):
+        """Build the messages.create arguments for a feedback rewrite"""
+        prompt = f"""წინა კონტენტი იყო:
 {json.dumps(original_content, ensure_ascii=False, indent=2)}
 
 მომხმარებლის feedback:
 "{feedback_text}"
 
 გთხოვ, შექმნა გაუმჯობესებული ვერსია მომხმარებლის კომენტარების გათვალისწინებით.
-
-ᲙᲠᲘᲢᲘᲙᲣᲚᲐᲓ ᲛᲜᲘᲨᲕᲜᲔᲚᲝᲕᲐᲜᲘ:
-- პასუხობ მხოლოდ VALID JSON ფორმატში
-- არ იყენებ markdown (```json)
-- არ იყენებ დამატებით ტექსტს
-
-JSON სტრუქტურა:
-{{
-  "format": "...",
-  "title": "...",
-  "main_text": "...",
-  "caption": "...",
-  "hashtags": ["..."],
-  "visual_notes": "..."
-}}"""
-        
+დააბრუნე ერთი ვარიანტის JSON სტრუქტურა."""
+        return self._with_tool({
+            'model': config.FINAL_MODEL,
+            'max_tokens': 2000,
+            'system': self._system(),
+            'messages': [{
+                "role": "user",
+                "content": prompt
+            }]
+        }, VARIANT_TOOL)
+    
+    def _revised(self, message, start, original_content):
+        """The validated rewrite in a feedback response, or the original if it is unusable"""
         try:
-            message = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=2000,
-                messages=[{
-                    "role": "user",
-                    "content": prompt
-                }]
-            )
-            
-            response_text = message.content[0].text
-            response_text = response_text.replace('```json\n', '').replace('```\n', '').replace('```', '').strip()
+            revised = validate_variant(self._parse_json(message))
+        except ValueError as e:
+            print(f"Error parsing revised content: {e}")
+            self._record_usage('feedback', message, start, parse_failed=True)
+            return original_content
+        self._record_usage('feedback', message, start)
+        return revised
+    
+    def regenerate_with_feedback(self, original_content, feedback_text):
+        """Regenerate content based on user feedback"""
+        try:
+            start = time.perf_counter()
+            message = self.client.messages.create(**self._feedback_request(original_content, feedback_text))
+            return self._revised(message, start, original_content)
             
-            return json.loads(response_text)
+        except Exception as e:
+            print(f"Error regenerating content: {e}")
+            return original_content
+    
+    async def aregenerate_with_feedback(self, original_content, feedback_text):
+        """Async regenerate_with_feedback"""
+        try:
+            start = time.perf_counter()
+            message = await self._create_message(**self._feedback_request(original_content, feedback_text))
+            return self._revised(message, start, original_content)
             
         except Exception as e:
             print(f"Error regenerating content: {e}")
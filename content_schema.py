@@ -0,0 +1,94 @@
+"""
+Content Schema - The variant record, its JSON schema for tool-use output, and validation
+"""
+from collections import namedtuple
+import config
+
+# One generated post; the rest of the bot passes it around as a dict (Variant._asdict())
+Variant = namedtuple('Variant', ['format', 'title', 'main_text', 'caption', 'hashtags', 'visual_notes'],
+                     defaults=[''])
+
+# Upper bounds well above what the prompt asks for; beyond them the text can't fit the image
+MAX_LENGTHS = {
+    'title': 150,
+    'main_text': 400,
+    'caption': 1200,
+    'visual_notes': 500
+}
+MAX_HASHTAGS = 15
+
+
+class VariantError(ValueError):
+    """A generated variant is missing fields or has values of the wrong type"""
+
+
+VARIANT_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'format': {'type': 'string', 'enum': list(config.FORMAT_DISTRIBUTION)},
+        'title': {'type': 'string', 'maxLength': MAX_LENGTHS['title']},
+        'main_text': {'type': 'string', 'maxLength': MAX_LENGTHS['main_text']},
+        'caption': {'type': 'string', 'maxLength': MAX_LENGTHS['caption']},
+        'hashtags': {'type': 'array', 'items': {'type': 'string'}, 'maxItems': MAX_HASHTAGS},
+        'visual_notes': {'type': 'string'}
+    },
+    'required': ['format', 'title', 'main_text', 'caption', 'hashtags']
+}
+
+# Tools the model is forced to call, so the answer arrives as schema-shaped JSON input
+VARIANTS_TOOL = {
+    'name': 'submit_variants',
+    'description': 'ახალი კონტენტის ვარიანტების დაბრუნება, თითო ელემენტი თითო მოთხოვნილი ვარიანტისთვის, იმავე რიგით.',
+    'input_schema': {
+        'type': 'object',
+        'properties': {'variants': {'type': 'array', 'items': VARIANT_SCHEMA}},
+        'required': ['variants']
+    }
+}
+VARIANT_TOOL = {
+    'name': 'submit_variant',
+    'description': 'გაუმჯობესებული ვარიანტის დაბრუნება.',
+    'input_schema': VARIANT_SCHEMA
+}
+# Sent unchanged on every request: the tool list is part of the cached prompt prefix
+TOOLS = [VARIANTS_TOOL, VARIANT_TOOL]
+
+
+def _text(data, field, required=True):
+    value = data.get(field)
+    if value is None and not required:
+        return ''
+    if not isinstance(value, str) or (required and not value.strip()):
+        raise VariantError(f"{field}: expected non-empty text, got {value!r:.40}")
+    value = value.strip()
+    if len(value) > MAX_LENGTHS.get(field, len(value)):
+        raise VariantError(f"{field}: {len(value)} characters, limit {MAX_LENGTHS[field]}")
+    return value
+
+
+def validate_variant(data):
+    """Check one generated variant, returns it as a clean dict or raises VariantError
+
+    Hashtags given as one space-separated string are split.
+    """
+    if not isinstance(data, dict):
+        raise VariantError(f"expected an object, got {type(data).__name__}")
+
+    format_type = data.get('format')
+    if format_type not in config.FORMAT_DISTRIBUTION:
+        raise VariantError(f"format: unknown format {format_type!r}")
+
+    hashtags = data.get('hashtags')
+    if isinstance(hashtags, str):
+        hashtags = hashtags.split()
+    if not isinstance(hashtags, list) or not all(isinstance(tag, str) for tag in hashtags):
+        raise VariantError(f"hashtags: expected a list of text, got {hashtags!r:.40}")
+
+    return Variant(
+        format=format_type,
+        title=_text(data, 'title'),
+        main_text=_text(data, 'main_text'),
+        caption=_text(data, 'caption'),
+        hashtags=[tag.strip() for tag in hashtags if tag.strip()][:MAX_HASHTAGS],
+        visual_notes=_text(data, 'visual_notes', required=False)
+    )._asdict()
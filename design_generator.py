@@ -2,20 +2,42 @@
 Design Generator - Creates beautiful TikTok images using Pillow
 """
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
+from contextlib import contextmanager
 import random
+import time
+import io
 import os
 import config
+import gradient_engine
+import layout_plan
+from font_cache import shared_font_cache
+from layer_cache import LayerCache
+from storage_manager import StorageManager
+from text_layout import TextLayout
 import textwrap
 
+# Bump whenever a change alters rendered pixels, so cached renders are not reused
+RENDERER_VERSION = '1'
+
 class DesignGenerator:
-    def __init__(self):
-        self.width = config.IMAGE_WIDTH
-        self.height = config.IMAGE_HEIGHT
+    def __init__(self, width=None, height=None, scale=1.0, storage=None):
+        # Layout coordinates and font sizes are designed for 1080x1920 and scaled
+        self.scale = scale
+        # StorageManager that save_image writes into (the bot's own, so its lock is shared)
+        self.storage = storage
+        self.width = width or round(config.IMAGE_WIDTH * scale)
+        self.height = height or round(config.IMAGE_HEIGHT * scale)
+        # Optional object with start(stage) and record(stage, seconds), used by benchmark.py
+        self.profiler = None
+        self.layer_cache = LayerCache()
+        self.text_layout = TextLayout()
+        self.font_cache = shared_font_cache
         self.load_fonts()
     
     def load_fonts(self):
         """Load Georgian fonts"""
         self.fonts = {}
+        self.font_paths = {}
         font_sizes = {
             'title': 80,
             'main': 60,
@@ -23,6 +45,7 @@ class DesignGenerator:
             'small': 35,
             'branding': 28
         }
+        self.font_sizes = {name: self._s(size) for name, size in font_sizes.items()}
         
         # Try to load system fonts
         font_paths = [
@@ -35,315 +58,241 @@ class DesignGenerator:
         for size_name, size in font_sizes.items():
             loaded = False
             for font_path in font_paths:
-                try:
-                    if 'Bold' in font_path and size_name in ['title', 'main']:
-                        self.fonts[size_name] = ImageFont.truetype(font_path, size)
-                        loaded = True
-                        break
-                    elif 'Bold' not in font_path:
-                        self.fonts[size_name] = ImageFont.truetype(font_path, size)
-                        loaded = True
-                        break
-                except:
+                # Bold only for title and main text
+                if 'Bold' in font_path and size_name not in ['title', 'main']:
                     continue
+                
+                font = self.font_cache.get(font_path, self._s(size))
+                if font is not None:
+                    self.fonts[size_name] = font
+                    self.font_paths[size_name] = font_path
+                    loaded = True
+                    break
             
             if not loaded:
                 # Fallback to default font
                 self.fonts[size_name] = ImageFont.load_default()
+                self.font_paths[size_name] = None
+    
+    @staticmethod
+    def pick_style(seed=None):
+        """Pick a random visual style by the configured distribution (reproducible with seed)"""
+        rng = random.Random(seed) if seed is not None else random
+        return rng.choices(
+            list(config.VISUAL_STYLE_DISTRIBUTION.keys()),
+            weights=list(config.VISUAL_STYLE_DISTRIBUTION.values())
+        )[0]
     
     def generate_image(self, content, style=None):
         """Generate image based on content and style"""
         if style is None:
-            style = random.choices(
-                list(config.VISUAL_STYLE_DISTRIBUTION.keys()),
-                weights=list(config.VISUAL_STYLE_DISTRIBUTION.values())
-            )[0]
-        
-        # Create base image
-        if style == 'minimalist':
-            return self._create_minimalist(content)
-        elif style == 'warm_cozy':
-            return self._create_warm_cozy(content)
-        elif style == 'infographic':
-            return self._create_infographic(content)
-        elif style == 'gradient':
-            return self._create_gradient(content)
-        elif style == 'story_card':
-            return self._create_story_card(content)
-        else:
-            return self._create_minimalist(content)
-    
-    def _create_minimalist(self, content):
-        """Create minimalist clean design"""
-        img = Image.new('RGB', (self.width, self.height), color='white')
-        draw = ImageDraw.Draw(img)
-        
-        colors = config.COLOR_PALETTES['minimalist']
-        accent_color = colors[2]  # Blue accent
-        text_color = colors[1]    # Dark text
-        
-        # Add subtle top decoration
-        draw.rectangle([(0, 0), (self.width, 40)], fill=accent_color)
-        
-        # Title
-        title = content.get('title', '')
-        if title:
-            y_pos = 200
-            wrapped_title = self._wrap_text(title, self.fonts['title'], self.width - 200)
-            for line in wrapped_title:
-                bbox = draw.textbbox((0, 0), line, font=self.fonts['title'])
-                text_width = bbox[2] - bbox[0]
-                x = (self.width - text_width) // 2
-                draw.text((x, y_pos), line, fill=text_color, font=self.fonts['title'])
-                y_pos += 100
-        
-        # Main text
-        main_text = content.get('main_text', '')
-        y_pos += 100
-        wrapped_main = self._wrap_text(main_text, self.fonts['main'], self.width - 200)
-        for line in wrapped_main:
-            bbox = draw.textbbox((0, 0), line, font=self.fonts['main'])
-            text_width = bbox[2] - bbox[0]
-            x = (self.width - text_width) // 2
-            draw.text((x, y_pos), line, fill=text_color, font=self.fonts['main'])
-            y_pos += 80
+            style = self.pick_style()
+        if style not in config.STYLE_TEMPLATES:
+            style = 'minimalist'
+        
+        plan = self._get_plan(style)
+        img = self._get_base_layer(style)
+        # Translucent text (shadows) is blended straight onto the RGB canvas
+        draw = ImageDraw.Draw(img, 'RGBA' if plan.translucent else None)
+        
+        y_pos = 0
+        for block in plan.text:
+            if block.bullet:
+                y_pos = self._draw_bullet_block(draw, block, content, y_pos)
+            else:
+                y_pos = self._draw_text_block(draw, block, content, y_pos)
         
         # Branding at bottom
         self._add_branding(draw, img)
         
         return img
     
-    def _create_warm_cozy(self, content):
-        """Create warm and cozy design with pastels"""
-        colors = config.COLOR_PALETTES['warm_cozy']
-        
-        # Gradient background
-        img = self._create_vertical_gradient(colors[0], colors[1])
-        draw = ImageDraw.Draw(img)
-        
-        text_color = colors[3]  # Warm orange/red
-        
-        # Decorative rounded rectangle
-        margin = 100
-        rect_coords = [margin, 300, self.width - margin, self.height - 400]
-        self._draw_rounded_rectangle(draw, rect_coords, colors[2], radius=50)
-        
-        # Title
-        title = content.get('title', '')
-        if title:
-            y_pos = 400
-            wrapped_title = self._wrap_text(title, self.fonts['title'], self.width - 300)
-            for line in wrapped_title:
-                bbox = draw.textbbox((0, 0), line, font=self.fonts['title'])
-                text_width = bbox[2] - bbox[0]
-                x = (self.width - text_width) // 2
-                draw.text((x, y_pos), line, fill=text_color, font=self.fonts['title'])
-                y_pos += 100
-        
-        # Main text
-        main_text = content.get('main_text', '')
-        y_pos += 80
-        wrapped_main = self._wrap_text(main_text, self.fonts['main'], self.width - 300)
-        for line in wrapped_main:
-            bbox = draw.textbbox((0, 0), line, font=self.fonts['main'])
-            text_width = bbox[2] - bbox[0]
-            x = (self.width - text_width) // 2
-            draw.text((x, y_pos), line, fill=text_color, font=self.fonts['main'])
-            y_pos += 75
-        
-        # Branding
-        self._add_branding(draw, img)
-        
-        return img
+    def _get_plan(self, style):
+        """Get the compiled layout plan of a style for this canvas"""
+        return layout_plan.get_plan(style, self.width, self.height, self.scale)
     
-    def _create_infographic(self, content):
-        """Create infographic style"""
-        colors = config.COLOR_PALETTES['infographic']
-        img = Image.new('RGB', (self.width, self.height), color=colors[0])
-        draw = ImageDraw.Draw(img)
-        
-        # Header bar
-        draw.rectangle([(0, 0), (self.width, 200)], fill=colors[1])
-        
-        # Title in header
-        title = content.get('title', '')
-        if title:
-            wrapped_title = self._wrap_text(title, self.fonts['title'], self.width - 100)
-            y_pos = 60
-            for line in wrapped_title:
-                bbox = draw.textbbox((0, 0), line, font=self.fonts['title'])
-                text_width = bbox[2] - bbox[0]
-                x = (self.width - text_width) // 2
-                draw.text((x, y_pos), line, fill='white', font=self.fonts['title'])
-                y_pos += 90
+    def _draw_text_block(self, draw, block, content, y_pos):
+        """Lay out and draw one text block, returns the y position after it"""
+        if block.y is not None:
+            y_pos = block.y
+        y_pos += block.gap
+        text = content.get(block.field, '')
+        
+        if block.fit_bottom is not None:
+            font, lines = self._layout_main_text(text, block.max_width, y_pos, block.line_height,
+                                                 bottom=block.fit_bottom, font_name=block.font)
+        elif text:
+            font = self.fonts[block.font]
+            lines = self._layout(text, font, block.max_width, y_pos, block.line_height,
+                                 center_width=self.width)
+        else:
+            return y_pos
         
-        # Main content in boxes
-        y_pos = 350
-        main_text = content.get('main_text', '')
+        self._draw_lines(draw, lines, font, block.fill,
+                         shadow_offset=block.shadow_offset, shadow_fill=block.shadow_fill)
+        return y_pos + len(lines) * block.line_height
+    
+    def _draw_bullet_block(self, draw, block, content, y_pos):
+        """Draw a text field as a bullet list, one item per line of the source text"""
+        if block.y is not None:
+            y_pos = block.y
+        y_pos += block.gap
+        text = content.get(block.field, '')
+        font = self.fonts[block.font]
         
         # Split by newlines or sentences for bullet points
-        lines = main_text.split('\n') if '\n' in main_text else [main_text]
+        points = text.split('\n') if '\n' in text else [text]
         
-        for idx, line in enumerate(lines[:5]):  # Max 5 points
-            if not line.strip():
+        for point in points[:block.max_items]:
+            if not point.strip():
                 continue
             
             # Circle bullet
-            circle_x = 150
-            draw.ellipse([(circle_x - 25, y_pos - 25), (circle_x + 25, y_pos + 25)], 
-                        fill=colors[2])
+            bullet = block.bullet
+            draw.ellipse([(bullet.x - bullet.radius, y_pos - bullet.radius),
+                          (bullet.x + bullet.radius, y_pos + bullet.radius)], fill=bullet.fill)
             
             # Text
-            wrapped_line = self._wrap_text(line, self.fonts['main'], self.width - 300)
-            line_y = y_pos - 20
-            for wrapped in wrapped_line:
-                draw.text((220, line_y), wrapped, fill=colors[1], font=self.fonts['main'])
-                line_y += 70
+            lines = self._layout(point, font, block.max_width, y_pos + block.text_offset,
+                                 block.line_height, x=block.x)
+            self._draw_lines(draw, lines, font, block.fill,
+                             shadow_offset=block.shadow_offset, shadow_fill=block.shadow_fill)
             
-            y_pos += len(wrapped_line) * 70 + 50
+            y_pos += len(lines) * block.line_height + block.spacing
         
-        # Branding
-        self._add_branding(draw, img)
-        
-        return img
+        return y_pos
     
-    def _create_gradient(self, content):
-        """Create modern gradient design"""
-        colors = config.COLOR_PALETTES['gradient']
-        
-        # Diagonal gradient
-        img = self._create_diagonal_gradient(colors[0], colors[1])
-        
-        # Add semi-transparent overlay
-        overlay = Image.new('RGBA', (self.width, self.height), (255, 255, 255, 100))
-        img = Image.alpha_composite(img.convert('RGBA'), overlay)
-        
-        draw = ImageDraw.Draw(img)
-        
-        # Title
-        title = content.get('title', '')
-        if title:
-            y_pos = 300
-            wrapped_title = self._wrap_text(title, self.fonts['title'], self.width - 200)
-            for line in wrapped_title:
-                # Text shadow
-                bbox = draw.textbbox((0, 0), line, font=self.fonts['title'])
-                text_width = bbox[2] - bbox[0]
-                x = (self.width - text_width) // 2
-                draw.text((x+3, y_pos+3), line, fill=(0, 0, 0, 100), font=self.fonts['title'])
-                draw.text((x, y_pos), line, fill='white', font=self.fonts['title'])
-                y_pos += 100
-        
-        # Main text
-        main_text = content.get('main_text', '')
-        y_pos += 100
-        wrapped_main = self._wrap_text(main_text, self.fonts['main'], self.width - 200)
-        for line in wrapped_main:
-            bbox = draw.textbbox((0, 0), line, font=self.fonts['main'])
-            text_width = bbox[2] - bbox[0]
-            x = (self.width - text_width) // 2
-            draw.text((x+2, y_pos+2), line, fill=(0, 0, 0, 100), font=self.fonts['main'])
-            draw.text((x, y_pos), line, fill='white', font=self.fonts['main'])
-            y_pos += 75
-        
-        img = img.convert('RGB')
-        draw = ImageDraw.Draw(img)
-        
-        # Branding
-        self._add_branding(draw, img)
-        
-        return img
+    def _layout_main_text(self, text, max_width, y, line_height, bottom, font_name='main'):
+        """Lay out centered main text, shrinking the font to end above bottom when auto-fit is on"""
+        font = self.fonts[font_name]
+        font_path = self.font_paths.get(font_name)
+        
+        if config.AUTO_FIT_TEXT and font_path:
+            base_size = self.font_sizes[font_name]
+            with self._stage('layout'):
+                size = self.text_layout.fit(
+                    text,
+                    lambda s: self.font_cache.get(font_path, s),
+                    base_size,
+                    min(self._s(config.AUTO_FIT_MIN_FONT_SIZE), base_size),
+                    max_width,
+                    bottom - y,
+                    line_height
+                )
+            if size != base_size:
+                font = self.font_cache.get(font_path, size)
+                line_height = round(line_height * size / base_size)
+        
+        lines = self._layout(text, font, max_width, y, line_height, center_width=self.width)
+        return font, lines
     
-    def _create_story_card(self, content):
-        """Create story card style"""
-        colors = config.COLOR_PALETTES['story_card']
-        img = Image.new('RGB', (self.width, self.height), color=colors[0])
-        draw = ImageDraw.Draw(img)
-        
-        # Large rounded card in center
-        card_margin = 80
-        card_coords = [card_margin, 250, self.width - card_margin, self.height - 350]
-        self._draw_rounded_rectangle(draw, card_coords, 'white', radius=60)
-        
-        # Add shadow effect
-        shadow_coords = [card_margin + 10, 260, self.width - card_margin + 10, self.height - 340]
-        self._draw_rounded_rectangle(draw, shadow_coords, colors[2], radius=60)
-        
-        # Re-draw card on top
-        self._draw_rounded_rectangle(draw, card_coords, 'white', radius=60)
-        
-        # Title
-        title = content.get('title', '')
-        if title:
-            y_pos = 350
-            wrapped_title = self._wrap_text(title, self.fonts['title'], self.width - 300)
-            for line in wrapped_title:
-                bbox = draw.textbbox((0, 0), line, font=self.fonts['title'])
-                text_width = bbox[2] - bbox[0]
-                x = (self.width - text_width) // 2
-                draw.text((x, y_pos), line, fill=colors[3], font=self.fonts['title'])
-                y_pos += 95
-        
-        # Main text
-        main_text = content.get('main_text', '')
-        y_pos += 60
-        wrapped_main = self._wrap_text(main_text, self.fonts['main'], self.width - 280)
-        for line in wrapped_main:
-            bbox = draw.textbbox((0, 0), line, font=self.fonts['main'])
-            text_width = bbox[2] - bbox[0]
-            x = (self.width - text_width) // 2
-            draw.text((x, y_pos), line, fill='#333333', font=self.fonts['main'])
-            y_pos += 70
-        
-        # Branding
-        self._add_branding(draw, img)
-        
-        return img
+    def _s(self, value):
+        """Scale a 1080x1920 design coordinate to this generator's scale"""
+        return int(round(value * self.scale))
     
-    def _wrap_text(self, text, font, max_width):
-        """Wrap text to fit within max_width"""
-        lines = []
-        words = text.split()
-        
-        current_line = []
-        for word in words:
-            test_line = ' '.join(current_line + [word])
-            bbox = font.getbbox(test_line)
-            width = bbox[2] - bbox[0]
-            
-            if width <= max_width:
-                current_line.append(word)
-            else:
-                if current_line:
-                    lines.append(' '.join(current_line))
-                current_line = [word]
-        
-        if current_line:
-            lines.append(' '.join(current_line))
-        
-        return lines
+    def _layout(self, text, font, max_width, y, line_height, x=0, center_width=None):
+        """Lay out a text block through the memoized layout engine"""
+        with self._stage('layout'):
+            return self.text_layout.layout(text, font, max_width, y, line_height,
+                                           x=x, center_width=center_width)
+    
+    def _draw_lines(self, draw, lines, font, fill, shadow_offset=None, shadow_fill=None):
+        """Draw laid out lines, optionally with a drop shadow"""
+        with self._stage('text'):
+            for line in lines:
+                if shadow_offset:
+                    draw.text((line.x + shadow_offset, line.y + shadow_offset), line.text,
+                              fill=shadow_fill, font=font)
+                draw.text((line.x, line.y), line.text, fill=fill, font=font)
+    
+    @contextmanager
+    def _stage(self, name):
+        """Time a render stage when a profiler is attached (profiler.start(name), then record(name, seconds))"""
+        if self.profiler is None:
+            yield
+            return
+        self.profiler.start(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.profiler.record(name, time.perf_counter() - start)
     
     def _add_branding(self, draw, img):
         """Add branding watermark"""
+        with self._stage('branding'):
+            strip, position = self.layer_cache.get(
+                self._layer_key('branding'), self._render_branding_layer
+            )
+            img.paste(strip, position)
+    
+    def _render_branding_layer(self):
+        """Render the branding strip once, returns (strip image, paste position)"""
         branding_text = config.BRANDING
         
+        s = self._s
+        
         # At bottom
-        y_pos = self.height - 120
+        y_pos = self.height - s(120)
         
-        # Semi-transparent background
-        bbox = draw.textbbox((0, y_pos - 20), branding_text, font=self.fonts['branding'])
+        probe = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+        bbox = probe.textbbox((0, y_pos - s(20)), branding_text, font=self.fonts['branding'])
         text_width = bbox[2] - bbox[0]
         x = (self.width - text_width) // 2
         
-        # Draw semi-transparent rectangle
-        padding = 20
-        draw.rectangle([
-            (x - padding, y_pos - 30),
-            (x + text_width + padding, y_pos + 50)
-        ], fill=(255, 255, 255, 200))
+        # Background box (opaque once drawn on the RGB canvas)
+        padding = s(20)
+        box_left, box_top = x - padding, y_pos - s(30)
+        box_right, box_bottom = x + text_width + padding, y_pos + s(50)
+        strip = Image.new('RGB', (box_right - box_left + 1, box_bottom - box_top + 1), (255, 255, 255))
         
         # Draw text
-        draw.text((x, y_pos), branding_text, fill='#2C3E50', font=self.fonts['branding'])
+        draw = ImageDraw.Draw(strip)
+        draw.text((x - box_left, y_pos - box_top), branding_text, fill='#2C3E50', font=self.fonts['branding'])
+        
+        return strip, (box_left, box_top)
+    
+    def _get_base_layer(self, style):
+        """Get a private copy of the cached static background for a style"""
+        with self._stage('background'):
+            base = self.layer_cache.get(
+                self._layer_key(style), lambda: self._render_base_layer(style)
+            )
+            return base.copy()
+    
+    def _layer_key(self, style):
+        """Cache key for static layers: style, palette, canvas size and fonts"""
+        palette = tuple(config.COLOR_PALETTES.get(style, ()))
+        fonts = tuple(
+            (name, getattr(font, 'path', None), getattr(font, 'size', None))
+            for name, font in sorted(self.fonts.items())
+        )
+        return (style, palette, self.width, self.height, self.scale, fonts)
+    
+    def _render_base_layer(self, style):
+        """Render the content-independent background of a style from its plan"""
+        img = None
+        for op in self._get_plan(style).background:
+            if op.type == 'solid':
+                img = Image.new('RGB', (self.width, self.height), color=op.fill)
+            elif op.type == 'gradient':
+                img = gradient_engine.create_gradient(op.kind, self.width, self.height, op.colors)
+            elif op.type == 'rect':
+                ImageDraw.Draw(img).rectangle([op.box[:2], op.box[2:]], fill=op.fill)
+            elif op.type == 'rounded_rect':
+                self._draw_rounded_rectangle(ImageDraw.Draw(img), op.box, op.fill, radius=op.radius)
+            elif op.type == 'overlay':
+                # Semi-transparent wash, composited only over its region
+                self._composite_region(img, op.box or (0, 0, self.width, self.height), op.fill)
+            else:
+                raise ValueError(f"Unknown background layer type: {op.type}")
+        return img
+    
+    def _composite_region(self, img, box, fill):
+        """Alpha-composite a translucent color over box, in place on an RGB image"""
+        region = img.crop(box).convert('RGBA')
+        overlay = Image.new('RGBA', region.size, fill)
+        img.paste(Image.alpha_composite(region, overlay).convert('RGB'), box[:2])
     
     def _draw_rounded_rectangle(self, draw, coords, fill, radius=20):
         """Draw rectangle with rounded corners"""
@@ -355,48 +304,33 @@ class DesignGenerator:
         draw.ellipse([x1, y2 - radius * 2, x1 + radius * 2, y2], fill=fill)
         draw.ellipse([x2 - radius * 2, y2 - radius * 2, x2, y2], fill=fill)
     
-    def _create_vertical_gradient(self, color1, color2):
-        """Create vertical gradient"""
-        img = Image.new('RGB', (self.width, self.height))
-        draw = ImageDraw.Draw(img)
-        
-        # Parse hex colors
-        r1, g1, b1 = int(color1[1:3], 16), int(color1[3:5], 16), int(color1[5:7], 16)
-        r2, g2, b2 = int(color2[1:3], 16), int(color2[3:5], 16), int(color2[5:7], 16)
-        
-        for y in range(self.height):
-            ratio = y / self.height
-            r = int(r1 + (r2 - r1) * ratio)
-            g = int(g1 + (g2 - g1) * ratio)
-            b = int(b1 + (b2 - b1) * ratio)
-            draw.line([(0, y), (self.width, y)], fill=(r, g, b))
-        
-        return img
-    
-    def _create_diagonal_gradient(self, color1, color2):
-        """Create diagonal gradient"""
-        img = Image.new('RGB', (self.width, self.height))
-        draw = ImageDraw.Draw(img)
-        
-        r1, g1, b1 = int(color1[1:3], 16), int(color1[3:5], 16), int(color1[5:7], 16)
-        r2, g2, b2 = int(color2[1:3], 16), int(color2[3:5], 16), int(color2[5:7], 16)
-        
-        max_distance = (self.width ** 2 + self.height ** 2) ** 0.5
-        
-        for y in range(self.height):
-            for x in range(self.width):
-                distance = (x ** 2 + y ** 2) ** 0.5
-                ratio = distance / max_distance
-                r = int(r1 + (r2 - r1) * ratio)
-                g = int(g1 + (g2 - g1) * ratio)
-                b = int(b1 + (b2 - b1) * ratio)
-                draw.point((x, y), fill=(r, g, b))
-        
-        return img
+    def encode_image(self, img):
+        """Encode image to bytes in the configured format"""
+        buffer = io.BytesIO()
+        if config.IMAGE_FORMAT == 'PNG':
+            # PNG is lossless, quality would be ignored
+            img.save(buffer, config.IMAGE_FORMAT)
+        else:
+            img.save(buffer, config.IMAGE_FORMAT, quality=config.IMAGE_QUALITY)
+        return buffer.getvalue()
     
     def save_image(self, img, filename):
         """Save image to file"""
-        os.makedirs(config.GENERATED_DIR, exist_ok=True)
-        filepath = os.path.join(config.GENERATED_DIR, filename)
-        img.save(filepath, config.IMAGE_FORMAT, quality=config.IMAGE_QUALITY)
+        return self.save_encoded(self.encode_image(img), filename)
+    
+    def save_encoded(self, data, filename):
+        """Save already encoded image bytes to file (in its date shard)
+        
+        Writes under the storage lock, like ArchiveWriter, so compaction never
+        sees a half-written file.
+        """
+        if self.storage is None:
+            self.storage = StorageManager()
+        filepath = self.storage.path_for(filename)
+        with self.storage.lock:
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            tmp_path = filepath + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, filepath)
         return filepath
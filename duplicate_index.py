@@ -0,0 +1,171 @@
+"""
+Duplicate Index - Finds near-duplicate content among everything generated so far
+
+Each variant's title + main_text is reduced to character 4-gram shingles
+(Georgian words carry long suffixes, so whole-word matching misses reworded
+repeats), hashed into a MinHash signature and bucketed by LSH bands. A new
+variant is only compared with the few past variants sharing a band, so a
+check stays well under a millisecond however large the history grows.
+
+Signatures are appended to config.CONTENT_INDEX_FILE and reloaded on start.
+"""
+import json
+import os
+import re
+import threading
+import zlib
+from collections import deque
+from datetime import datetime
+import numpy as np
+import config
+
+SHINGLE_SIZE = 4
+NUM_HASHES = 64
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+INDEXED_FIELDS = ('title', 'main_text')
+
+# Fixed seed: signatures must stay comparable across restarts
+_rng = np.random.default_rng(20240613)
+_HASH_A = _rng.integers(1, 2 ** 63, NUM_HASHES, dtype=np.uint64) | np.uint64(1)
+_HASH_B = _rng.integers(0, 2 ** 63, NUM_HASHES, dtype=np.uint64)
+
+_NON_LETTERS = re.compile(r'[\W\d_]+')
+
+
+def normalize(text):
+    """Lowercase (Mtavruli -> Mkhedruli), drop punctuation, digits and emoji, single spaces"""
+    return _NON_LETTERS.sub(' ', text.lower()).strip()
+
+
+def shingles(text):
+    """Stable 32-bit hashes of the text's character n-grams"""
+    text = normalize(text)
+    if len(text) <= SHINGLE_SIZE:
+        grams = {text} if text else set()
+    else:
+        grams = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    return np.fromiter((zlib.crc32(g.encode('utf-8')) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def signature(text):
+    """MinHash signature (NUM_HASHES values) of a text, multiply-shift hashing"""
+    hashes = shingles(text)
+    if hashes.size == 0:
+        return np.full(NUM_HASHES, np.iinfo(np.uint32).max, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        permuted = (_HASH_A[:, None] * hashes[None, :] + _HASH_B[:, None]) >> np.uint64(32)
+    return permuted.min(axis=1)
+
+
+def content_text(content):
+    """The indexed text of a variant"""
+    return ' '.join(str(content.get(field, '')) for field in INDEXED_FIELDS)
+
+
+class DuplicateIndex:
+    def __init__(self, index_file=None, threshold=None):
+        self.index_file = index_file or config.CONTENT_INDEX_FILE
+        self.threshold = config.DUPLICATE_THRESHOLD if threshold is None else threshold
+        self.lock = threading.Lock()
+        self.signatures = []
+        self.titles = []
+        self.buckets = {}
+        self.recent_titles = deque(maxlen=max(config.DUPLICATE_AVOID_TOPICS, 1))
+        self.checks = 0
+        self.duplicates = 0
+        self._load()
+
+    def _load(self):
+        """Rebuild the in-memory index from the signature log"""
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self._insert(np.array(entry['signature'], dtype=np.uint64), entry.get('title', ''))
+                    except (json.JSONDecodeError, KeyError, ValueError):
+                        continue
+        except FileNotFoundError:
+            pass
+
+    def _bands(self, sig):
+        return [(band, sig[band * ROWS:(band + 1) * ROWS].tobytes()) for band in range(BANDS)]
+
+    def _insert(self, sig, title):
+        idx = len(self.signatures)
+        self.signatures.append(sig)
+        self.titles.append(title)
+        for band in self._bands(sig):
+            self.buckets.setdefault(band, []).append(idx)
+        if title:
+            self.recent_titles.append(title)
+
+    def _best_match(self, sig):
+        """(estimated Jaccard similarity, index) of the closest LSH candidate, or (0.0, None)"""
+        candidates = set()
+        for band in self._bands(sig):
+            candidates.update(self.buckets.get(band, ()))
+        best = (0.0, None)
+        for idx in candidates:
+            similarity = float(np.mean(self.signatures[idx] == sig))
+            if similarity > best[0]:
+                best = (similarity, idx)
+        return best
+
+    def similarity(self, content):
+        """Estimated similarity (0-1) of a variant to the closest earlier one, without counting a check"""
+        sig = signature(content_text(content))
+        with self.lock:
+            return self._best_match(sig)[0]
+
+    def find_duplicate(self, content):
+        """Title of an earlier variant this one nearly repeats, or None"""
+        sig = signature(content_text(content))
+        with self.lock:
+            self.checks += 1
+            similarity, idx = self._best_match(sig)
+            if idx is not None and similarity >= self.threshold:
+                self.duplicates += 1
+                return self.titles[idx] or '?'
+        return None
+
+    def add(self, content):
+        """Index a variant and append it to the signature log"""
+        sig = signature(content_text(content))
+        title = str(content.get('title', ''))
+        with self.lock:
+            self._insert(sig, title)
+            try:
+                os.makedirs(os.path.dirname(self.index_file) or '.', exist_ok=True)
+                with open(self.index_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({
+                        'time': datetime.now().isoformat(timespec='seconds'),
+                        'title': title,
+                        'signature': sig.tolist()
+                    }, ensure_ascii=False) + '\n')
+            except OSError as e:
+                print(f"Error writing content index: {e}")
+
+    def check_and_add(self, content):
+        """Index the variant unless it is a near-duplicate; returns the earlier title if it is"""
+        duplicate_of = self.find_duplicate(content)
+        if duplicate_of is None:
+            self.add(content)
+        return duplicate_of
+
+    def avoid_digest(self, limit=None):
+        """Titles of the most recent variants, newest first, for the "avoid these topics" note"""
+        limit = config.DUPLICATE_AVOID_TOPICS if limit is None else limit
+        with self.lock:
+            titles = list(self.recent_titles)
+        seen = []
+        for title in reversed(titles):
+            if title not in seen:
+                seen.append(title)
+            if len(seen) >= limit:
+                break
+        return seen
+
+    def get_stats(self):
+        return {'indexed': len(self.signatures), 'checks': self.checks, 'duplicates': self.duplicates}
@@ -0,0 +1,148 @@
+"""
+Fan-out Policy - Decides how many requests a generation of N variants is split into
+
+One combined request is as slow as its longest output and loses every variant
+when it fails; one request per variant finishes sooner but costs a request
+(and the prompt prefix) each. The policy fits latency = base + per_variant x
+variants to recent calls, estimates each split under ANTHROPIC_MAX_CONCURRENCY
+and picks the fastest. Rate-limit headers or a recent 429 force a single
+combined call; a high error rate shrinks groups so a failure costs less.
+"""
+import math
+import threading
+import time
+from collections import deque
+import config
+
+# Assumed until a few calls have been observed
+DEFAULT_BASE_MS = 3000.0
+DEFAULT_PER_VARIANT_MS = 8000.0
+# Splits within this share of the fastest estimate count as equally fast; the one
+# with fewer requests wins
+LATENCY_TOLERANCE = 0.1
+ERROR_SMOOTHING = 0.2
+
+
+def _header_int(headers, name):
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+def split(count, groups):
+    """count variants in `groups` near-equal group sizes, larger groups first"""
+    return [count // groups + (1 if idx < count % groups else 0) for idx in range(groups)]
+
+
+class FanoutPolicy:
+    def __init__(self, max_concurrency=None):
+        self.max_concurrency = max_concurrency
+        self.lock = threading.Lock()
+        self.samples = deque(maxlen=config.FANOUT_SAMPLES)  # (variants, latency_ms)
+        self.error_rate = 0.0
+        self.requests_remaining = None
+        self.requests_limit = None
+        self.retry_until = 0.0
+        self.decisions = {}
+
+    @property
+    def concurrency(self):
+        return self.max_concurrency or config.ANTHROPIC_MAX_CONCURRENCY
+
+    def observe(self, variants, latency_ms, ok=True):
+        """Record one generation request: variants asked for, its latency and whether it delivered them"""
+        with self.lock:
+            if ok:
+                self.samples.append((variants, latency_ms))
+            self.error_rate += ERROR_SMOOTHING * ((0.0 if ok else 1.0) - self.error_rate)
+
+    def observe_headers(self, headers):
+        """Remember the request budget from a response's rate-limit headers"""
+        remaining = _header_int(headers, 'anthropic-ratelimit-requests-remaining')
+        limit = _header_int(headers, 'anthropic-ratelimit-requests-limit')
+        retry_after = _header_int(headers, 'retry-after')
+        with self.lock:
+            if remaining is not None:
+                self.requests_remaining = remaining
+            if limit is not None:
+                self.requests_limit = limit
+            if retry_after:
+                self.retry_until = max(self.retry_until, time.time() + retry_after)
+
+    def observe_rate_limited(self, headers=None):
+        """A request was rejected with 429: stop fanning out for retry-after (or a minute)"""
+        retry_after = _header_int(headers or {}, 'retry-after') or 60
+        with self.lock:
+            self.retry_until = max(self.retry_until, time.time() + retry_after)
+            self.requests_remaining = 0
+
+    def throttled(self, requests):
+        """True if sending `requests` requests now would press against the rate limit"""
+        with self.lock:
+            if time.time() < self.retry_until:
+                return True
+            if self.requests_remaining is None:
+                return False
+            reserve = (self.requests_limit or 0) * 0.1
+            return self.requests_remaining - requests < reserve
+
+    def latency_model(self):
+        """(base_ms, per_variant_ms) fitted to recent requests by least squares"""
+        with self.lock:
+            samples = list(self.samples)
+        if not samples:
+            return DEFAULT_BASE_MS, DEFAULT_PER_VARIANT_MS
+
+        mean_n = sum(n for n, _ in samples) / len(samples)
+        mean_ms = sum(ms for _, ms in samples) / len(samples)
+        variance = sum((n - mean_n) ** 2 for n, _ in samples)
+        if variance == 0:
+            # One request size seen so far: keep the default overhead, scale the rest
+            base = min(DEFAULT_BASE_MS, mean_ms)
+            return base, (mean_ms - base) / mean_n
+
+        per_variant = sum((n - mean_n) * (ms - mean_ms) for n, ms in samples) / variance
+        per_variant = max(per_variant, 0.0)
+        return max(mean_ms - per_variant * mean_n, 0.0), per_variant
+
+    def estimate_ms(self, count, groups):
+        """Expected time until the last of `groups` parallel requests for count variants finishes"""
+        base, per_variant = self.latency_model()
+        waves = math.ceil(groups / self.concurrency)
+        return waves * (base + per_variant * math.ceil(count / groups))
+
+    def group_sizes(self, count):
+        """How to split a generation of count variants, e.g. [1, 1, 1] or [2, 1] or [3]"""
+        if count <= 1:
+            sizes = [count]
+        else:
+            options = range(1, min(count, config.FANOUT_MAX_REQUESTS) + 1)
+            estimates = {groups: self.estimate_ms(count, groups) for groups in options}
+            fastest = min(estimates.values())
+            groups = min(g for g, ms in estimates.items() if ms <= fastest * (1 + LATENCY_TOLERANCE))
+
+            # Failures lose a whole group: split further while they are frequent
+            if self.error_rate > config.FANOUT_ERROR_RATE:
+                groups = min(max(groups * 2, 2), count, config.FANOUT_MAX_REQUESTS)
+            if groups > 1 and self.throttled(groups):
+                groups = 1
+            sizes = split(count, groups)
+
+        with self.lock:
+            key = len(sizes)
+            self.decisions[key] = self.decisions.get(key, 0) + 1
+        return sizes
+
+    def get_stats(self):
+        """Fitted latency model, error rate, rate-limit state and how often each split was chosen"""
+        base, per_variant = self.latency_model()
+        with self.lock:
+            return {
+                'base_ms': round(base),
+                'per_variant_ms': round(per_variant),
+                'error_rate': round(self.error_rate, 2),
+                'requests_remaining': self.requests_remaining,
+                'throttled': time.time() < self.retry_until,
+                'requests_per_generation': dict(sorted(self.decisions.items()))
+            }
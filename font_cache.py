@@ -0,0 +1,25 @@
+"""
+Font Cache - Loads each (font file, size) pair once and shares it between renders
+"""
+from PIL import ImageFont
+
+
+class FontCache:
+    def __init__(self):
+        self.fonts = {}  # (path, size) -> FreeTypeFont, or None if loading failed
+        self.loads = 0
+
+    def get(self, path, size):
+        """Get font for path and size, returns None if the file can't be loaded"""
+        key = (path, size)
+        if key not in self.fonts:
+            self.loads += 1
+            try:
+                self.fonts[key] = ImageFont.truetype(path, size)
+            except (OSError, ValueError):
+                self.fonts[key] = None
+        return self.fonts[key]
+
+
+# Shared by every DesignGenerator in the process
+shared_font_cache = FontCache()
@@ -0,0 +1,113 @@
+"""
+Image Encoder - Picks output format and settings per style and keeps images under a byte budget
+"""
+import io
+import time
+from collections import namedtuple
+from PIL import Image
+import config
+
+# Encoded output: bytes, Pillow format name, file extension, encode time and size
+EncodedImage = namedtuple('EncodedImage', ['data', 'format', 'extension', 'encode_ms', 'size'])
+
+EXTENSIONS = {
+    'PNG': 'png',
+    'JPEG': 'jpg',
+    'WEBP': 'webp',
+    'GIF': 'gif'
+}
+
+# Lower quality / fewer colors tried in order until the image fits the budget
+QUALITY_STEPS = [0, 10, 20, 30]
+PALETTE_STEPS = [256, 128, 64]
+
+
+class ImageEncoder:
+    def __init__(self):
+        self.stats = {}  # style -> {'count', 'total_ms', 'total_bytes', 'format'}
+
+    def choose_format(self, style):
+        """Get output kind for a style: png, png_palette, jpeg or webp"""
+        return config.OUTPUT_FORMAT_BY_STYLE.get(style, config.OUTPUT_FORMAT_DEFAULT)
+
+    def encode(self, img, style=None, byte_budget=None):
+        """Encode image for delivery, stepping quality down until it fits byte_budget"""
+        budget = config.OUTPUT_BYTE_BUDGET if byte_budget is None else byte_budget
+        kind = self.choose_format(style)
+
+        start = time.perf_counter()
+        data, fmt = self._encode_within_budget(img, kind, budget)
+        encode_ms = (time.perf_counter() - start) * 1000
+
+        self.record(style, fmt, encode_ms, len(data))
+        return EncodedImage(data, fmt, EXTENSIONS[fmt], encode_ms, len(data))
+
+    def encode_lossless(self, img):
+        """Encode an archival copy without any quality loss"""
+        start = time.perf_counter()
+        data = self._save(img, 'PNG', optimize=False)
+        encode_ms = (time.perf_counter() - start) * 1000
+        return EncodedImage(data, 'PNG', EXTENSIONS['PNG'], encode_ms, len(data))
+
+    def _encode_within_budget(self, img, kind, budget):
+        """Try progressively smaller settings, returns (data, format)"""
+        data = None
+
+        if kind == 'png':
+            data = self._save(img, 'PNG')
+            if not budget or len(data) <= budget:
+                return data, 'PNG'
+            # Lossless is over budget: fall through to a lossy format
+            kind = 'jpeg'
+
+        if kind == 'png_palette':
+            for colors in PALETTE_STEPS:
+                quantized = img.quantize(colors=colors, method=Image.Quantize.FASTOCTREE)
+                data = self._save(quantized, 'PNG')
+                if not budget or len(data) <= budget:
+                    return data, 'PNG'
+            kind = 'jpeg'
+
+        fmt = 'WEBP' if kind == 'webp' else 'JPEG'
+        for step in QUALITY_STEPS:
+            quality = max(config.OUTPUT_QUALITY - step, 40)
+            data = self._save(img, fmt, quality=quality)
+            if not budget or len(data) <= budget:
+                break
+
+        # Smallest attempt is returned even if it is still over budget
+        return data, fmt
+
+    def _save(self, img, fmt, **options):
+        """Encode into an in-memory buffer"""
+        buffer = io.BytesIO()
+        if fmt == 'JPEG':
+            options.setdefault('optimize', False)
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+        elif fmt == 'WEBP':
+            options.setdefault('method', 4)
+        img.save(buffer, fmt, **options)
+        return buffer.getvalue()
+
+    def record(self, style, fmt, encode_ms, size):
+        """Track encode time and size per style"""
+        entry = self.stats.setdefault(style or 'unknown', {
+            'count': 0, 'total_ms': 0.0, 'total_bytes': 0, 'format': fmt
+        })
+        entry['count'] += 1
+        entry['total_ms'] += encode_ms
+        entry['total_bytes'] += size
+        entry['format'] = fmt
+
+    def get_stats(self):
+        """Average encode time and size per style"""
+        return {
+            style: {
+                'format': entry['format'],
+                'count': entry['count'],
+                'avg_ms': round(entry['total_ms'] / entry['count'], 1),
+                'avg_kb': round(entry['total_bytes'] / entry['count'] / 1024, 1)
+            }
+            for style, entry in self.stats.items()
+        }
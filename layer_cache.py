@@ -0,0 +1,86 @@
+"""
+Layer Cache - Keeps pre-rendered static layers (backgrounds, cards, branding) in memory
+"""
+from collections import OrderedDict
+import json
+import config
+
+
+def image_nbytes(img):
+    """Approximate memory used by a Pillow image"""
+    return img.width * img.height * len(img.getbands())
+
+
+def config_signature():
+    """Snapshot of the config values that static layers depend on"""
+    palettes = tuple(sorted((style, tuple(colors)) for style, colors in config.COLOR_PALETTES.items()))
+    templates = json.dumps(config.STYLE_TEMPLATES, sort_keys=True)
+    return (palettes, templates, config.IMAGE_WIDTH, config.IMAGE_HEIGHT, config.BRANDING)
+
+
+class LayerCache:
+    def __init__(self, max_bytes=None):
+        self.max_bytes = config.LAYER_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._signature = config_signature()
+
+    def get(self, key, render_fn):
+        """Get cached layer for key, rendering it with render_fn on a miss
+
+        The returned object is shared - callers must copy images before drawing on them.
+        """
+        self._check_config()
+
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][0]
+
+        self.misses += 1
+        layer = render_fn()
+        size = self._layer_nbytes(layer)
+
+        # Layers larger than the whole budget are returned but never stored
+        if size <= self.max_bytes:
+            self.entries[key] = (layer, size)
+            self.current_bytes += size
+            self._evict()
+
+        return layer
+
+    def invalidate(self):
+        """Drop every cached layer"""
+        self.entries.clear()
+        self.current_bytes = 0
+
+    def _check_config(self):
+        """Invalidate when palettes, sizes or branding changed in config"""
+        signature = config_signature()
+        if signature != self._signature:
+            self.invalidate()
+            self._signature = signature
+
+    def _evict(self):
+        """Evict least recently used layers until under the memory cap"""
+        while self.current_bytes > self.max_bytes and self.entries:
+            _, (_, size) = self.entries.popitem(last=False)
+            self.current_bytes -= size
+
+    def _layer_nbytes(self, layer):
+        """Memory used by a layer (an image, or a tuple holding images)"""
+        if isinstance(layer, tuple):
+            return sum(image_nbytes(part) for part in layer if hasattr(part, 'getbands'))
+        return image_nbytes(layer)
+
+    def get_stats(self):
+        """Get cache statistics"""
+        return {
+            'entries': len(self.entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses
+        }
@@ -0,0 +1,111 @@
+"""
+Layout Plan - Compiles declarative style templates (config.STYLE_TEMPLATES) into
+pixel-resolved plans that DesignGenerator executes
+"""
+import json
+from collections import namedtuple
+import config
+
+# Fully resolved plan for one style at one canvas size
+# translucent: some text is drawn with alpha and needs a blending draw
+LayoutPlan = namedtuple('LayoutPlan', ['style', 'background', 'text', 'translucent'])
+
+# Background drawing step: solid, gradient, rect, rounded_rect or overlay
+BackgroundOp = namedtuple('BackgroundOp', ['type', 'box', 'fill', 'radius', 'colors', 'kind'])
+
+# Text block: y is absolute (None = continue after the previous block, plus gap)
+TextBlock = namedtuple('TextBlock', [
+    'field', 'font', 'y', 'gap', 'max_width', 'line_height', 'x', 'fill',
+    'shadow_offset', 'shadow_fill', 'fit_bottom', 'bullet', 'text_offset', 'spacing', 'max_items'
+])
+
+# Bullet drawn in front of each item of a bullet list
+Bullet = namedtuple('Bullet', ['x', 'radius', 'fill'])
+
+# Compiled plans, keyed by template, palette and canvas size
+_plans = {}
+MAX_PLANS = 64
+
+
+def template_signature(style):
+    """Stable text form of a style's template, for cache keys"""
+    return json.dumps(config.STYLE_TEMPLATES.get(style), sort_keys=True)
+
+
+def get_plan(style, width, height, scale=1.0):
+    """Get the compiled plan for a style, compiling it on first use"""
+    palette = tuple(config.COLOR_PALETTES.get(style, ()))
+    key = (style, template_signature(style), palette, width, height, scale)
+    plan = _plans.get(key)
+    if plan is None:
+        if len(_plans) >= MAX_PLANS:
+            _plans.clear()
+        plan = compile_template(style, config.STYLE_TEMPLATES[style], list(palette), width, height, scale)
+        _plans[key] = plan
+    return plan
+
+
+def compile_template(style, template, palette, width, height, scale=1.0):
+    """Resolve a template's design coordinates, edges and palette colors into a LayoutPlan"""
+    def s(value):
+        return int(round(value * scale))
+
+    def coord(value, extent):
+        if value is None:
+            return extent
+        if value < 0:
+            return extent - s(-value)
+        return s(value)
+
+    def color(value):
+        if isinstance(value, int):
+            return palette[value]
+        if isinstance(value, list):
+            return tuple(value)
+        return value
+
+    background = []
+    for op in template.get('background', []):
+        box = op.get('box')
+        if box is not None:
+            box = (coord(box[0], width), coord(box[1], height), coord(box[2], width), coord(box[3], height))
+        background.append(BackgroundOp(
+            type=op['type'],
+            box=box,
+            fill=color(op.get('fill', op.get('color'))),
+            radius=s(op.get('radius', 0)),
+            colors=[color(c) for c in op.get('colors', [])],
+            kind=op.get('kind')
+        ))
+
+    text = []
+    for block in template.get('text', []):
+        shadow = block.get('shadow')
+        bullet = block.get('bullet')
+        text.append(TextBlock(
+            field=block['field'],
+            font=block.get('font', 'main'),
+            y=s(block['y']) if 'y' in block else None,
+            gap=s(block.get('gap', 0)),
+            max_width=width - s(block.get('inset', 0)),
+            line_height=s(block['line_height']),
+            x=s(block['x']) if 'x' in block else None,  # None = centered
+            fill=color(block.get('color', 0)),
+            shadow_offset=s(shadow['offset']) if shadow else None,
+            shadow_fill=color(shadow['color']) if shadow else None,
+            fit_bottom=height - s(block['fit_bottom']) if 'fit_bottom' in block else None,
+            bullet=Bullet(s(bullet['x']), s(bullet['radius']), color(bullet['color'])) if bullet else None,
+            text_offset=s(block.get('text_offset', 0)),
+            spacing=s(block.get('spacing', 0)),
+            max_items=block.get('max_items')
+        ))
+
+    translucent = any(
+        _has_alpha(block.fill) or _has_alpha(block.shadow_fill) for block in text
+    )
+    return LayoutPlan(style, background, text, translucent)
+
+
+def _has_alpha(color):
+    """Whether a resolved color is an RGBA tuple with partial alpha"""
+    return isinstance(color, tuple) and len(color) == 4 and color[3] < 255
@@ -0,0 +1,129 @@
+"""
+Metrics - Token usage, cost, prompt cache hits and latency of every Claude API call
+
+Each call is appended to config.API_USAGE_FILE (one JSON object per line),
+and running totals per call kind are kept for /stats.
+"""
+import json
+import os
+import threading
+from datetime import datetime
+import config
+
+USAGE_FIELDS = ('input_tokens', 'output_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens')
+
+
+def usage_counts(usage):
+    """Token counts from an API usage object (missing fields count as 0)"""
+    return {field: getattr(usage, field, None) or 0 for field in USAGE_FIELDS}
+
+
+def call_cost(entry):
+    """USD cost of one logged call from config.MODEL_PRICES (0 for unknown models)"""
+    input_price, output_price = config.MODEL_PRICES.get(entry.get('model'), (0.0, 0.0))
+    cost = (entry.get('input_tokens', 0) * input_price
+            + entry.get('cache_creation_input_tokens', 0) * input_price * 1.25
+            + entry.get('cache_read_input_tokens', 0) * input_price * 0.1
+            + entry.get('output_tokens', 0) * output_price) / 1_000_000
+    # Message Batches are billed at half price
+    return cost / 2 if entry.get('kind') == 'batch' else cost
+
+
+class ApiMetrics:
+    """Per-call usage log plus totals by call kind (generate, stream, feedback, draft, polish, ...)"""
+
+    def __init__(self, log_file=None):
+        self.log_file = log_file or config.API_USAGE_FILE
+        self.lock = threading.Lock()
+        self.totals = {}
+        self._load()
+
+    def _load(self):
+        """Rebuild totals from the usage log"""
+        try:
+            with open(self.log_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self._add(json.loads(line))
+                    except (json.JSONDecodeError, KeyError):
+                        continue
+        except FileNotFoundError:
+            pass
+
+    def _add(self, entry):
+        """Add one call to the totals"""
+        totals = self.totals.setdefault(entry['kind'], dict(
+            {field: 0 for field in USAGE_FIELDS}, calls=0, cache_hits=0, total_ms=0.0,
+            parse_failures=0, invalid_variants=0, repeated_variants=0, retries=0, cost_usd=0.0
+        ))
+        totals['calls'] += 1
+        totals['cost_usd'] += call_cost(entry)
+        totals['total_ms'] += entry['latency_ms']
+        for field in USAGE_FIELDS:
+            totals[field] += entry.get(field, 0)
+        if entry.get('cache_read_input_tokens'):
+            totals['cache_hits'] += 1
+        totals['parse_failures'] += int(entry.get('parse_failed', False))
+        totals['invalid_variants'] += entry.get('invalid_variants', 0)
+        totals['repeated_variants'] += entry.get('repeated_variants', 0)
+        totals['retries'] += int(entry.get('retry', False))
+
+    def record(self, kind, usage, latency_ms, model=None, parse_failed=False, invalid_variants=0,
+               repeated_variants=0, retry=False):
+        """Record one API call's usage (the response's usage object) and latency
+
+        parse_failed: the response didn't parse at all, invalid_variants: variants
+        malformed or missing, repeated_variants: well-formed variants dropped as
+        near-duplicates, retry: the call re-requested missing variants.
+        """
+        entry = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'kind': kind,
+            'model': model,
+            'latency_ms': round(latency_ms, 1),
+            **usage_counts(usage)
+        }
+        if parse_failed:
+            entry['parse_failed'] = True
+        if invalid_variants:
+            entry['invalid_variants'] = invalid_variants
+        if repeated_variants:
+            entry['repeated_variants'] = repeated_variants
+        if retry:
+            entry['retry'] = True
+        with self.lock:
+            self._add(entry)
+            try:
+                os.makedirs(os.path.dirname(self.log_file) or '.', exist_ok=True)
+                with open(self.log_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry) + '\n')
+            except OSError as e:
+                print(f"Error writing API usage: {e}")
+        return entry
+
+    def get_stats(self):
+        """Calls, tokens, average latency, prompt cache hit rate and output quality per call kind
+
+        cached_share is the part of all prompt tokens that were read from the cache.
+        """
+        stats = {}
+        with self.lock:
+            for kind, totals in self.totals.items():
+                prompt_tokens = (totals['input_tokens'] + totals['cache_creation_input_tokens']
+                                 + totals['cache_read_input_tokens'])
+                stats[kind] = {
+                    'calls': totals['calls'],
+                    'avg_ms': round(totals['total_ms'] / totals['calls'], 1),
+                    'cost_usd': round(totals['cost_usd'], 4),
+                    'input_tokens': totals['input_tokens'],
+                    'output_tokens': totals['output_tokens'],
+                    'cache_write_tokens': totals['cache_creation_input_tokens'],
+                    'cache_read_tokens': totals['cache_read_input_tokens'],
+                    'cache_hit_rate': round(totals['cache_hits'] / totals['calls'], 2),
+                    'cached_share': round(totals['cache_read_input_tokens'] / prompt_tokens, 2) if prompt_tokens else 0.0,
+                    'parse_failure_rate': round(totals['parse_failures'] / totals['calls'], 2),
+                    'invalid_variants': totals['invalid_variants'],
+                    'repeated_variants': totals['repeated_variants'],
+                    'retry_rate': round(totals['retries'] / totals['calls'], 2)
+                }
+        return stats
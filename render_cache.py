@@ -0,0 +1,268 @@
+"""
+Render Cache - Content-addressed cache of encoded renders (memory LRU + disk spill)
+
+The memory tier is used inline; the event loop reaches the disk tier
+through aget/aput, which do the file work in a thread. Spilled entries are
+a JSON header line followed by the image bytes - nothing is unpickled.
+"""
+import asyncio
+from collections import OrderedDict, namedtuple
+import hashlib
+import json
+import os
+import threading
+import config
+from design_generator import RENDERER_VERSION
+
+# Delivery bytes, style, file extension, encode stats, optional lossless archive copy
+# and the render spec that reproduces the image
+RenderResult = namedtuple('RenderResult', ['data', 'style', 'extension', 'format', 'encode_ms',
+                                           'archive_data', 'spec'], defaults=[None])
+
+# Variant fields that end up on the image
+RENDERED_FIELDS = ['title', 'main_text']
+# Version of the spilled RenderResult layout; bump it when fields are added so
+# entries spilled by an older build are never read back as the current shape
+RESULT_SCHEMA = 3
+# A full disk tier is trimmed to this share of its quota, so trims are batched
+DISK_LOW_WATER = 0.9
+
+
+def render_key(content, style, scale=1.0):
+    """Hash of everything that determines the encoded image for (content, style, scale)"""
+    payload = {
+        'fields': {field: content.get(field, '') for field in RENDERED_FIELDS},
+        'style': style,
+        'palette': config.COLOR_PALETTES.get(style),
+        'template': config.STYLE_TEMPLATES.get(style),
+        'renderer': RENDERER_VERSION,
+        'schema': RESULT_SCHEMA,
+        'size': [config.IMAGE_WIDTH, config.IMAGE_HEIGHT, scale],
+        'encoding': [
+            config.OUTPUT_FORMAT_BY_STYLE.get(style, config.OUTPUT_FORMAT_DEFAULT),
+            config.OUTPUT_QUALITY,
+            config.OUTPUT_BYTE_BUDGET,
+            config.ARCHIVE_LOSSLESS
+        ]
+    }
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def result_nbytes(result):
+    """Memory held by a cached render result"""
+    return len(result.data) + len(result.archive_data or b'')
+
+
+def dump_result(result):
+    """Spill file bytes of a result: a JSON header line, then the image and archive bytes"""
+    header = {
+        'schema': RESULT_SCHEMA,
+        'style': result.style,
+        'extension': result.extension,
+        'format': result.format,
+        'encode_ms': result.encode_ms,
+        'spec': result.spec,
+        'data_bytes': len(result.data),
+        'archive_bytes': None if result.archive_data is None else len(result.archive_data)
+    }
+    return json.dumps(header, ensure_ascii=True).encode('ascii') + b'\n' + result.data + (result.archive_data or b'')
+
+
+def load_result(raw):
+    """Parse dump_result bytes, raises ValueError for anything else"""
+    line, _, body = raw.partition(b'\n')
+    header = json.loads(line)
+    if not isinstance(header, dict) or header.get('schema') != RESULT_SCHEMA:
+        raise ValueError("Not a current render cache entry")
+    data_bytes = header['data_bytes']
+    archive_bytes = header['archive_bytes']
+    if len(body) != data_bytes + (archive_bytes or 0):
+        raise ValueError("Truncated render cache entry")
+    archive_data = None if archive_bytes is None else body[data_bytes:]
+    return RenderResult(body[:data_bytes], header['style'], header['extension'], header['format'],
+                        header['encode_ms'], archive_data, header['spec'])
+
+
+class RenderCache:
+    def __init__(self, max_bytes=None, disk_dir=None, disk_max_bytes=None):
+        self.max_bytes = config.RENDER_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.disk_dir = disk_dir or config.RENDER_CACHE_DIR
+        self.disk_max_bytes = config.RENDER_CACHE_DISK_MAX_BYTES if disk_max_bytes is None else disk_max_bytes
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+        self.disk_bytes = None  # Spilled bytes, counted from the directory once, then kept running
+        self.disk_lock = threading.Lock()  # Spills run in worker threads
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _get_memory(self, key):
+        """Cached result from the memory tier, or None"""
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        return None
+
+    def _count_disk(self, result):
+        if result is None:
+            self.misses += 1
+        else:
+            self.disk_hits += 1
+        return result
+
+    def get(self, key):
+        """Get cached result from memory, then disk; None on miss (blocking, see aget)"""
+        result = self._get_memory(key)
+        if result is not None:
+            return result
+        result = self._count_disk(self._read_disk(key))
+        if result is not None:
+            self.put(key, result, spilled=True)
+        return result
+
+    async def aget(self, key):
+        """get() for the event loop: the disk tier is read in a thread"""
+        result = self._get_memory(key)
+        if result is not None:
+            return result
+        result = self._count_disk(await asyncio.to_thread(self._read_disk, key))
+        if result is not None:
+            await self.aput(key, result, spilled=True)
+        return result
+
+    def _put_memory(self, key, result, spilled=False):
+        """Store result in memory, returns the (key, result) entries that go to disk"""
+        if key in self.entries:
+            self.current_bytes -= result_nbytes(self.entries.pop(key))
+
+        size = result_nbytes(result)
+        if size > self.max_bytes:
+            return [] if spilled else [(key, result)]
+
+        self.entries[key] = result
+        self.current_bytes += size
+
+        evicted = []
+        while self.current_bytes > self.max_bytes:
+            old_key, old_result = self.entries.popitem(last=False)
+            self.current_bytes -= result_nbytes(old_result)
+            evicted.append((old_key, old_result))
+        return evicted
+
+    def put(self, key, result, spilled=False):
+        """Store result in memory, spilling least recently used entries to disk (blocking, see aput)"""
+        self._spill(self._put_memory(key, result, spilled))
+
+    async def aput(self, key, result, spilled=False):
+        """put() for the event loop: spills are written in a thread"""
+        evicted = self._put_memory(key, result, spilled)
+        if evicted:
+            await asyncio.to_thread(self._spill, evicted)
+
+    def _spill(self, entries):
+        for key, result in entries:
+            self._write_disk(key, result)
+
+    def _disk_path(self, key):
+        """File path for a spilled entry"""
+        return os.path.join(self.disk_dir, f"{key}.bin")
+
+    def _read_disk(self, key):
+        """Load a spilled entry, None if missing or unreadable"""
+        if not self.disk_max_bytes:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                result = load_result(f.read())
+            os.utime(path)  # Mark as recently used for disk eviction
+            return result
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # Unreadable or from an incompatible build: a miss, and the file goes
+            print(f"Error reading render cache entry {key}: {e}")
+            self._remove_disk(path)
+            return None
+
+    def _write_disk(self, key, result):
+        """Spill an entry to disk, keeping the disk tier under its quota"""
+        if not self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        with self.disk_lock:
+            if os.path.exists(path):
+                return
+            try:
+                used = self._disk_usage()
+                os.makedirs(self.disk_dir, exist_ok=True)
+                with open(path + '.tmp', 'wb') as f:
+                    f.write(dump_result(result))
+                    size = f.tell()
+                os.replace(path + '.tmp', path)
+                self.disk_bytes = used + size
+                if self.disk_bytes > self.disk_max_bytes:
+                    self._trim_disk()
+            except OSError as e:
+                print(f"Error spilling render cache entry {key}: {e}")
+
+    def _disk_files(self):
+        """(mtime, size, path) of every spilled entry"""
+        files = []
+        try:
+            names = os.listdir(self.disk_dir)
+        except FileNotFoundError:
+            return files
+        for name in names:
+            if name.endswith('.bin'):
+                path = os.path.join(self.disk_dir, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _disk_usage(self):
+        """Bytes in the disk tier; the directory is only listed the first time"""
+        if self.disk_bytes is None:
+            self.disk_bytes = sum(size for _, size, _ in self._disk_files())
+        return self.disk_bytes
+
+    def _remove_disk(self, path):
+        """Delete a spilled entry and take it off the running total"""
+        with self.disk_lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                return
+            if self.disk_bytes is not None:
+                self.disk_bytes = max(self.disk_bytes - size, 0)
+
+    def _trim_disk(self):
+        """Delete least recently used spilled entries until under DISK_LOW_WATER of the quota"""
+        files = self._disk_files()
+        total = sum(size for _, size, _ in files)
+        target = self.disk_max_bytes * DISK_LOW_WATER
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.disk_bytes = total
+
+    def get_stats(self):
+        """Get cache statistics"""
+        return {
+            'entries': len(self.entries),
+            'bytes': self.current_bytes,
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses
+        }
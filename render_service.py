@@ -0,0 +1,182 @@
+"""
+Render Service - Runs DesignGenerator in worker processes so rendering never blocks the bot
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import config
+from carousel_renderer import CarouselRenderer, split_slides
+from design_generator import DesignGenerator
+from image_encoder import ImageEncoder
+from render_cache import RenderCache, RenderResult, render_key
+from render_spec import is_current, make_spec, new_seed
+
+# Warm generators of the current worker, one per scale (fonts and static layers stay loaded)
+_worker_generators = {}
+_worker_encoder = None
+_worker_carousel = None
+
+
+class RenderQueueFull(RuntimeError):
+    """Raised when more renders are pending than RENDER_QUEUE_LIMIT allows"""
+
+
+def _init_worker():
+    """Load fonts once per worker process"""
+    global _worker_encoder
+    _worker_generators[1.0] = DesignGenerator()
+    _worker_encoder = ImageEncoder()
+
+
+def _ping():
+    """No-op job used to start workers ahead of time"""
+    return True
+
+
+def _render_job(content, style, scale=1.0):
+    """Render and encode one image inside a worker
+
+    Only the encoded bytes travel back to the bot process (through the pool's
+    result pipe), never the decoded Pillow image.
+    """
+    if _worker_encoder is None:
+        _init_worker()
+    if scale not in _worker_generators:
+        _worker_generators[scale] = DesignGenerator(scale=scale)
+
+    img = _worker_generators[scale].generate_image(content, style)
+    encoded = _worker_encoder.encode(img, style)
+    archive_data = _worker_encoder.encode_lossless(img).data if config.ARCHIVE_LOSSLESS else None
+    return RenderResult(encoded.data, style, encoded.extension, encoded.format,
+                        encoded.encode_ms, archive_data)
+
+
+def _animation_job(content, style, fmt=None):
+    """Render and encode one animated post inside a worker, with the worker's warm generators"""
+    global _worker_carousel
+    if _worker_encoder is None:
+        _init_worker()
+    if _worker_carousel is None:
+        _worker_carousel = CarouselRenderer(_worker_encoder, _worker_generators)
+
+    encoded = _worker_carousel.render_animation(content, style, fmt)
+    return RenderResult(encoded.data, style, encoded.extension, encoded.format, encoded.encode_ms, None)
+
+
+class RenderService:
+    def __init__(self, workers=None, queue_limit=None, cache=None):
+        self.workers = config.RENDER_WORKERS if workers is None else workers
+        self.queue_limit = config.RENDER_QUEUE_LIMIT if queue_limit is None else queue_limit
+        self.executor = None
+        self.pending = 0
+        self.encode_stats = ImageEncoder()
+        self.cache = cache if cache is not None else RenderCache()
+
+    def _get_executor(self):
+        """Create the worker pool on first use"""
+        if self.executor is None:
+            if self.workers > 0:
+                # spawn: forking a process that runs asyncio and HTTP clients is unsafe
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker
+                )
+            else:
+                # A single thread, DesignGenerator caches are not thread-safe
+                self.executor = ThreadPoolExecutor(max_workers=1, initializer=_init_worker)
+        return self.executor
+
+    def resolve_style(self, style=None, seed=None):
+        """Pick the style up front so callers know what was rendered"""
+        return style if style is not None else DesignGenerator.pick_style(seed)
+
+    async def render(self, content, style=None, scale=1.0, seed=None):
+        """Render content off the event loop, returns RenderResult
+
+        Content already rendered in this style is served from the cache without
+        touching a worker. seed picks the style when none is given; the spec
+        only keeps a seed that did.
+        """
+        if style is not None:
+            seed = None  # Nothing to pick, the spec's style is authoritative
+        elif seed is None:
+            seed = new_seed()
+        style = self.resolve_style(style, seed)
+        key = render_key(content, style, scale)
+        cached = await self.cache.aget(key)
+        if cached is not None:
+            return cached
+
+        result = await self._submit(_render_job, content, style, scale)
+
+        # Workers have their own encoders, so aggregate per-style stats here
+        self.encode_stats.record(result.style, result.format, result.encode_ms, len(result.data))
+        result = result._replace(spec=make_spec(content, style, scale, seed))
+        await self.cache.aput(key, result)
+        return result
+
+    async def _submit(self, job, *args):
+        """Run a job on the worker pool, counted against RENDER_QUEUE_LIMIT"""
+        if self.pending >= self.queue_limit:
+            raise RenderQueueFull(f"Render queue is full ({self.pending} pending)")
+
+        loop = asyncio.get_running_loop()
+
+        self.pending += 1
+        try:
+            return await loop.run_in_executor(self._get_executor(), job, *args)
+        finally:
+            self.pending -= 1
+
+    async def render_spec(self, spec, scale=None):
+        """Rebuild an image from its render spec (recent ones come from the cache)"""
+        if not is_current(spec):
+            print(f"⚠️ Render spec from renderer {spec.get('renderer')}, pixels may differ slightly")
+        return await self.render(spec['content'], spec['style'],
+                                 spec['scale'] if scale is None else scale, spec['seed'])
+
+    async def render_many(self, jobs, scale=1.0):
+        """Render (content, style) jobs in parallel across workers
+
+        Returns results in job order; failed jobs come back as exceptions.
+        """
+        return await asyncio.gather(
+            *(self.render(content, style, scale) for content, style in jobs),
+            return_exceptions=True
+        )
+
+    async def render_carousel(self, content, style=None, scale=1.0, max_slides=None):
+        """Render a carousel's slides (see carousel_renderer.split_slides) in one style across workers
+
+        Returns a RenderResult per slide; raises the first failure, a carousel
+        with a slide missing isn't sent.
+        """
+        style = self.resolve_style(style)
+        slides = split_slides(content, max_slides)
+        results = await self.render_many([(slide, style) for slide in slides], scale)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    async def render_animation(self, content, style=None, fmt=None):
+        """Render a carousel as one animated WebP/GIF in a worker, returns RenderResult (without a spec)"""
+        style = self.resolve_style(style)
+        result = await self._submit(_animation_job, content, style, fmt)
+        self.encode_stats.record(result.style, result.format, result.encode_ms, len(result.data))
+        return result
+
+    async def warm_up(self):
+        """Start every worker now so the first real render doesn't pay for it"""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        await asyncio.gather(*(
+            loop.run_in_executor(executor, _ping) for _ in range(max(self.workers, 1))
+        ))
+
+    def shutdown(self):
+        """Stop worker processes"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,49 @@
+"""
+Render Spec - Compact, reproducible description of a rendered variant
+
+A spec is everything the renderer needs to rebuild the same pixels: the
+rendered content fields, style, scale, the seed that picked the style (None
+when the style was given - the style is authoritative either way) and the
+renderer version. Archiving specs instead of images keeps disk use tiny.
+"""
+import json
+import random
+from design_generator import RENDERER_VERSION
+from render_cache import RENDERED_FIELDS
+
+SPEC_VERSION = 1
+
+
+def new_seed():
+    """Random seed for the choices made while rendering"""
+    return random.getrandbits(32)
+
+
+def make_spec(content, style, scale=1.0, seed=None):
+    """Build the spec of a render"""
+    return {
+        'spec': SPEC_VERSION,
+        'renderer': RENDERER_VERSION,
+        'style': style,
+        'scale': scale,
+        'seed': seed,
+        'content': {field: content.get(field, '') for field in RENDERED_FIELDS + ['format']}
+    }
+
+
+def encode_spec(spec):
+    """Serialize a spec to compact JSON bytes"""
+    return json.dumps(spec, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def decode_spec(data):
+    """Parse spec bytes, raises ValueError for anything that is not a spec"""
+    spec = json.loads(data.decode('utf-8'))
+    if not isinstance(spec, dict) or spec.get('spec') != SPEC_VERSION:
+        raise ValueError("Not a render spec")
+    return spec
+
+
+def is_current(spec):
+    """Whether the spec was made by this renderer version (pixels will match exactly)"""
+    return spec.get('renderer') == RENDERER_VERSION
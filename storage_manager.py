@@ -0,0 +1,311 @@
+"""
+Storage Manager - Date-sharded image storage with retention, byte quota and archive bundles
+
+Layout under the storage directory:
+    2026/10/16/<session>_variant_1.jpg      loose files, one shard per day
+    archive/2026-10-09.tar.gz               cold days bundled into one file each
+    archive/index.json                      file name -> bundle, for lookups
+"""
+import io
+import json
+import os
+import shutil
+import tarfile
+import threading
+from datetime import datetime, timedelta
+import config
+
+ARCHIVE_DIRNAME = 'archive'
+INDEX_FILENAME = 'index.json'
+SESSION_FORMAT = '%Y%m%d_%H%M%S'
+
+
+def session_time(filename):
+    """Parse the session timestamp a file name starts with, None if it has none"""
+    try:
+        return datetime.strptime(os.path.basename(filename)[:15], SESSION_FORMAT)
+    except ValueError:
+        return None
+
+
+class StorageManager:
+    def __init__(self, directory=None, retention_days=None, max_bytes=None, archive_after_days=None):
+        self.directory = directory or config.GENERATED_DIR
+        self.retention_days = config.STORAGE_RETENTION_DAYS if retention_days is None else retention_days
+        self.max_bytes = config.STORAGE_MAX_BYTES if max_bytes is None else max_bytes
+        self.archive_after_days = config.STORAGE_ARCHIVE_AFTER_DAYS if archive_after_days is None else archive_after_days
+        self.archive_dir = os.path.join(self.directory, ARCHIVE_DIRNAME)
+        # Held by ArchiveWriter around each write and by compaction around each
+        # deletion, bundle swap and index update, so a shard is never evicted or
+        # removed while a file is being written into it
+        self.lock = threading.Lock()
+
+    def path_for(self, filename, when=None):
+        """Sharded path for a new file, by its session date (or when, or today)"""
+        when = when or session_time(filename) or datetime.now()
+        return os.path.join(self.directory, when.strftime('%Y'), when.strftime('%m'),
+                            when.strftime('%d'), filename)
+
+    def read(self, filename):
+        """Get a stored file's bytes from its shard or its archive bundle, None if gone"""
+        path = self.path_for(filename)
+        if os.path.exists(path):
+            os.utime(path)  # Mark as recently used for quota eviction
+            with open(path, 'rb') as f:
+                return f.read()
+
+        bundle = self._load_index().get(filename)
+        if bundle is None:
+            return None
+        bundle_path = os.path.join(self.archive_dir, bundle)
+        try:
+            with tarfile.open(bundle_path, 'r:gz') as tar:
+                data = tar.extractfile(filename).read()
+            os.utime(bundle_path)
+            return data
+        except (OSError, KeyError, tarfile.TarError) as e:
+            print(f"Error reading {filename} from {bundle}: {e}")
+            return None
+
+    def find(self, prefix):
+        """Names of stored files (loose or archived) starting with a session prefix
+
+        A prefix shorter than a full session id searches every day shard its
+        date part matches (all of October for '202610').
+        """
+        names = set(name for name in self._load_index() if name.startswith(prefix))
+        for date, shard in self._day_shards():
+            if not date.strftime('%Y%m%d').startswith(prefix[:8]):
+                continue
+            try:
+                names.update(name for name in os.listdir(shard)
+                             if name.startswith(prefix) and not name.endswith('.tmp'))
+            except FileNotFoundError:
+                pass
+        return sorted(names)
+
+    def compact(self, now=None):
+        """Archive cold days, drop expired data and enforce the byte quota
+
+        Safe to run from a background thread. Only shards older than
+        archive_after_days are bundled and nothing writes to those, so bundles
+        are built without self.lock; it is taken per shard for the swap and
+        the deletions, and ArchiveWriter only ever waits for those.
+        """
+        now = now or datetime.now()
+        expired = self._apply_retention(now)
+        archived = self._archive_cold_shards(now)
+        with self.lock:
+            evicted = self._enforce_quota()
+        return {'archived': archived, 'expired': expired, 'evicted': evicted}
+
+    def _day_shards(self):
+        """List (date, path) of every day shard directory"""
+        shards = []
+        for year in self._listdir(self.directory):
+            for month in self._listdir(os.path.join(self.directory, year)):
+                for day in self._listdir(os.path.join(self.directory, year, month)):
+                    try:
+                        date = datetime(int(year), int(month), int(day))
+                    except ValueError:
+                        continue
+                    shards.append((date, os.path.join(self.directory, year, month, day)))
+        return sorted(shards)
+
+    def _loose_files(self):
+        """(path, stat) of every finished file in the day shards
+
+        In-flight .tmp files are skipped, and files or shards that disappear
+        between the listing and the stat are ignored.
+        """
+        for _, shard in self._day_shards():
+            try:
+                names = os.listdir(shard)
+            except FileNotFoundError:
+                continue
+            for name in names:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(shard, name)
+                try:
+                    yield path, os.stat(path)
+                except FileNotFoundError:
+                    continue
+
+    def _bundle_stats(self):
+        """(bundle, stat) of every archive bundle that still exists"""
+        for bundle in self._bundles():
+            try:
+                yield bundle, os.stat(os.path.join(self.archive_dir, bundle))
+            except FileNotFoundError:
+                continue
+
+    def _listdir(self, path):
+        """Sorted directory names in path, empty if it does not exist"""
+        try:
+            return sorted(name for name in os.listdir(path)
+                          if os.path.isdir(os.path.join(path, name)) and name != ARCHIVE_DIRNAME)
+        except FileNotFoundError:
+            return []
+
+    def _archive_cold_shards(self, now):
+        """Bundle each shard older than archive_after_days into a tar.gz, returns files archived"""
+        cutoff = now - timedelta(days=self.archive_after_days)
+        archived = 0
+
+        for date, shard in self._day_shards():
+            if date + timedelta(days=1) > cutoff:
+                continue
+            names = sorted(name for name in os.listdir(shard) if not name.endswith('.tmp'))
+            if not names:
+                with self.lock:
+                    self._remove_empty_dirs(shard)
+                continue
+
+            bundle = f"{date.strftime('%Y-%m-%d')}.tar.gz"
+            bundle_path = os.path.join(self.archive_dir, bundle)
+            os.makedirs(self.archive_dir, exist_ok=True)
+            try:
+                # Appending is not possible with gzip, so a day is bundled together with
+                # anything already bundled for it
+                existing = self._bundle_members(bundle_path)
+                with tarfile.open(bundle_path + '.tmp', 'w:gz') as tar:
+                    for name, data in existing:
+                        self._add_bytes(tar, name, data)
+                    for name in names:
+                        tar.add(os.path.join(shard, name), arcname=name)
+            except (OSError, tarfile.TarError) as e:
+                print(f"⚠️ Archiving {shard} failed: {e}")
+                continue
+
+            with self.lock:
+                os.replace(bundle_path + '.tmp', bundle_path)
+                index = self._load_index()
+                index.update((name, bundle) for name in names)
+                self._save_index(index)
+                for name in names:
+                    os.remove(os.path.join(shard, name))
+                self._remove_empty_dirs(shard)
+            archived += len(names)
+        return archived
+
+    def _bundle_members(self, bundle_path):
+        """Read (name, bytes) of every file in an existing bundle"""
+        if not os.path.exists(bundle_path):
+            return []
+        with tarfile.open(bundle_path, 'r:gz') as tar:
+            return [(member.name, tar.extractfile(member).read()) for member in tar.getmembers()]
+
+    def _add_bytes(self, tar, name, data):
+        """Add in-memory bytes to a tar file"""
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+
+    def _apply_retention(self, now):
+        """Delete bundles and shards older than retention_days, returns items removed"""
+        if not self.retention_days:
+            return 0
+        cutoff = now - timedelta(days=self.retention_days)
+        removed = 0
+
+        for date, shard in self._day_shards():
+            if date + timedelta(days=1) <= cutoff:
+                with self.lock:
+                    shutil.rmtree(shard, ignore_errors=True)
+                    self._remove_empty_dirs(os.path.dirname(shard))
+                removed += 1
+
+        for bundle in self._bundles():
+            try:
+                date = datetime.strptime(bundle[:10], '%Y-%m-%d')
+            except ValueError:
+                continue
+            if date + timedelta(days=1) <= cutoff:
+                with self.lock:
+                    self._remove_bundle(bundle)
+                removed += 1
+        return removed
+
+    def _enforce_quota(self):
+        """Delete least recently used files and bundles until under max_bytes"""
+        if not self.max_bytes:
+            return 0
+
+        entries = [(stat.st_mtime, stat.st_size, path, None) for path, stat in self._loose_files()]
+        entries += [(stat.st_mtime, stat.st_size, None, bundle) for bundle, stat in self._bundle_stats()]
+
+        total = sum(size for _, size, _, _ in entries)
+        evicted = 0
+        for _, size, path, bundle in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            if bundle:
+                self._remove_bundle(bundle)
+            else:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                self._remove_empty_dirs(os.path.dirname(path))
+            total -= size
+            evicted += 1
+        return evicted
+
+    def _bundles(self):
+        """File names of all archive bundles"""
+        try:
+            return sorted(name for name in os.listdir(self.archive_dir) if name.endswith('.tar.gz'))
+        except FileNotFoundError:
+            return []
+
+    def _remove_bundle(self, bundle):
+        """Delete a bundle and its index entries (with self.lock held)"""
+        try:
+            os.remove(os.path.join(self.archive_dir, bundle))
+        except FileNotFoundError:
+            pass
+        index = self._load_index()
+        self._save_index({name: b for name, b in index.items() if b != bundle})
+
+    def _remove_empty_dirs(self, path):
+        """Remove path and its parents up to the storage directory while they are empty"""
+        root = os.path.abspath(self.directory)
+        path = os.path.abspath(path)
+        while path != root and path.startswith(root):
+            try:
+                os.rmdir(path)
+            except OSError:
+                return
+            path = os.path.dirname(path)
+
+    def _load_index(self):
+        """Load the archived file index"""
+        try:
+            with open(os.path.join(self.archive_dir, INDEX_FILENAME), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_index(self, index):
+        """Save the archived file index atomically"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(self.archive_dir, INDEX_FILENAME)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        os.replace(path + '.tmp', path)
+
+    def get_stats(self):
+        """Get storage statistics (without the lock: /stats never waits for a compaction)
+
+        Walks every shard - call it from a thread, not the event loop.
+        """
+        loose = [stat.st_size for _, stat in self._loose_files()]
+        bundles = [stat.st_size for _, stat in self._bundle_stats()]
+        return {
+            'files': len(loose),
+            'bytes': sum(loose),
+            'bundles': len(bundles),
+            'bundle_bytes': sum(bundles),
+            'archived_files': len(self._load_index())
+        }
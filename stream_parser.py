@@ -0,0 +1,80 @@
+"""
+Stream Parser - Pulls complete objects out of a streamed {"variants": [...]} JSON response
+"""
+import json
+import re
+
+
+class VariantStreamParser:
+    """Feed response text as it arrives, get back each array item as soon as it closes"""
+
+    def __init__(self, key='variants'):
+        self.array_start = re.compile(r'"' + re.escape(key) + r'"\s*:\s*\[')
+        self.buffer = ''
+        self.pos = 0           # Next character of buffer to scan
+        self.in_array = False
+        self.done = False
+        self.depth = 0         # Nesting inside the current item
+        self.in_string = False
+        self.escape = False
+        self.item_start = None
+
+    def feed(self, text):
+        """Add streamed text, returns the items completed by it"""
+        if self.done:
+            return []
+        self.buffer += text
+
+        if not self.in_array:
+            match = self.array_start.search(self.buffer)
+            if match is None:
+                return []
+            self.in_array = True
+            self.buffer = self.buffer[match.end():]
+            self.pos = 0
+
+        items = []
+        buffer = self.buffer
+        i = self.pos
+        while i < len(buffer):
+            char = buffer[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in '{[':
+                if self.depth == 0:
+                    self.item_start = i
+                self.depth += 1
+            elif char in '}]':
+                if self.depth == 0:
+                    # End of the variants array
+                    self.done = True
+                    break
+                self.depth -= 1
+                if self.depth == 0:
+                    item = self._parse(buffer[self.item_start:i + 1])
+                    if item is not None:
+                        items.append(item)
+                    # Drop consumed text so the buffer stays small
+                    buffer = buffer[i + 1:]
+                    self.item_start = None
+                    i = -1
+            i += 1
+
+        self.buffer = buffer
+        self.pos = i
+        return items
+
+    def _parse(self, text):
+        """Parse one item, None (and a log line) if it is not valid JSON"""
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as e:
+            print(f"Skipping malformed streamed variant: {e}")
+            return None
@@ -0,0 +1,169 @@
+"""
+Tests for album delivery in the Telegram bot (with a fake Telegram API)
+"""
+import asyncio
+import io
+from types import SimpleNamespace
+
+from PIL import Image
+
+import config
+
+VARIANTS = [
+    {'format': 'quick_tip', 'title': f'სათაური {idx}', 'main_text': f'ტექსტი {idx}', 'caption': 'c'}
+    for idx in range(1, 4)
+]
+
+
+class FakeBot:
+    def __init__(self):
+        self.albums = []
+        self.animations = []
+        self.messages = []
+        self.next_id = 100
+
+    async def send_media_group(self, chat_id, media):
+        self.albums.append(media)
+        messages = []
+        for _ in media:
+            self.next_id += 1
+            messages.append(SimpleNamespace(message_id=self.next_id))
+        return messages
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        self.next_id += 1
+        self.messages.append((text, reply_markup))
+        return SimpleNamespace(message_id=self.next_id)
+
+    async def send_animation(self, chat_id, animation, filename=None, caption=None, reply_markup=None,
+                             parse_mode=None):
+        self.next_id += 1
+        self.animations.append((animation, filename))
+        self.messages.append((caption, reply_markup))
+        return SimpleNamespace(message_id=self.next_id)
+
+    async def send_photo(self, chat_id, photo, caption=None, reply_markup=None, parse_mode=None):
+        self.next_id += 1
+        self.messages.append((caption, reply_markup))
+        return SimpleNamespace(message_id=self.next_id)
+
+
+def test_album_keeps_variant_order_and_button_mapping(parenting_bot):
+    fake_bot = FakeBot()
+    context = SimpleNamespace(bot=fake_bot)
+    parenting_bot.current_variants[1] = {}
+
+    asyncio.run(parenting_bot._send_album(1, context, VARIANTS, 'session'))
+
+    assert len(fake_bot.albums) == 1
+    captions = [item.caption for item in fake_bot.albums[0]]
+    assert [f'ვარიანტი {idx}' in caption for idx, caption in enumerate(captions, 1)] == [True] * 3
+
+    stored = parenting_bot.current_variants[1]
+    assert [stored[idx]['content']['title'] for idx in (1, 2, 3)] == [v['title'] for v in VARIANTS]
+    assert len({stored[idx]['message_id'] for idx in stored}) == 3
+
+    # One keyboard message, rating rows point at the right variant numbers
+    assert len(fake_bot.messages) == 1
+    keyboard = fake_bot.messages[0][1].inline_keyboard
+    rating_rows = [row for row in keyboard if row[0].callback_data.startswith('rate_')]
+    assert [row[0].callback_data for row in rating_rows] == ['rate_1_love', 'rate_2_love', 'rate_3_love']
+
+
+def test_rated_variant_loses_only_its_rating_row(parenting_bot):
+    fake_bot = FakeBot()
+    parenting_bot.current_variants[1] = {}
+    asyncio.run(parenting_bot._send_album(1, SimpleNamespace(bot=fake_bot), VARIANTS, 'session'))
+
+    parenting_bot.current_variants[1][2]['rated'] = True
+    keyboard = parenting_bot._create_album_keyboard(1).inline_keyboard
+    rating_targets = [row[0].callback_data for row in keyboard if row[0].callback_data.startswith('rate_')]
+    assert rating_targets == ['rate_1_love', 'rate_3_love']
+
+
+def test_streamed_variants_are_sent_before_the_stream_ends(parenting_bot):
+    fake_bot = FakeBot()
+    parenting_bot.current_variants[1] = {}
+    sent_while_streaming = []
+
+    async def stream():
+        for idx, variant in enumerate(VARIANTS, 1):
+            yield variant
+            # Give the sender time to deliver what has arrived so far (header + idx photos)
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if len(fake_bot.messages) >= idx + 1:
+                    break
+            sent_while_streaming.append(len(fake_bot.messages))
+
+    received = asyncio.run(parenting_bot._send_variants_individually(
+        1, SimpleNamespace(bot=fake_bot), stream(), 'session'
+    ))
+
+    assert received == 3
+    assert sent_while_streaming[0] >= 2  # Header and variant 1 went out while 2 and 3 were pending
+    captions = [caption for caption, _ in fake_bot.messages[1:4]]
+    assert [f'ვარიანტი {idx}' in caption for idx, caption in enumerate(captions, 1)] == [True] * 3
+
+
+CAROUSEL = {'format': 'myth_vs_reality', 'title': 'მითი VS რეალობა', 'caption': 'c', 'hashtags': [],
+            'main_text': 'მითი: ბავშვი ტირილით გამოგცდის.\nრეალობა: ტირილი მისი ენაა.'}
+
+
+def test_carousel_follows_the_album_as_its_own_media_group(parenting_bot, monkeypatch):
+    monkeypatch.setattr(config, 'CAROUSEL_DELIVERY', 'slides')
+    monkeypatch.setattr(config, 'CAROUSEL_SLIDE_CHARS', 30)
+    fake_bot = FakeBot()
+    parenting_bot.current_variants[1] = {}
+
+    received = asyncio.run(parenting_bot._send_album(1, SimpleNamespace(bot=fake_bot), VARIANTS[:2] + [CAROUSEL], 's'))
+
+    assert received == 3
+    album, slides = fake_bot.albums
+    assert len(album) == 2
+    assert len(slides) == 3  # Cover and one slide per line
+    assert 'ვარიანტი 3' in slides[0].caption and slides[1].caption is None
+    assert len({Image.open(io.BytesIO(slide.media.input_file_content)).size for slide in slides}) == 1
+
+    stored = parenting_bot.current_variants[1][3]
+    assert stored['album'] is False and stored['preview'] is False
+    text, keyboard = fake_bot.messages[-1]
+    assert 'ვარიანტი 3' in text and stored['message_id'] == fake_bot.next_id
+    assert keyboard.inline_keyboard[0][0].callback_data == 'rate_3_love'
+
+
+def test_carousel_as_one_animation(parenting_bot, monkeypatch):
+    monkeypatch.setattr(config, 'CAROUSEL_DELIVERY', 'animation')
+    monkeypatch.setattr(config, 'ANIMATION_FORMAT', 'gif')
+    monkeypatch.setattr(config, 'ANIMATION_SCALE', 0.25)
+    monkeypatch.setattr(config, 'ANIMATION_TRANSITION_FRAMES', 1)
+    fake_bot = FakeBot()
+    parenting_bot.current_variants[1] = {}
+
+    asyncio.run(parenting_bot._send_variants_individually(1, SimpleNamespace(bot=fake_bot), [CAROUSEL], 's'))
+
+    [(data, filename)] = fake_bot.animations
+    assert filename == 'variant_1.gif'
+    assert Image.open(io.BytesIO(data)).n_frames > 1
+    assert fake_bot.albums == []
+    stored = parenting_bot.current_variants[1][1]
+    assert parenting_bot.render_service.encode_stats.get_stats()[stored['style']]['format'] == 'GIF'
+
+
+def test_style_change_keeps_a_carousel_a_carousel(parenting_bot, monkeypatch):
+    monkeypatch.setattr(config, 'CAROUSEL_DELIVERY', 'slides')
+    monkeypatch.setattr(config, 'CAROUSEL_SLIDE_CHARS', 30)
+    fake_bot = FakeBot()
+    context = SimpleNamespace(bot=fake_bot)
+    parenting_bot.current_variants[1] = {}
+    asyncio.run(parenting_bot._send_variants_individually(1, context, [CAROUSEL], 's'))
+    old_style = parenting_bot.current_variants[1][1]['style']
+    query = SimpleNamespace(message=SimpleNamespace(reply_text=lambda text: asyncio.sleep(0)))
+
+    asyncio.run(parenting_bot._handle_style_change(query, 'style_1', 1, context))
+
+    first, restyled = fake_bot.albums
+    assert len(restyled) == len(first) == 3
+    assert restyled[0].caption.startswith('🎨 ახალი სტილი')
+    stored = parenting_bot.current_variants[1][1]
+    assert stored['style'] != old_style and stored['message_id'] == fake_bot.next_id
@@ -0,0 +1,32 @@
+"""
+Tests for the write-behind archive writer
+"""
+from archive_writer import ArchiveWriter
+
+
+def test_writes_in_background(tmp_path):
+    writer = ArchiveWriter(directory=str(tmp_path), enabled=True)
+    filepath = writer.submit(b'image-bytes', 'a.png')
+    writer.flush()
+    writer.close()
+    assert open(filepath, 'rb').read() == b'image-bytes'
+    assert writer.written == 1
+
+
+def test_disabled_archive_skips_disk(tmp_path):
+    writer = ArchiveWriter(directory=str(tmp_path), enabled=False)
+    assert writer.submit(b'image-bytes', 'a.png') is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_storage_failure_is_reported_not_raised(tmp_path):
+    blocker = tmp_path / 'not_a_dir'
+    blocker.write_text('x')
+    errors = []
+    writer = ArchiveWriter(directory=str(blocker), enabled=True,
+                           on_error=lambda path, e: errors.append(path))
+    writer.submit(b'image-bytes', 'a.png')
+    writer.flush()
+    writer.close()
+    assert len(writer.failures) == 1
+    assert errors == [writer.failures[0][0]]
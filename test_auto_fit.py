@@ -0,0 +1,37 @@
+"""
+Tests for auto-fit text sizing
+"""
+import config
+from design_generator import DesignGenerator
+
+LONG_TEXT = ' '.join(['ბავშვს სჭირდება მშვიდი და თანმიმდევრული მშობელი.'] * 12)
+
+
+def test_short_text_keeps_base_size():
+    generator = DesignGenerator()
+    font, _ = generator._layout_main_text('მოკლე ტექსტი', 800, 500, 70, bottom=1500)
+    assert font is generator.fonts['main']
+
+
+def test_long_text_shrinks_to_fit_box():
+    generator = DesignGenerator()
+    font, lines = generator._layout_main_text(LONG_TEXT, 800, 500, 70, bottom=1500)
+    assert font.size < generator.font_sizes['main']
+    line_height = lines[1].y - lines[0].y
+    assert lines[-1].y + line_height <= 1500
+    assert all(line.width <= 800 for line in lines)
+
+
+def test_fit_reuses_loaded_fonts():
+    generator = DesignGenerator()
+    generator._layout_main_text(LONG_TEXT, 800, 500, 70, bottom=1500)
+    loads = generator.font_cache.loads
+    generator._layout_main_text(LONG_TEXT + ' დიახ', 800, 500, 70, bottom=1500)
+    assert generator.font_cache.loads == loads
+
+
+def test_auto_fit_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(config, 'AUTO_FIT_TEXT', False)
+    generator = DesignGenerator()
+    font, _ = generator._layout_main_text(LONG_TEXT, 800, 500, 70, bottom=1500)
+    assert font is generator.fonts['main']
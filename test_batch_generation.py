@@ -0,0 +1,151 @@
+"""
+Tests for scheduled batch generation (with a local fake Message Batches server)
+"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import config
+
+RESPONSE = {'variants': [{'format': 'quick_tip', 'title': 'სათაური', 'main_text': 'ტექსტი', 'caption': 'აღწერა',
+                          'hashtags': ['#მშობლობა'], 'visual_notes': ''}]}
+
+
+class FakeBatchServer:
+    """messages.batches stand-in: a batch ends after `polls_to_end` retrieves"""
+
+    def __init__(self, polls_to_end=2, result_type='succeeded'):
+        self.polls_to_end = polls_to_end
+        self.result_type = result_type
+        self.batches = {}
+        self.retrieves = 0
+        self.cancelled = []
+
+    async def create(self, requests):
+        batch_id = f'msgbatch_{len(self.batches) + 1}'
+        self.batches[batch_id] = {'requests': list(requests), 'polls': 0}
+        return SimpleNamespace(id=batch_id, processing_status='in_progress')
+
+    async def retrieve(self, batch_id):
+        self.retrieves += 1
+        batch = self.batches[batch_id]
+        batch['polls'] += 1
+        status = 'ended' if batch['polls'] >= self.polls_to_end else 'in_progress'
+        return SimpleNamespace(id=batch_id, processing_status=status)
+
+    async def cancel(self, batch_id):
+        self.cancelled.append(batch_id)
+
+    async def results(self, batch_id):
+        async def entries():
+            for request in self.batches[batch_id]['requests']:
+                message = SimpleNamespace(
+                    content=[SimpleNamespace(text=json.dumps(RESPONSE, ensure_ascii=False))],
+                    usage=SimpleNamespace(input_tokens=50, output_tokens=400),
+                    model=request['params']['model']
+                )
+                yield SimpleNamespace(custom_id=request['custom_id'],
+                                      result=SimpleNamespace(type=self.result_type, message=message))
+        return entries()
+
+
+@pytest.fixture
+def generator(creator, data_dir, monkeypatch):
+    monkeypatch.setattr(config, 'BATCH_POLL_INITIAL', 0.01)
+    monkeypatch.setattr(config, 'BATCH_POLL_MAX', 0.02)
+    from batch_generation import BatchGenerator
+    server = FakeBatchServer()
+    return BatchGenerator(creator, state_file=str(data_dir / 'batch.json'),
+                          client=SimpleNamespace(messages=SimpleNamespace(batches=server)))
+
+
+def test_submitted_batch_is_collected_after_polling(generator):
+    server = generator.batches
+
+    async def run():
+        batch_id = await generator.submit(1, 'ნიუსი')
+        assert generator.pending() == batch_id
+        return await generator.collect(timeout=5)
+
+    assert asyncio.run(run()) == RESPONSE['variants']
+    assert server.retrieves == 2
+    request = server.batches['msgbatch_1']['requests'][0]['params']
+    assert 'ნიუსი' in request['messages'][0]['content']
+    assert generator.pending() is None
+    assert generator.creator.metrics.get_stats()['batch']['calls'] == 1
+
+
+def test_short_batch_is_topped_up_live(generator, fake_client):
+    topped_up = dict(RESPONSE['variants'][0], title='სხვა სათაური', format='myth_vs_reality')
+    requests = []
+
+    class LiveMessages:
+        async def create(self, **request):
+            requests.append(request)
+            return SimpleNamespace(
+                content=[SimpleNamespace(text=json.dumps({'variants': [topped_up]}, ensure_ascii=False))],
+                usage=SimpleNamespace(input_tokens=50, output_tokens=200), model=request['model']
+            )
+
+    generator.creator._async_client = fake_client(LiveMessages())
+
+    async def run():
+        await generator.submit(2, 'ნიუსი')
+        return await generator.collect(timeout=5)
+
+    assert asyncio.run(run()) == RESPONSE['variants'] + [topped_up]
+    assert len(requests) == 1 and 'ნიუსი' in requests[0]['messages'][0]['content']
+    stats = generator.creator.metrics.get_stats()
+    assert stats['batch']['invalid_variants'] == 1
+    assert stats['generate']['retry_rate'] == 1.0
+
+
+def test_pending_batch_survives_a_restart(generator):
+    from batch_generation import BatchGenerator
+    asyncio.run(generator.submit(1))
+    restarted = BatchGenerator(generator.creator, state_file=generator.state_file, client=generator._client)
+    assert asyncio.run(restarted.collect(timeout=5)) == RESPONSE['variants']
+
+
+def test_late_batch_is_cancelled(generator):
+    server = generator.batches
+    server.polls_to_end = 10 ** 6
+
+    async def run():
+        await generator.submit(1)
+        return await generator.collect(timeout=0.05)
+
+    assert asyncio.run(run()) == []
+    assert server.cancelled == ['msgbatch_1']
+    assert generator.pending() is None
+
+
+def test_failed_request_and_missing_batch_return_nothing(generator):
+    generator.batches.result_type = 'errored'
+    assert asyncio.run(generator.collect()) == []
+
+    async def run():
+        await generator.submit(1)
+        return await generator.collect(timeout=5)
+
+    assert asyncio.run(run()) == []
+
+
+def test_scheduled_generation_falls_back_to_live_call(parenting_bot, monkeypatch):
+    monkeypatch.setattr(config, 'BATCH_GENERATION', True)
+    monkeypatch.setattr(config, 'ADMIN_CHAT_ID', '1')
+    delivered = []
+
+    async def generate_and_send(chat_id, context, variants=None):
+        delivered.append(variants)
+
+    async def send_message(chat_id, text):
+        pass
+
+    parenting_bot._generate_and_send = generate_and_send
+    asyncio.run(parenting_bot.scheduled_generation(SimpleNamespace(bot=SimpleNamespace(send_message=send_message))))
+
+    # No batch was submitted, so the live path (variants=None) runs
+    assert delivered == [None]
@@ -0,0 +1,51 @@
+"""
+Tests for the renderer benchmark suite
+"""
+import copy
+import json
+
+import benchmark
+
+
+def test_report_covers_every_style_and_stage():
+    report = benchmark.run_benchmark(resolutions=['540x960'], repeat=1)
+    json.dumps(report)
+    styles = report['results']['540x960']
+    assert set(styles) == set(benchmark.config.VISUAL_STYLE_DISTRIBUTION)
+    for entry in styles.values():
+        assert set(entry['stages_ms']) == set(benchmark.STAGES)
+        assert entry['encoded_kb'] > 0
+        if entry['render_peak_kb'] is None:  # No /proc
+            assert entry['stages_peak_kb'] is None
+            continue
+        assert entry['render_peak_kb'] > 0
+        assert set(entry['stages_peak_kb']) <= set(benchmark.STAGES)
+        assert 'encode' in entry['stages_peak_kb']
+        assert max(entry['stages_peak_kb'].values()) <= entry['render_peak_kb']
+
+
+def test_compare_flags_only_real_regressions():
+    report = benchmark.run_benchmark(resolutions=['540x960'], styles=['minimalist'], repeat=1)
+    baseline = copy.deepcopy(report)
+    assert benchmark.compare(report, baseline) == []
+
+    slower = copy.deepcopy(report)
+    slower['results']['540x960']['minimalist']['stages_ms']['encode'] += 50
+    regressions = benchmark.compare(slower, baseline, threshold=0.25)
+    assert [r['stage'] for r in regressions] == ['encode']
+
+
+def test_cli_exit_code(tmp_path):
+    baseline = tmp_path / 'baseline.json'
+    assert benchmark.main(['--resolutions', '540x960', '--styles', 'story_card',
+                           '--repeat', '1', '--output', str(baseline)]) == 0
+
+    data = json.loads(baseline.read_text(encoding='utf-8'))
+    for stage in data['results']['540x960']['story_card']['stages_ms']:
+        data['results']['540x960']['story_card']['stages_ms'][stage] = 0.0
+    data['results']['540x960']['story_card']['total_ms'] = 0.0
+    baseline.write_text(json.dumps(data), encoding='utf-8')
+
+    assert benchmark.main(['--resolutions', '540x960', '--styles', 'story_card', '--repeat', '1',
+                           '--output', str(tmp_path / 'current.json'),
+                           '--compare', str(baseline), '--threshold', '0.1']) == 1
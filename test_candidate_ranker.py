@@ -0,0 +1,102 @@
+"""
+Tests for draft ranking and the tiered draft/polish generation
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import config
+import candidate_ranker
+from duplicate_index import DuplicateIndex
+
+FIELDS = {'caption': 'აღწერა', 'hashtags': ['#მშობლობა'], 'visual_notes': ''}
+SCREEN_TIME = dict(FIELDS, format='quick_tip', title='ეკრანთან დრო',
+                   main_text='სკოლამდელ ასაკში ეკრანთან გატარებული დრო დღეში ერთ საათს არ უნდა აღემატებოდეს.')
+TANTRUMS = dict(FIELDS, format='myth_vs_reality', title='ისტერიკა მანიპულაცია არ არის',
+                main_text='პატარა ბავშვის ისტერიკა ემოციების მართვის უუნარობაა და არა მშობლის მანიპულაცია.')
+TOO_LONG = dict(FIELDS, format='myth_vs_reality', title='ძალიან გრძელი',
+                main_text='ბავშვს სჭირდება რუტინა, სიყვარული და საზღვრები. ' * 7)
+SPEC = {'format': 'quick_tip', 'tone': 'friendly', 'age_group': 'preschool'}
+WEIGHTS = {'formats': {'quick_tip': 0.2, 'myth_vs_reality': 0.8}, 'tones': {'friendly': 1.0}}
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'CONTENT_INDEX_FILE', str(tmp_path / 'content_index.jsonl'))
+    return DuplicateIndex(threshold=0.5)
+
+
+def test_scores_prefer_fitting_new_and_liked_content(index):
+    assert candidate_ranker.length_score(TANTRUMS) == 1.0
+    assert candidate_ranker.length_score(TOO_LONG) < 0.75
+    assert candidate_ranker.preference_score(TANTRUMS, SPEC, WEIGHTS) > \
+        candidate_ranker.preference_score(SCREEN_TIME, SPEC, WEIGHTS)
+
+    picks = candidate_ranker.pick([(SPEC, TOO_LONG), (SPEC, SCREEN_TIME), (SPEC, TANTRUMS)], 2, WEIGHTS, index, 0.5)
+    assert [variant['title'] for _, variant in picks] == [TANTRUMS['title'], SCREEN_TIME['title']]
+
+
+def test_repeats_of_history_and_of_each_other_are_skipped(index):
+    index.add(TANTRUMS)
+    reworded = dict(SCREEN_TIME, title='ეკრანთან დრო!')
+    picks = candidate_ranker.pick([(SPEC, TANTRUMS), (SPEC, SCREEN_TIME), (SPEC, reworded)], 3, WEIGHTS, index, 0.5)
+    assert [variant['title'] for _, variant in picks] == [SCREEN_TIME['title']]
+
+
+class TieredMessages:
+    """Draft model returns three candidates, the final model polishes what it is sent"""
+
+    def __init__(self):
+        self.models = []
+
+    async def create(self, **request):
+        self.models.append(request['model'])
+        if request['model'] == config.DRAFT_MODEL:
+            variants = [TOO_LONG, SCREEN_TIME, TANTRUMS]
+        else:
+            variants = [dict(TANTRUMS, title='ისტერიკა მანიპულაცია არ არის ✨')]
+        block = SimpleNamespace(type='tool_use', input={'variants': variants})
+        usage = SimpleNamespace(input_tokens=1000, output_tokens=1000)
+        return SimpleNamespace(content=[block], usage=usage, model=request['model'])
+
+
+def test_tiered_generation_drafts_ranks_and_polishes(creator, monkeypatch, fake_client):
+    monkeypatch.setattr(config, 'DUPLICATE_CHECK', True)
+    monkeypatch.setattr(config, 'TIERED_GENERATION', True)
+    monkeypatch.setattr(config, 'DRAFT_OVERSAMPLE', 3)
+    messages = TieredMessages()
+    creator._async_client = fake_client(messages)
+
+    variants = asyncio.run(creator.agenerate_content_ideas(count=1))
+
+    assert messages.models == [config.DRAFT_MODEL, config.FINAL_MODEL]
+    assert [variant['title'] for variant in variants] == ['ისტერიკა მანიპულაცია არ არის ✨']
+    # Only the final is indexed, discarded drafts don't block future topics
+    assert creator.duplicates.get_stats()['indexed'] == 1
+    stats = creator.metrics.get_stats()
+    draft_price, final_price = (config.MODEL_PRICES[config.DRAFT_MODEL], config.MODEL_PRICES[config.FINAL_MODEL])
+    assert stats['draft']['cost_usd'] == round(sum(draft_price) / 1000, 4)
+    assert stats['polish']['cost_usd'] == round(sum(final_price) / 1000, 4)
+
+
+def test_tiered_generation_tops_up_missing_finals(creator, monkeypatch, fake_client):
+    monkeypatch.setattr(config, 'TIERED_GENERATION', True)
+    monkeypatch.setattr(config, 'DRAFT_OVERSAMPLE', 1)
+    monkeypatch.setattr(config, 'GENERATION_RETRIES', 1)
+    broken = {'format': 'quick_tip', 'title': 'უკაპშენო'}
+    responses = {config.DRAFT_MODEL: [[TANTRUMS, broken]], config.FINAL_MODEL: [[TANTRUMS], [SCREEN_TIME]]}
+    models = []
+
+    async def create(**request):
+        models.append(request['model'])
+        block = SimpleNamespace(type='tool_use', input={'variants': responses[request['model']].pop(0)})
+        return SimpleNamespace(content=[block], usage=None, model=request['model'])
+
+    creator._async_client = fake_client(SimpleNamespace(create=create))
+    variants = asyncio.run(creator.agenerate_content_ideas(count=2))
+
+    # One usable draft: polished, and the second slot is generated on the final model
+    assert models == [config.DRAFT_MODEL, config.FINAL_MODEL, config.FINAL_MODEL]
+    assert [variant['title'] for variant in variants] == [TANTRUMS['title'], SCREEN_TIME['title']]
+    assert creator.metrics.get_stats()['generate']['retry_rate'] == 1.0
@@ -0,0 +1,110 @@
+"""
+Tests for carousel slides and animated WebP/GIF rendering
+"""
+import io
+import weakref
+
+from PIL import Image, ImageChops, ImageSequence, ImageStat
+
+import config
+from carousel_renderer import CarouselRenderer, split_slides
+
+CONTENT = {
+    'format': 'myth_vs_reality',
+    'title': 'მითი VS რეალობა',
+    'main_text': 'მითი: ბავშვი ტირილით გამოგცდის.\nრეალობა: ტირილი მისი ენაა.\nმოუსმინე და დაარქვი გრძნობას სახელი.'
+}
+
+
+def test_split_slides_cover_then_chunks():
+    slides = split_slides(CONTENT, max_slides=6, slide_chars=40)
+    assert slides[0]['title'] == CONTENT['title'] and slides[0]['main_text'] == ''
+    assert [s['main_text'] for s in slides[1:]] == CONTENT['main_text'].split('\n')
+    assert all(s['format'] == 'myth_vs_reality' for s in slides)
+
+
+def test_split_slides_respects_max_slides():
+    slides = split_slides(CONTENT, max_slides=3, slide_chars=40)
+    assert len(slides) == 3
+    assert 'სახელი' in slides[-1]['main_text']
+
+
+def test_transition_only_changes_the_differing_region():
+    before = Image.new('RGB', (100, 100), 'white')
+    after = before.copy()
+    after.paste((0, 0, 0), (40, 40, 60, 60))
+
+    frames = list(CarouselRenderer()._transition(before, after, 3))
+    assert len(frames) == 3
+    for frame, _ in frames:
+        assert ImageChops.difference(frame, before).getbbox() == (40, 40, 60, 60)
+
+
+def test_animation_fits_memory_budget(monkeypatch):
+    monkeypatch.setattr(config, 'ANIMATION_MAX_BYTES', 4 * 1024 * 1024)
+    scale, steps = CarouselRenderer().plan_animation(4, scale=0.5, transition_frames=6)
+    frame_bytes = round(1080 * scale) * round(1920 * scale) * 3
+    assert steps == 0
+    assert 4 * frame_bytes <= config.ANIMATION_MAX_BYTES
+
+
+def test_render_animation_formats(monkeypatch):
+    monkeypatch.setattr(config, 'ANIMATION_SCALE', 0.25)
+    monkeypatch.setattr(config, 'ANIMATION_TRANSITION_FRAMES', 2)
+    renderer = CarouselRenderer()
+    for fmt in ('webp', 'gif'):
+        encoded = renderer.render_animation(CONTENT, 'minimalist', fmt)
+        img = Image.open(io.BytesIO(encoded.data))
+        assert img.format == fmt.upper()
+        assert img.size == (270, 480)
+        assert img.n_frames == len(split_slides(CONTENT)) * 3 - 2
+        img.load()
+        assert img.info['duration'] == config.ANIMATION_SLIDE_MS
+
+
+def test_gif_is_written_frame_by_frame(monkeypatch):
+    monkeypatch.setattr(config, 'ANIMATION_SCALE', 0.25)
+    monkeypatch.setattr(config, 'ANIMATION_TRANSITION_FRAMES', 3)
+    monkeypatch.setattr(config, 'CAROUSEL_SLIDE_CHARS', 40)
+    renderer = CarouselRenderer()
+    refs = []
+    peak = [0]
+    iter_frames = renderer.iter_frames
+
+    def tracked(slides, steps):
+        for frame, duration in iter_frames(slides, steps):
+            refs.append(weakref.ref(frame))
+            peak[0] = max(peak[0], sum(ref() is not None for ref in refs))
+            yield frame, duration
+
+    monkeypatch.setattr(renderer, 'iter_frames', tracked)
+    encoded = renderer.render_animation(CONTENT, 'minimalist', 'gif')
+
+    img = Image.open(io.BytesIO(encoded.data))
+    slides = len(split_slides(CONTENT))
+    assert img.n_frames == slides + (slides - 1) * 3
+    # Only the frames the writer and the crossfade still compare against stay alive
+    assert peak[0] <= 3 < img.n_frames
+    # Later frames are stored as the changed region only, and decode back to full frames
+    img.seek(1)
+    assert img.tile[0][1] != (0, 0) + img.size
+    assert all(frame.convert('RGB').size == (270, 480) for frame in ImageSequence.Iterator(img))
+
+
+def test_gif_frames_decode_to_the_rendered_frames(monkeypatch):
+    monkeypatch.setattr(config, 'ANIMATION_SCALE', 0.25)
+    monkeypatch.setattr(config, 'ANIMATION_TRANSITION_FRAMES', 2)
+    monkeypatch.setattr(config, 'CAROUSEL_SLIDE_CHARS', 40)
+    renderer = CarouselRenderer()
+    encoded = renderer.render_animation(CONTENT, 'minimalist', 'gif')
+
+    scale, steps = renderer.plan_animation(len(split_slides(CONTENT)))
+    expected = list(renderer.iter_frames(renderer.iter_slides(CONTENT, 'minimalist', scale), steps))
+    img = Image.open(io.BytesIO(encoded.data))
+    decoded = [(frame.convert('RGB'), frame.info['duration']) for frame in ImageSequence.Iterator(img)]
+
+    assert len(decoded) == len(expected)
+    for (frame, duration), (want, want_duration) in zip(decoded, expected):
+        assert duration == want_duration
+        # Only palette quantization separates the decoded frame from the rendered one
+        assert max(ImageStat.Stat(ImageChops.difference(frame, want)).mean) < 4
@@ -0,0 +1,185 @@
+"""
+Tests for the async Claude path of ContentCreator (with a fake API client)
+"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import config
+
+VARIANT = {'format': 'quick_tip', 'title': 'სათაური', 'main_text': 'ტექსტი', 'caption': 'აღწერა',
+           'hashtags': ['#მშობლობა'], 'visual_notes': ''}
+RESPONSE = {'variants': [VARIANT]}
+
+
+class FakeMessages:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+
+    async def create(self, **request):
+        self.calls.append(request)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        # First call writes the cached prefix, later calls read it
+        cached = len(self.calls) > 1
+        usage = SimpleNamespace(input_tokens=50, output_tokens=400,
+                                cache_creation_input_tokens=0 if cached else 1500,
+                                cache_read_input_tokens=1500 if cached else 0)
+        return SimpleNamespace(content=[SimpleNamespace(text=json.dumps(RESPONSE, ensure_ascii=False))],
+                               usage=usage)
+
+
+def test_async_generation_parses_variants(creator, fake_client):
+    messages = FakeMessages()
+    creator._async_client = fake_client(messages)
+
+    variants = asyncio.run(creator.agenerate_content_ideas(count=1))
+
+    assert variants == RESPONSE['variants']
+    assert messages.calls[0]['max_tokens'] == 4000
+
+
+@pytest.mark.parametrize('structured', [True, False])
+def test_stable_prefix_is_cached_system_prompt(creator, monkeypatch, structured):
+    from content_creator import SYSTEM_PROMPT, TOOL_SYSTEM_PROMPT
+    monkeypatch.setattr(config, 'PROMPT_CACHING', True)
+    monkeypatch.setattr(config, 'STRUCTURED_OUTPUT', structured)
+    generation = creator._generation_request(2, 'ნიუსი')
+    feedback = creator._feedback_request(RESPONSE['variants'][0], 'უფრო მოკლედ')
+
+    # Both requests share the same cached prefix (tools, then system); variable parts
+    # stay in the user message
+    assert generation.get('tools') == feedback.get('tools')
+    assert generation['system'] == feedback['system']
+    system_prompt = TOOL_SYSTEM_PROMPT if structured else SYSTEM_PROMPT
+    assert generation['system'] == [{'type': 'text', 'text': system_prompt,
+                                     'cache_control': {'type': 'ephemeral'}}]
+    assert ('მხოლოდ JSON' in system_prompt) != structured
+    user_prompt = generation['messages'][0]['content']
+    assert 'ნიუსი' in user_prompt
+    assert 'ნიკა გაბლიშვილი' not in user_prompt
+    assert 'უფრო მოკლედ' in feedback['messages'][0]['content']
+
+
+def test_usage_and_cache_hits_are_recorded(creator, fake_client):
+    creator._async_client = fake_client(FakeMessages())
+
+    async def run():
+        await creator.agenerate_content_ideas(count=1)
+        await creator.agenerate_content_ideas(count=1)
+        await creator.aregenerate_with_feedback(RESPONSE['variants'][0], 'უფრო მოკლედ')
+
+    asyncio.run(run())
+    stats = creator.metrics.get_stats()
+    assert stats['generate']['calls'] == 2
+    assert stats['generate']['cache_write_tokens'] == 1500
+    assert stats['generate']['cache_read_tokens'] == 1500
+    assert stats['generate']['cache_hit_rate'] == 0.5
+    assert stats['feedback']['cache_hit_rate'] == 1.0
+
+    # Totals survive a restart through the usage log
+    from metrics import ApiMetrics
+    assert ApiMetrics(config.API_USAGE_FILE).get_stats() == stats
+
+
+def test_concurrency_is_limited(creator, monkeypatch, fake_client):
+    monkeypatch.setattr(config, 'ANTHROPIC_MAX_CONCURRENCY', 2)
+    messages = FakeMessages(delay=0.05)
+    creator._async_client = fake_client(messages)
+
+    async def run():
+        return await asyncio.gather(*(creator.agenerate_content_ideas(count=1) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(results) == 5
+    assert messages.max_in_flight == 2
+
+
+def test_generation_can_be_cancelled(creator, fake_client):
+    messages = FakeMessages(delay=10)
+    creator._async_client = fake_client(messages)
+
+    async def run():
+        task = asyncio.ensure_future(creator.agenerate_content_ideas(count=1))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return messages.in_flight
+
+    assert asyncio.run(run()) == 0
+
+
+class ScriptedMessages:
+    """Answers each call with the next tool input (or raw text), recording the requests"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    async def create(self, **request):
+        self.calls.append(request)
+        response = self.responses.pop(0)
+        if isinstance(response, str):
+            block = SimpleNamespace(type='text', text=response)
+        else:
+            block = SimpleNamespace(type='tool_use', name=request['tool_choice']['name'], input=response)
+        return SimpleNamespace(content=[block], usage=None)
+
+
+def test_requests_force_the_schema_tool(creator, monkeypatch):
+    monkeypatch.setattr(config, 'STRUCTURED_OUTPUT', True)
+    generation = creator._generation_request(2, None)
+    feedback = creator._feedback_request(VARIANT, 'უფრო მოკლედ')
+    assert generation['tool_choice'] == {'type': 'tool', 'name': 'submit_variants'}
+    assert generation['tools'][0]['input_schema']['properties']['variants']['type'] == 'array'
+    assert feedback['tool_choice'] == {'type': 'tool', 'name': 'submit_variant'}
+    assert [tool['name'] for tool in feedback['tools']] == ['submit_variants', 'submit_variant']
+
+
+def test_valid_variants_are_kept_and_only_broken_ones_rerequested(creator, monkeypatch, fake_client):
+    monkeypatch.setattr(config, 'GENERATION_RETRIES', 1)
+    second = dict(VARIANT, title='მეორე', main_text='სხვა ტექსტი')
+    messages = ScriptedMessages([
+        {'variants': [VARIANT, {'format': 'quick_tip', 'title': 'უკაპშენო'}]},
+        {'variants': [second]}
+    ])
+    creator._async_client = fake_client(messages)
+
+    assert asyncio.run(creator.agenerate_content_ideas(count=2)) == [VARIANT, second]
+    assert messages.calls[1]['messages'][0]['content'].count('ვარიანტი ') == 1
+    stats = creator.metrics.get_stats()['generate']
+    assert (stats['calls'], stats['invalid_variants'], stats['retry_rate']) == (2, 1, 0.5)
+
+
+def test_unparseable_response_is_retried_and_counted(creator, monkeypatch, fake_client):
+    monkeypatch.setattr(config, 'GENERATION_RETRIES', 1)
+    creator._async_client = fake_client(ScriptedMessages(['{"variants": [{"title": ', RESPONSE]))
+
+    assert asyncio.run(creator.agenerate_content_ideas(count=1)) == [VARIANT]
+    assert creator.metrics.get_stats()['generate']['parse_failure_rate'] == 0.5
+
+
+def test_malformed_feedback_keeps_the_original(creator, fake_client):
+    creator._async_client = fake_client(ScriptedMessages([{'title': 'მხოლოდ სათაური'}]))
+
+    assert asyncio.run(creator.aregenerate_with_feedback(VARIANT, 'უფრო მოკლედ')) is VARIANT
+    assert creator.metrics.get_stats()['feedback']['parse_failure_rate'] == 1.0
+
+
+def test_variant_validation():
+    from content_schema import VariantError, validate_variant
+    assert validate_variant(dict(VARIANT, hashtags='#ერთი #ორი'))['hashtags'] == ['#ერთი', '#ორი']
+    with pytest.raises(VariantError):
+        validate_variant(dict(VARIANT, format='poem'))
+    with pytest.raises(VariantError):
+        validate_variant(dict(VARIANT, main_text='ა' * 1000))
@@ -0,0 +1,81 @@
+"""
+Tests for the near-duplicate content index
+"""
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import config
+from duplicate_index import DuplicateIndex, normalize
+
+FIELDS = {'format': 'myth_vs_reality', 'caption': 'აღწერა', 'hashtags': ['#მშობლობა'], 'visual_notes': ''}
+PUNISHMENT = {
+    **FIELDS,
+    'title': 'მითი: ბავშვი უნდა დაისაჯოს',
+    'main_text': 'სინამდვილეში დასჯა ბავშვს არ ასწავლის ქცევის მართვას. უმჯობესია ახსნა და საზღვრების დაწესება.'
+}
+PUNISHMENT_REWORDED = {
+    **FIELDS,
+    'title': 'მითი - ბავშვის დასჯა აუცილებელია',
+    'main_text': 'სინამდვილეში დასჯა ბავშვს არ ასწავლის ქცევის მართვას, უმჯობესია ახსნა და მკაფიო საზღვრები!'
+}
+SLEEP = {
+    **FIELDS,
+    'title': 'ძილის რეჟიმი',
+    'main_text': 'სკოლამდელ ასაკში ბავშვს სჭირდება 10-13 საათი ძილი. დაიცავით ერთი და იგივე დრო.'
+}
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'CONTENT_INDEX_FILE', str(tmp_path / 'content_index.jsonl'))
+    monkeypatch.setattr(config, 'DUPLICATE_THRESHOLD', 0.5)
+    return DuplicateIndex()
+
+
+def test_normalize_folds_mtavruli_and_punctuation():
+    assert normalize('ᲛᲘᲗᲘ: ბავშვი!! 2024 😊') == 'მითი ბავშვი'
+
+
+def test_reworded_repeat_is_found_and_new_topic_is_not(index):
+    assert index.check_and_add(PUNISHMENT) is None
+    assert index.find_duplicate(PUNISHMENT_REWORDED) == PUNISHMENT['title']
+    assert index.check_and_add(SLEEP) is None
+    assert index.get_stats() == {'indexed': 2, 'checks': 3, 'duplicates': 1}
+
+
+def test_index_survives_a_restart(index):
+    index.add(PUNISHMENT)
+    index.add(SLEEP)
+    reloaded = DuplicateIndex(index.index_file)
+    assert reloaded.find_duplicate(PUNISHMENT_REWORDED) == PUNISHMENT['title']
+    assert reloaded.avoid_digest() == [SLEEP['title'], PUNISHMENT['title']]
+
+
+def test_check_is_sub_millisecond(index):
+    for n in range(300):
+        index.add({'title': f'თემა {n}', 'main_text': 'ბავშვი ' * (n % 7) + 'ოჯახი მშობელი ' * (n % 11)})
+    start = time.perf_counter()
+    for _ in range(100):
+        index.find_duplicate(PUNISHMENT_REWORDED)
+    assert (time.perf_counter() - start) / 100 < 0.001
+
+
+def test_creator_replaces_repeats_and_lists_topics_to_avoid(creator, monkeypatch, fake_client):
+    monkeypatch.setattr(config, 'DUPLICATE_CHECK', True)
+    creator.duplicates.add(PUNISHMENT)
+    responses = [[PUNISHMENT_REWORDED], [SLEEP]]
+    prompts = []
+
+    async def create(**request):
+        prompts.append(request['messages'][0]['content'])
+        text = json.dumps({'variants': responses.pop(0)}, ensure_ascii=False)
+        return SimpleNamespace(content=[SimpleNamespace(text=text)], usage=None)
+
+    creator._async_client = fake_client(SimpleNamespace(create=create))
+    assert asyncio.run(creator.agenerate_content_ideas(count=1)) == [SLEEP]
+    assert len(prompts) == 2
+    assert PUNISHMENT['title'] in prompts[0]
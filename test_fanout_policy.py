@@ -0,0 +1,169 @@
+"""
+Tests for the adaptive fan-out policy and parallel generation
+"""
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import anthropic
+import httpx
+import pytest
+
+import config
+from fanout_policy import FanoutPolicy, split
+
+
+@pytest.fixture
+def policy(monkeypatch):
+    monkeypatch.setattr(config, 'FANOUT_MAX_REQUESTS', 6)
+    monkeypatch.setattr(config, 'FANOUT_ERROR_RATE', 0.3)
+    return FanoutPolicy(max_concurrency=5)
+
+
+def test_split_is_near_equal():
+    assert split(5, 2) == [3, 2]
+    assert split(3, 3) == [1, 1, 1]
+
+
+def test_output_bound_latency_fans_out_overhead_bound_does_not(policy):
+    for n, ms in [(1, 9000), (3, 25000), (1, 9500), (3, 24000)]:
+        policy.observe(n, ms)
+    assert policy.group_sizes(3) == [1, 1, 1]
+
+    cheap_outputs = FanoutPolicy(max_concurrency=5)
+    for n, ms in [(1, 8000), (3, 8500), (1, 8100), (3, 8400)]:
+        cheap_outputs.observe(n, ms)
+    assert cheap_outputs.group_sizes(3) == [3]
+
+
+def test_concurrency_limit_caps_the_split(policy):
+    policy.max_concurrency = 2
+    for n, ms in [(1, 9000), (4, 33000)]:
+        policy.observe(n, ms)
+    assert policy.group_sizes(4) == [2, 2]
+
+
+def test_rate_limits_force_a_single_request(policy):
+    policy.observe_headers({'anthropic-ratelimit-requests-remaining': '4',
+                            'anthropic-ratelimit-requests-limit': '50'})
+    assert policy.group_sizes(3) == [3]
+
+    policy.observe_headers({'anthropic-ratelimit-requests-remaining': '45'})
+    assert policy.group_sizes(3) == [1, 1, 1]
+
+    policy.observe_rate_limited({'retry-after': '30'})
+    assert policy.group_sizes(3) == [3]
+    assert policy.get_stats()['throttled']
+
+
+def test_frequent_failures_shrink_groups(policy):
+    for n, ms in [(1, 8000), (4, 8600)]:
+        policy.observe(n, ms)
+    assert policy.group_sizes(4) == [4]
+    for _ in range(3):
+        policy.observe(4, 0, ok=False)
+    assert policy.group_sizes(4) == [2, 2]
+    assert policy.get_stats()['requests_per_generation'] == {1: 1, 2: 1}
+
+
+def test_creator_yields_groups_as_they_finish(creator, monkeypatch, fake_client):
+    monkeypatch.setattr(config, 'FANOUT_MAX_REQUESTS', 3)
+    monkeypatch.setattr(config, 'ANTHROPIC_MAX_CONCURRENCY', 3)
+    creator.fanout.observe(1, 9000)
+    creator.fanout.observe(3, 25000)
+    delays = [0.2, 0.01, 0.1]
+
+    async def create(**request):
+        call = 3 - len(delays)
+        await asyncio.sleep(delays.pop(0))
+        variant = {'format': 'quick_tip', 'title': f'ვარიანტი {call}', 'main_text': 'ტექსტი',
+                   'caption': 'აღწერა', 'hashtags': ['#მშობლობა']}
+        text = json.dumps({'variants': [variant]}, ensure_ascii=False)
+        return SimpleNamespace(content=[SimpleNamespace(text=text)], usage=None)
+
+    creator._async_client = fake_client(SimpleNamespace(create=create))
+
+    async def collect():
+        return [variant['title'] async for variant in creator.afanout_content_ideas(count=3)]
+
+    assert asyncio.run(collect()) == ['ვარიანტი 1', 'ვარიანტი 2', 'ვარიანტი 0']
+    assert creator.fanout.get_stats()['requests_per_generation'] == {3: 1}
+
+
+def test_streamed_generation_reports_only_api_time_and_failures(creator, monkeypatch, fake_client):
+    monkeypatch.setattr(config, 'ANTHROPIC_MAX_CONCURRENCY', 1)
+    monkeypatch.setattr(config, 'STREAM_GENERATION', True)
+    monkeypatch.setattr(config, 'STRUCTURED_OUTPUT', False)
+    monkeypatch.setattr(config, 'FANOUT_MAX_REQUESTS', 1)
+    monkeypatch.setattr(config, 'GENERATION_RETRIES', 0)
+    monkeypatch.setattr(config, 'DUPLICATE_CHECK', True)
+    variant = {'format': 'quick_tip', 'title': 'ძილის რეჟიმი', 'main_text': 'ერთი და იგივე რჩევა ძილზე',
+               'caption': 'აღწერა', 'hashtags': ['#მშობლობა']}
+    payload = json.dumps({'variants': [variant, variant]}, ensure_ascii=False)
+
+    class Stream:
+        response = SimpleNamespace(headers={'anthropic-ratelimit-requests-remaining': '4'})
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        @property
+        def text_stream(self):
+            async def generate():
+                for i in range(0, len(payload), 20):
+                    yield payload[i:i + 20]
+            return generate()
+
+        async def get_final_message(self):
+            return SimpleNamespace(usage=None)
+
+    creator._async_client = fake_client(SimpleNamespace(stream=lambda **request: Stream()))
+
+    slot_taken = []
+
+    async def consume():
+        received = []
+        async for item in creator.afanout_content_ideas(count=2):
+            received.append(item)
+            await asyncio.sleep(0.2)  # A slow consumer (rendering, sending)
+            slot_taken.append(creator.semaphore.locked())
+        return received
+
+    assert len(asyncio.run(consume())) == 1
+    # Other requests aren't held up behind the consumer, and the stream's rate-limit headers count
+    assert slot_taken == [False]
+    assert creator.fanout.requests_remaining == 4
+    # The repeat is counted as such, not as a failed request, and the sample leaves out the consumer's time
+    assert creator.fanout.error_rate == 0.0
+    assert len(creator.fanout.samples) == 1 and creator.fanout.samples[0][1] < 100
+    stats = creator.metrics.get_stats()['stream']
+    assert (stats['invalid_variants'], stats['repeated_variants']) == (0, 1)
+
+
+def test_rate_limited_stream_stops_fanning_out(creator, monkeypatch, fake_client):
+    monkeypatch.setattr(config, 'GENERATION_RETRIES', 0)
+    request = httpx.Request('POST', 'https://api.anthropic.com/v1/messages')
+    rejected = httpx.Response(429, headers={'retry-after': '30'}, request=request)
+
+    class Stream:
+        async def __aenter__(self):
+            raise anthropic.RateLimitError('rate limited', response=rejected, body=None)
+
+        async def __aexit__(self, *exc):
+            return False
+
+    async def create(**request):
+        raise AssertionError('no retries configured')
+
+    creator._async_client = fake_client(SimpleNamespace(create=create, stream=lambda **request: Stream()))
+
+    async def collect():
+        return [variant async for variant in creator.astream_content_ideas(count=2)]
+
+    assert asyncio.run(collect()) == []
+    assert creator.fanout.retry_until > time.time() + 20
+    assert creator.fanout.error_rate > 0
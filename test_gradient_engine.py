@@ -0,0 +1,114 @@
+"""
+Tests for the vectorized gradient engine
+Compares against the original per-pixel implementations (kept here as reference)
+"""
+import time
+from PIL import Image, ImageChops, ImageDraw
+
+import gradient_engine
+from design_generator import DesignGenerator
+
+WIDTH, HEIGHT = 270, 480
+
+
+def legacy_vertical_gradient(width, height, color1, color2):
+    """Original line-per-row implementation"""
+    img = Image.new('RGB', (width, height))
+    draw = ImageDraw.Draw(img)
+    r1, g1, b1 = gradient_engine.parse_hex_color(color1)
+    r2, g2, b2 = gradient_engine.parse_hex_color(color2)
+    for y in range(height):
+        ratio = y / height
+        r = int(r1 + (r2 - r1) * ratio)
+        g = int(g1 + (g2 - g1) * ratio)
+        b = int(b1 + (b2 - b1) * ratio)
+        draw.line([(0, y), (width, y)], fill=(r, g, b))
+    return img
+
+
+def legacy_diagonal_gradient(width, height, color1, color2):
+    """Original point-per-pixel implementation"""
+    img = Image.new('RGB', (width, height))
+    draw = ImageDraw.Draw(img)
+    r1, g1, b1 = gradient_engine.parse_hex_color(color1)
+    r2, g2, b2 = gradient_engine.parse_hex_color(color2)
+    max_distance = (width ** 2 + height ** 2) ** 0.5
+    for y in range(height):
+        for x in range(width):
+            distance = (x ** 2 + y ** 2) ** 0.5
+            ratio = distance / max_distance
+            r = int(r1 + (r2 - r1) * ratio)
+            g = int(g1 + (g2 - g1) * ratio)
+            b = int(b1 + (b2 - b1) * ratio)
+            draw.point((x, y), fill=(r, g, b))
+    return img
+
+
+def max_channel_diff(img1, img2):
+    """Largest per-channel difference between two images"""
+    return max(high for _, high in ImageChops.difference(img1, img2).getextrema())
+
+
+def test_vertical_matches_legacy():
+    colors = ('#FFF9F0', '#FFE5D9')
+    new = gradient_engine.linear_gradient(WIDTH, HEIGHT, list(colors))
+    old = legacy_vertical_gradient(WIDTH, HEIGHT, *colors)
+    assert new.size == old.size
+    assert max_channel_diff(new, old) <= 1
+
+
+def test_diagonal_matches_legacy():
+    colors = ('#667EEA', '#764BA2')
+    new = gradient_engine.diagonal_gradient(WIDTH, HEIGHT, list(colors))
+    old = legacy_diagonal_gradient(WIDTH, HEIGHT, *colors)
+    assert new.size == old.size
+    assert max_channel_diff(new, old) <= 1
+
+
+def test_multi_stop_hits_every_color():
+    colors = ['#667EEA', '#764BA2', '#F093FB', '#4FACFE']
+    img = gradient_engine.linear_gradient(10, 400, colors)
+    assert img.getpixel((0, 0)) == gradient_engine.parse_hex_color(colors[0])
+    for idx, color in enumerate(colors[1:-1], 1):
+        y = idx * 400 // (len(colors) - 1)
+        assert max(abs(a - b) for a, b in zip(img.getpixel((5, y)), gradient_engine.parse_hex_color(color))) <= 2
+
+
+def test_radial_center_and_corner():
+    img = gradient_engine.radial_gradient(101, 101, ['#FFFFFF', '#000000'])
+    assert min(img.getpixel((50, 50))) >= 250
+    assert img.getpixel((0, 0)) == (0, 0, 0)
+
+
+def test_design_generator_uses_engine():
+    generator = DesignGenerator()
+    plan = generator._get_plan('gradient')
+    assert [op.kind for op in plan.background if op.type == 'gradient'] == ['diagonal']
+    img = generator._render_base_layer('gradient')
+    assert img.size == (generator.width, generator.height)
+
+
+def test_diagonal_before_after_timing():
+    colors = ('#667EEA', '#764BA2')
+
+    start = time.perf_counter()
+    legacy_diagonal_gradient(WIDTH, HEIGHT, *colors)
+    legacy_seconds = time.perf_counter() - start
+
+    gradient_engine._ratio_field.cache_clear()
+    start = time.perf_counter()
+    gradient_engine.diagonal_gradient(WIDTH, HEIGHT, list(colors))
+    new_seconds = time.perf_counter() - start
+
+    print(f"\ndiagonal {WIDTH}x{HEIGHT}: legacy {legacy_seconds * 1000:.1f} ms, "
+          f"engine {new_seconds * 1000:.1f} ms")
+    assert new_seconds * 10 < legacy_seconds
+
+
+def test_full_size_gradient_is_fast():
+    start = time.perf_counter()
+    gradient_engine.diagonal_gradient(1080, 1920, ['#667EEA', '#764BA2'])
+    gradient_engine.linear_gradient(1080, 1920, ['#FFF9F0', '#FFE5D9'])
+    elapsed = time.perf_counter() - start
+    print(f"\nfull-size diagonal + vertical: {elapsed * 1000:.1f} ms")
+    assert elapsed < 1.0
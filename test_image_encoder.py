@@ -0,0 +1,57 @@
+"""
+Tests for the per-style output encoder
+"""
+import asyncio
+import io
+from types import SimpleNamespace
+
+from PIL import Image, ImageChops
+
+import config
+from design_generator import DesignGenerator
+from image_encoder import ImageEncoder
+
+CONTENT = {'title': 'ტესტი', 'main_text': 'ეს არის ტესტური ტექსტი'}
+
+
+def test_formats_follow_style_config():
+    generator = DesignGenerator()
+    encoder = ImageEncoder()
+    for style in config.VISUAL_STYLE_DISTRIBUTION:
+        encoded = encoder.encode(generator.generate_image(CONTENT, style), style)
+        expected = 'PNG' if config.OUTPUT_FORMAT_BY_STYLE[style].startswith('png') else 'JPEG'
+        assert encoded.format == expected
+        assert Image.open(io.BytesIO(encoded.data)).format == expected
+        assert encoded.size <= config.OUTPUT_BYTE_BUDGET
+    assert set(encoder.get_stats()) == set(config.VISUAL_STYLE_DISTRIBUTION)
+
+
+def test_budget_falls_back_to_smaller_encoding():
+    noisy = Image.effect_noise((600, 600), 100).convert('RGB')
+    encoder = ImageEncoder()
+    unbounded = encoder.encode(noisy, 'minimalist', byte_budget=0)
+    budgeted = encoder.encode(noisy, 'minimalist', byte_budget=150 * 1024)
+    assert budgeted.size < unbounded.size
+    assert budgeted.format == 'JPEG'
+
+
+def test_lossless_archive_copy_is_exact():
+    img = DesignGenerator().generate_image(CONTENT, 'gradient')
+    archived = ImageEncoder().encode_lossless(img)
+    restored = Image.open(io.BytesIO(archived.data)).convert('RGB')
+    assert ImageChops.difference(restored, img).getbbox() is None
+
+
+def test_encode_stats_are_shown_in_stats(parenting_bot):
+    replies = []
+
+    async def reply_text(text):
+        replies.append(text)
+
+    async def run():
+        await parenting_bot.render_service.render(CONTENT, style='minimalist')
+        await parenting_bot.stats_command(SimpleNamespace(message=SimpleNamespace(reply_text=reply_text)), None)
+
+    asyncio.run(run())
+    stats = parenting_bot.render_service.encode_stats.get_stats()['minimalist']
+    assert f"minimalist: {stats['format']}, {stats['avg_kb']:.0f} KB" in replies[0]
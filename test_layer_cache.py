@@ -0,0 +1,47 @@
+"""
+Tests for the static layer cache
+"""
+from PIL import Image, ImageChops
+
+import config
+from design_generator import DesignGenerator
+from layer_cache import LayerCache
+
+CONTENT = {'title': 'ტესტი', 'main_text': 'ეს არის ტესტური ტექსტი'}
+
+
+def test_cached_render_matches_first_render():
+    generator = DesignGenerator()
+    for style in config.VISUAL_STYLE_DISTRIBUTION:
+        first = generator.generate_image(CONTENT, style)
+        second = generator.generate_image(CONTENT, style)
+        assert ImageChops.difference(first, second).getbbox() is None
+    stats = generator.layer_cache.get_stats()
+    assert stats['hits'] >= len(config.VISUAL_STYLE_DISTRIBUTION)
+
+
+def test_base_layer_is_not_mutated_by_renders():
+    generator = DesignGenerator()
+    generator.generate_image(CONTENT, 'minimalist')
+    base = generator._get_base_layer('minimalist')
+    assert base.getpixel((generator.width // 2, 300)) == (255, 255, 255)
+
+
+def test_memory_cap_evicts_least_recently_used():
+    layer = Image.new('RGB', (10, 10))
+    cache = LayerCache(max_bytes=2 * 300)
+    cache.get('a', lambda: layer)
+    cache.get('b', lambda: layer)
+    cache.get('a', lambda: layer)
+    cache.get('c', lambda: layer)
+    assert list(cache.entries) == ['a', 'c']
+    assert cache.current_bytes <= cache.max_bytes
+
+
+def test_config_change_invalidates(monkeypatch):
+    cache = LayerCache()
+    cache.get('a', lambda: Image.new('RGB', (10, 10)))
+    palettes = dict(config.COLOR_PALETTES, minimalist=['#000000', '#111111', '#222222'])
+    monkeypatch.setattr(config, 'COLOR_PALETTES', palettes)
+    cache.get('b', lambda: Image.new('RGB', (10, 10)))
+    assert list(cache.entries) == ['b']
@@ -0,0 +1,73 @@
+"""
+Tests for style templates compiled into layout plans
+"""
+import copy
+
+import config
+import layout_plan
+from design_generator import DesignGenerator
+
+CONTENT = {'title': 'ტესტი', 'main_text': 'ეს არის ტესტური ტექსტი'}
+
+
+def test_edges_scale_and_palette_are_resolved():
+    template = {
+        'background': [{'type': 'rounded_rect', 'box': [80, 250, -80, None], 'fill': 2, 'radius': 60}],
+        'text': [{'field': 'title', 'y': 300, 'inset': 200, 'line_height': 100, 'color': 1,
+                  'shadow': {'offset': 4, 'color': [0, 0, 0, 100]}}]
+    }
+    plan = layout_plan.compile_template('test', template, ['#000', '#111', '#222'], 540, 960, scale=0.5)
+
+    op = plan.background[0]
+    assert op.box == (40, 125, 500, 960)
+    assert op.fill == '#222'
+    assert op.radius == 30
+
+    block = plan.text[0]
+    assert (block.y, block.max_width, block.line_height) == (150, 440, 50)
+    assert block.fill == '#111'
+    assert block.shadow_fill == (0, 0, 0, 100)
+    assert block.x is None
+
+
+def test_compiled_plans_are_cached():
+    first = layout_plan.get_plan('minimalist', 1080, 1920)
+    assert layout_plan.get_plan('minimalist', 1080, 1920) is first
+    assert layout_plan.get_plan('minimalist', 540, 960, 0.5) is not first
+
+
+def test_new_style_can_be_added_in_config(monkeypatch):
+    templates = copy.deepcopy(config.STYLE_TEMPLATES)
+    templates['night'] = {
+        'background': [{'type': 'solid', 'color': '#101020'}],
+        'text': [{'field': 'title', 'font': 'title', 'y': 200, 'inset': 200,
+                  'line_height': 100, 'color': 'white'}]
+    }
+    monkeypatch.setattr(config, 'STYLE_TEMPLATES', templates)
+
+    img = DesignGenerator().generate_image(CONTENT, 'night')
+    assert img.mode == 'RGB'
+    assert img.getpixel((10, 10)) == (16, 16, 32)
+
+
+def test_translucent_layers_stay_on_an_rgb_canvas():
+    generator = DesignGenerator(scale=0.25)
+    assert generator._get_plan('gradient').translucent
+    assert not generator._get_plan('minimalist').translucent
+    assert generator._get_base_layer('gradient').mode == 'RGB'
+
+
+def test_overlay_is_composited_only_inside_its_box(monkeypatch):
+    templates = copy.deepcopy(config.STYLE_TEMPLATES)
+    templates['boxed'] = {
+        'background': [
+            {'type': 'solid', 'color': '#000000'},
+            {'type': 'overlay', 'box': [0, 0, 400, 400], 'color': [255, 255, 255, 128]}
+        ],
+        'text': []
+    }
+    monkeypatch.setattr(config, 'STYLE_TEMPLATES', templates)
+
+    base = DesignGenerator()._get_base_layer('boxed')
+    assert base.getpixel((100, 100)) == (128, 128, 128)
+    assert base.getpixel((500, 500)) == (0, 0, 0)
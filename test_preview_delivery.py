@@ -0,0 +1,135 @@
+"""
+Tests for low-resolution previews and the full-resolution swap on approval
+"""
+import asyncio
+import io
+from types import SimpleNamespace
+
+from PIL import Image
+
+import config
+
+VARIANT = {'format': 'quick_tip', 'title': 'სათაური', 'main_text': 'ტექსტი', 'caption': 'c'}
+
+
+class FakeBot:
+    def __init__(self):
+        self.photos = []
+        self.edits = []
+
+    async def send_photo(self, chat_id, photo, caption=None, reply_markup=None, parse_mode=None):
+        self.photos.append((photo, reply_markup))
+        return SimpleNamespace(message_id=len(self.photos))
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        pass
+
+    async def edit_message_media(self, chat_id, message_id, media, reply_markup=None):
+        self.edits.append((message_id, media, reply_markup))
+
+
+class FakeQuery:
+    def __init__(self):
+        self.markups = []
+        self.replies = []
+        self.message = SimpleNamespace(reply_text=self._reply_text)
+
+    async def _reply_text(self, text):
+        self.replies.append(text)
+
+    async def edit_message_reply_markup(self, reply_markup=None):
+        self.markups.append(reply_markup)
+
+
+def image_size(data):
+    return Image.open(io.BytesIO(data)).size
+
+
+def test_preview_is_sent_small_with_download_button(parenting_bot):
+    fake_bot = FakeBot()
+    parenting_bot.current_variants[1] = {}
+
+    asyncio.run(parenting_bot._send_variants_individually(
+        1, SimpleNamespace(bot=fake_bot), [VARIANT], 'session', scale=0.5
+    ))
+
+    photo, keyboard = fake_bot.photos[0]
+    assert image_size(photo) == (config.IMAGE_WIDTH // 2, config.IMAGE_HEIGHT // 2)
+    buttons = [button.callback_data for row in keyboard.inline_keyboard for button in row]
+    assert 'full_1' in buttons
+    assert parenting_bot.current_variants[1][1]['preview'] is True
+
+
+def test_approval_swaps_in_full_resolution(parenting_bot):
+    fake_bot = FakeBot()
+    context = SimpleNamespace(bot=fake_bot)
+    parenting_bot.current_variants[1] = {}
+    asyncio.run(parenting_bot._send_variants_individually(1, context, [VARIANT], 'session', scale=0.5))
+
+    query = FakeQuery()
+    asyncio.run(parenting_bot._handle_rating(query, 'rate_1_love', 1, context))
+
+    message_id, media, keyboard = fake_bot.edits[0]
+    assert message_id == 1
+    assert image_size(media.media.input_file_content) == (config.IMAGE_WIDTH, config.IMAGE_HEIGHT)
+    assert keyboard is None
+    assert parenting_bot.current_variants[1][1]['preview'] is False
+
+
+def test_dislike_keeps_preview(parenting_bot):
+    fake_bot = FakeBot()
+    context = SimpleNamespace(bot=fake_bot)
+    parenting_bot.current_variants[1] = {}
+    asyncio.run(parenting_bot._send_variants_individually(1, context, [VARIANT], 'session', scale=0.5))
+
+    asyncio.run(parenting_bot._handle_rating(FakeQuery(), 'rate_1_dislike', 1, context))
+
+    assert fake_bot.edits == []
+    assert parenting_bot.current_variants[1][1]['preview'] is True
+
+
+def test_love_after_style_change_keeps_the_new_style(parenting_bot):
+    fake_bot = FakeBot()
+    context = SimpleNamespace(bot=fake_bot)
+    parenting_bot.current_variants[1] = {}
+    asyncio.run(parenting_bot._send_variants_individually(1, context, [VARIANT], 'session', scale=0.5))
+    old_style = parenting_bot.current_variants[1][1]['style']
+
+    query = FakeQuery()
+    asyncio.run(parenting_bot._handle_style_change(query, 'style_1', 1, context))
+    stored = parenting_bot.current_variants[1][1]
+    assert stored['style'] != old_style
+    assert stored['spec']['style'] == stored['style']
+    assert (stored['preview'], stored['message_id']) == (False, 2)
+
+    # The restyled message is already full resolution: ❤️ must not swap the old style back in
+    asyncio.run(parenting_bot._handle_rating(query, 'rate_1_love', 1, context))
+    assert fake_bot.edits == []
+    assert image_size(fake_bot.photos[-1][0]) == (config.IMAGE_WIDTH, config.IMAGE_HEIGHT)
+
+
+def test_edit_reports_a_full_render_queue(parenting_bot, monkeypatch):
+    from render_service import RenderQueueFull
+
+    fake_bot = FakeBot()
+    context = SimpleNamespace(bot=fake_bot)
+    parenting_bot.current_variants[1] = {}
+    asyncio.run(parenting_bot._send_variants_individually(1, context, [VARIANT], 'session', scale=0.5))
+
+    async def regenerate(original, feedback):
+        return dict(original, title='ახალი სათაური')
+
+    async def render(*args, **kwargs):
+        raise RenderQueueFull()
+
+    monkeypatch.setattr(parenting_bot.content_creator, 'aregenerate_with_feedback', regenerate)
+    monkeypatch.setattr(parenting_bot.content_creator, 'add_custom_edit', lambda feedback: None)
+    monkeypatch.setattr(parenting_bot.render_service, 'render', render)
+    query = FakeQuery()
+    update = SimpleNamespace(message=SimpleNamespace(text='edit1 უფრო მოკლედ', reply_text=query._reply_text),
+                             effective_chat=SimpleNamespace(id=1))
+
+    asyncio.run(parenting_bot.handle_text_message(update, context))
+
+    assert query.replies[-1].startswith('⏳ ბევრი სურათი მუშავდება')
+    assert len(fake_bot.photos) == 1
@@ -0,0 +1,120 @@
+"""
+Tests for the content-addressed render cache
+"""
+import asyncio
+import os
+import threading
+
+import config
+import render_cache
+from render_cache import RenderCache, render_key
+from render_service import RenderResult, RenderService
+
+CONTENT = {'title': 'ტესტი', 'main_text': 'ეს არის ტესტური ტექსტი', 'caption': 'a'}
+
+
+def make_result(size, style='minimalist'):
+    return RenderResult(b'x' * size, style, 'png', 'PNG', 1.0, None)
+
+
+def test_key_ignores_non_rendered_fields_and_tracks_style(monkeypatch):
+    key = render_key(CONTENT, 'minimalist')
+    assert render_key(dict(CONTENT, caption='other caption'), 'minimalist') == key
+    assert render_key(CONTENT, 'gradient') != key
+    assert render_key(dict(CONTENT, title='სხვა'), 'minimalist') != key
+    monkeypatch.setattr(config, 'COLOR_PALETTES', dict(config.COLOR_PALETTES, minimalist=['#000000'] * 3))
+    assert render_key(CONTENT, 'minimalist') != key
+
+
+def test_lru_spills_to_disk_and_promotes_back(tmp_path):
+    cache = RenderCache(max_bytes=250, disk_dir=str(tmp_path), disk_max_bytes=10_000)
+    cache.put('a', make_result(100))
+    cache.put('b', make_result(100))
+    cache.put('c', make_result(100))
+    assert list(cache.entries) == ['b', 'c']
+    assert (tmp_path / 'a.bin').exists()
+
+    assert cache.get('a').data == b'x' * 100
+    assert cache.disk_hits == 1
+    assert 'a' in cache.entries
+
+
+def test_disk_tier_respects_quota(tmp_path):
+    cache = RenderCache(max_bytes=100, disk_dir=str(tmp_path), disk_max_bytes=700)
+    for key in 'abcdefgh':
+        cache.put(key, make_result(100))
+    spilled = sum(f.stat().st_size for f in tmp_path.glob('*.bin'))
+    assert 0 < spilled <= 700
+    assert cache.disk_bytes == spilled
+
+
+def test_spills_keep_a_running_total_instead_of_listing(tmp_path, monkeypatch):
+    cache = RenderCache(max_bytes=100, disk_dir=str(tmp_path), disk_max_bytes=100_000)
+    listings = []
+    real_listdir = os.listdir
+    monkeypatch.setattr(render_cache.os, 'listdir', lambda path: listings.append(path) or real_listdir(path))
+    for key in 'abcdefgh':
+        cache.put(key, make_result(100))
+    assert len(listings) == 1  # Counted once, under quota afterwards
+
+
+def test_unreadable_or_old_entries_are_misses(tmp_path, monkeypatch):
+    cache = RenderCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=10_000)
+    (tmp_path / 'broken.bin').write_bytes(b'not a cache entry')
+    assert cache.get('broken') is None
+    assert not (tmp_path / 'broken.bin').exists()
+
+    # An entry spilled before the result schema changed lives under a different key
+    key = render_key(CONTENT, 'minimalist')
+    monkeypatch.setattr(render_cache, 'RESULT_SCHEMA', render_cache.RESULT_SCHEMA - 1)
+    old_key = render_key(CONTENT, 'minimalist')
+    cache.put(old_key, make_result(10))
+    assert old_key != key
+    monkeypatch.undo()
+    assert cache.get(key) is None
+
+
+def test_spilled_entries_round_trip_without_pickle(tmp_path):
+    cache = RenderCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=10_000)
+    result = RenderResult(b'image', 'gradient', 'webp', 'WEBP', 12.5, b'lossless', {'style': 'gradient', 'seed': 7})
+    cache.put('k', result)
+    raw = (tmp_path / 'k.bin').read_bytes()
+    assert raw.endswith(b'\nimagelossless') and raw.startswith(b'{')
+    assert cache.get('k') == result
+
+    cache.put('n', make_result(5))
+    assert cache.get('n').archive_data is None
+    (tmp_path / 'n.bin').write_bytes((tmp_path / 'n.bin').read_bytes()[:-1])
+    assert cache.get('n') is None  # Truncated
+
+
+def test_event_loop_reaches_the_disk_tier_in_a_thread(tmp_path, monkeypatch):
+    cache = RenderCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=10_000)
+    threads = []
+    for name in ('_read_disk', '_write_disk'):
+        method = getattr(cache, name)
+        monkeypatch.setattr(cache, name, lambda *args, method=method: threads.append(threading.current_thread())
+                            or method(*args))
+
+    async def run():
+        await cache.aput('a', make_result(10))
+        return await cache.aget('a')
+
+    assert asyncio.run(run()).data == b'x' * 10
+    assert len(threads) == 2 and threading.main_thread() not in threads
+
+
+def test_repeat_render_is_served_from_cache(tmp_path):
+    service = RenderService(workers=0, cache=RenderCache(disk_dir=str(tmp_path)))
+
+    async def run():
+        first = await service.render(CONTENT, style='story_card')
+        second = await service.render(dict(CONTENT, caption='new caption'), style='story_card')
+        return first, second
+
+    try:
+        first, second = asyncio.run(run())
+    finally:
+        service.shutdown()
+    assert second is first
+    assert service.cache.hits == 1
@@ -0,0 +1,54 @@
+"""
+Tests for the render worker pool
+"""
+import asyncio
+import io
+
+import pytest
+from PIL import Image
+
+import config
+from render_service import RenderService, RenderQueueFull
+
+CONTENT = {'title': 'ტესტი', 'main_text': 'ეს არის ტესტური ტექსტი'}
+
+
+def test_thread_mode_returns_encoded_bytes():
+    service = RenderService(workers=0)
+    try:
+        result = asyncio.run(service.render(CONTENT, style='minimalist'))
+    finally:
+        service.shutdown()
+    assert result.style == 'minimalist'
+    assert Image.open(io.BytesIO(result.data)).size == (config.IMAGE_WIDTH, config.IMAGE_HEIGHT)
+
+
+def test_process_pool_renders_in_parallel():
+    service = RenderService(workers=2)
+
+    async def run():
+        await service.warm_up()
+        return await service.render_many([(CONTENT, style) for style in config.VISUAL_STYLE_DISTRIBUTION])
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        service.shutdown()
+    assert [r.style for r in results] == list(config.VISUAL_STYLE_DISTRIBUTION)
+    assert all(r.data for r in results)
+
+
+def test_queue_limit_rejects_extra_renders():
+    service = RenderService(workers=0, queue_limit=1)
+
+    async def run():
+        first = asyncio.ensure_future(service.render(CONTENT, style='minimalist'))
+        await asyncio.sleep(0)
+        with pytest.raises(RenderQueueFull):
+            await service.render(CONTENT, style='minimalist')
+        await first
+
+    try:
+        asyncio.run(run())
+    finally:
+        service.shutdown()
@@ -0,0 +1,57 @@
+"""
+Tests for render specs and lazy re-rendering
+"""
+import asyncio
+
+from design_generator import DesignGenerator
+from render_cache import RenderCache
+from render_service import RenderService
+from render_spec import decode_spec, encode_spec, make_spec
+
+CONTENT = {'format': 'quick_tip', 'title': 'ტესტი', 'main_text': 'ეს არის ტესტური ტექსტი', 'caption': 'c'}
+
+
+def test_spec_round_trip_keeps_only_rendered_fields():
+    spec = make_spec(CONTENT, 'gradient', scale=0.5, seed=7)
+    assert decode_spec(encode_spec(spec)) == spec
+    assert 'caption' not in spec['content']
+    assert len(encode_spec(spec)) < 1024
+
+
+def test_seed_makes_style_choice_reproducible():
+    styles = {DesignGenerator.pick_style(1234) for _ in range(5)}
+    assert len(styles) == 1
+
+
+def test_spec_rerenders_identical_bytes(tmp_path):
+    async def run():
+        first_service = RenderService(workers=0, cache=RenderCache(disk_dir=str(tmp_path / 'a')))
+        original = await first_service.render(CONTENT, seed=42)
+        first_service.shutdown()
+
+        # A fresh service has nothing cached, the spec alone rebuilds the image
+        service = RenderService(workers=0, cache=RenderCache(disk_dir=str(tmp_path / 'b')))
+        spec = decode_spec(encode_spec(original.spec))
+        restored = await service.render_spec(spec)
+        again = await service.render_spec(spec)
+        service.shutdown()
+        return original, restored, again, service.cache.get_stats()
+
+    original, restored, again, stats = asyncio.run(run())
+    assert restored.style == original.style
+    assert restored.data == original.data
+    assert again is restored
+    assert stats['hits'] == 1
+
+
+def test_spec_keeps_a_seed_only_when_it_picked_the_style(tmp_path):
+    async def run():
+        service = RenderService(workers=0, cache=RenderCache(disk_dir=str(tmp_path)))
+        given = await service.render(CONTENT, style='minimalist', seed=42)
+        picked = await service.render(CONTENT, seed=42)
+        service.shutdown()
+        return given, picked
+
+    given, picked = asyncio.run(run())
+    assert (given.spec['style'], given.spec['seed']) == ('minimalist', None)
+    assert (picked.spec['style'], picked.spec['seed']) == (DesignGenerator.pick_style(42), 42)
@@ -0,0 +1,150 @@
+"""
+Tests for date-sharded storage, archive bundles, retention and quota
+"""
+import os
+from datetime import datetime
+
+import storage_manager
+from storage_manager import StorageManager
+
+NOW = datetime(2026, 10, 16, 12, 0)
+
+
+def write(storage, filename, data=b'image-bytes'):
+    path = storage.path_for(filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def test_files_are_sharded_by_session_date(tmp_path):
+    storage = StorageManager(str(tmp_path))
+    path = storage.path_for('20261001_130000_variant_1.jpg')
+    assert path == os.path.join(str(tmp_path), '2026', '10', '01', '20261001_130000_variant_1.jpg')
+
+
+def test_cold_days_are_bundled_and_still_readable(tmp_path):
+    storage = StorageManager(str(tmp_path), retention_days=0, max_bytes=0, archive_after_days=7)
+    old = write(storage, '20261001_130000_variant_1.jpg', b'old')
+    recent = write(storage, '20261015_130000_variant_1.jpg', b'recent')
+
+    result = storage.compact(NOW)
+
+    assert result['archived'] == 1
+    assert not os.path.exists(old)
+    assert not os.path.exists(os.path.dirname(old))
+    assert os.path.exists(recent)
+    assert storage.read('20261001_130000_variant_1.jpg') == b'old'
+    assert storage.read('20261015_130000_variant_1.jpg') == b'recent'
+    assert storage.get_stats()['bundles'] == 1
+
+
+def test_rebundling_a_day_keeps_earlier_files(tmp_path):
+    storage = StorageManager(str(tmp_path), retention_days=0, max_bytes=0, archive_after_days=7)
+    write(storage, '20261001_130000_variant_1.jpg', b'first')
+    storage.compact(NOW)
+    write(storage, '20261001_130000_regen_1.jpg', b'second')
+    storage.compact(NOW)
+
+    assert storage.read('20261001_130000_variant_1.jpg') == b'first'
+    assert storage.read('20261001_130000_regen_1.jpg') == b'second'
+
+
+def test_retention_drops_expired_data(tmp_path):
+    storage = StorageManager(str(tmp_path), retention_days=30, max_bytes=0, archive_after_days=7)
+    write(storage, '20260801_130000_variant_1.jpg')
+    write(storage, '20261001_130000_variant_1.jpg')
+
+    storage.compact(NOW)
+
+    assert storage.read('20260801_130000_variant_1.jpg') is None
+    assert storage.read('20261001_130000_variant_1.jpg') == b'image-bytes'
+
+
+def test_quota_evicts_least_recently_used(tmp_path):
+    storage = StorageManager(str(tmp_path), retention_days=0, max_bytes=250, archive_after_days=30)
+    paths = [write(storage, f'20261016_10000{i}_variant_{i}.jpg', b'x' * 100) for i in range(3)]
+    for i, path in enumerate(paths):
+        os.utime(path, (1000 + i, 1000 + i))
+    os.utime(paths[0], (2000, 2000))  # Recently read
+
+    assert storage.compact(NOW)['evicted'] == 1
+    assert [os.path.exists(p) for p in paths] == [True, False, True]
+
+
+def test_find_lists_loose_and_archived_files(tmp_path):
+    storage = StorageManager(str(tmp_path), retention_days=0, max_bytes=0, archive_after_days=7)
+    write(storage, '20261001_130000_variant_1.json')
+    storage.compact(NOW)
+    write(storage, '20261001_130000_variant_2.json')
+    write(storage, '20261001_140000_variant_1.json')
+
+    assert storage.find('20261001_130000') == ['20261001_130000_variant_1.json',
+                                               '20261001_130000_variant_2.json']
+
+
+def test_quota_and_stats_skip_in_flight_and_vanished_files(tmp_path, monkeypatch):
+    storage = StorageManager(str(tmp_path), retention_days=0, max_bytes=150, archive_after_days=30)
+    kept = write(storage, '20261016_100000_variant_1.jpg', b'x' * 100)
+    vanished = write(storage, '20261016_100001_variant_2.jpg', b'x' * 100)
+    in_flight = write(storage, '20261016_100002_variant_3.jpg.tmp', b'x' * 100)
+    os.utime(in_flight, (1000, 1000))
+
+    real_stat = os.stat
+
+    def stat(path, *args, **kwargs):
+        # Removed by another thread after the shard was listed
+        if path == vanished:
+            raise FileNotFoundError(path)
+        return real_stat(path, *args, **kwargs)
+
+    monkeypatch.setattr(storage_manager.os, 'stat', stat)
+    assert storage.get_stats()['files'] == 1
+    assert storage.compact(NOW)['evicted'] == 0
+    assert os.path.exists(kept) and os.path.exists(in_flight)
+
+
+def test_short_prefix_searches_the_matching_days(tmp_path):
+    storage = StorageManager(str(tmp_path), retention_days=0, max_bytes=0, archive_after_days=30)
+    write(storage, '20261001_130000_variant_1.json')
+    write(storage, '20261002_090000_variant_1.json')
+
+    assert storage.find('20261001') == ['20261001_130000_variant_1.json']
+    assert storage.find('202610') == ['20261001_130000_variant_1.json', '20261002_090000_variant_1.json']
+
+
+def test_bundles_are_built_without_holding_the_write_lock(tmp_path, monkeypatch):
+    storage = StorageManager(str(tmp_path), retention_days=0, max_bytes=0, archive_after_days=7)
+    write(storage, '20261001_130000_variant_1.jpg')
+    locked_while_building = []
+    bundle_members = storage._bundle_members
+
+    def members(bundle_path):
+        locked_while_building.append(storage.lock.locked())
+        return bundle_members(bundle_path)
+
+    monkeypatch.setattr(storage, '_bundle_members', members)
+    assert storage.compact(NOW)['archived'] == 1
+    assert locked_while_building == [False]
+    assert storage.read('20261001_130000_variant_1.jpg') == b'image-bytes'
+
+
+def test_generator_saves_through_the_given_storage(tmp_path):
+    import threading
+    from design_generator import DesignGenerator
+
+    storage = StorageManager(str(tmp_path))
+    generator = DesignGenerator(storage=storage)
+    saved = []
+    with storage.lock:  # Compaction in progress: the save has to wait for it
+        thread = threading.Thread(target=lambda: saved.append(
+            generator.save_encoded(b'image-bytes', '20261001_130000_variant_1.jpg')))
+        thread.start()
+        thread.join(0.2)
+        assert saved == []
+    thread.join()
+
+    assert saved == [storage.path_for('20261001_130000_variant_1.jpg')]
+    assert storage.read('20261001_130000_variant_1.jpg') == b'image-bytes'
+    assert storage.find('20261001') == ['20261001_130000_variant_1.jpg']
@@ -0,0 +1,87 @@
+"""
+Tests for the incremental variants parser and streamed generation
+"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import config
+from stream_parser import VariantStreamParser
+
+VARIANTS = [
+    {'format': 'quick_tip', 'title': 'სათაური {1}', 'main_text': 'ციტატა: "ტექსტი" [ფრჩხილები]\nახალი ხაზი',
+     'caption': 'აღწერა', 'hashtags': ['#a'], 'visual_notes': ''},
+    {'format': 'mini_story', 'title': 'მეორე', 'main_text': 'უკუდახრილი \\ ხაზი', 'caption': 'აღწერა',
+     'hashtags': ['a', 'b'], 'visual_notes': 'თბილი ფერები, რბილი ფორმები და ბევრი თავისუფალი სივრცე'}
+]
+RESPONSE = '```json\n' + json.dumps({'variants': VARIANTS}, ensure_ascii=False, indent=2) + '\n```'
+
+
+def test_items_are_emitted_as_soon_as_they_close():
+    parser = VariantStreamParser()
+    emitted = []
+    for position, char in enumerate(RESPONSE):
+        for item in parser.feed(char):
+            emitted.append((position, item))
+
+    assert [item for _, item in emitted] == VARIANTS
+    # The first variant is available long before the response ends
+    assert emitted[0][0] < len(RESPONSE) // 2
+    assert parser.done
+
+
+def test_malformed_item_is_skipped():
+    parser = VariantStreamParser()
+    items = parser.feed('{"variants": [{"title": 01}, {"title": "ok"}]}')
+    assert items == [{'title': 'ok'}]
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.response = SimpleNamespace(headers={})
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        async def generate():
+            for chunk in self.chunks:
+                await asyncio.sleep(0)
+                yield SimpleNamespace(type='input_json', partial_json=chunk)
+        return generate()
+
+    @property
+    def text_stream(self):
+        async def generate():
+            for chunk in self.chunks:
+                await asyncio.sleep(0)
+                yield chunk
+        return generate()
+
+    async def get_final_message(self):
+        return SimpleNamespace(usage=SimpleNamespace(input_tokens=40, output_tokens=300,
+                                                     cache_creation_input_tokens=0,
+                                                     cache_read_input_tokens=1200))
+
+
+@pytest.mark.parametrize('structured', [True, False])
+def test_creator_streams_variants(creator, monkeypatch, structured, fake_client):
+    monkeypatch.setattr(config, 'STRUCTURED_OUTPUT', structured)
+    # Tool input deltas carry bare JSON, the text path may wrap it in a code block
+    response = json.dumps({'variants': VARIANTS}, ensure_ascii=False) if structured else RESPONSE
+    chunks = [response[i:i + 7] for i in range(0, len(response), 7)]
+    creator._async_client = fake_client(SimpleNamespace(stream=lambda **request: FakeStream(chunks)))
+
+    async def collect():
+        return [variant async for variant in creator.astream_content_ideas(count=2)]
+
+    assert asyncio.run(collect()) == VARIANTS
+    stats = creator.metrics.get_stats()['stream']
+    assert stats['calls'] == 1
+    assert stats['cache_read_tokens'] == 1200
@@ -0,0 +1,82 @@
+"""
+Tests for the memoized text layout engine
+"""
+import time
+
+from design_generator import DesignGenerator
+from text_layout import TextLayout
+
+CAPTION = ('როცა ბავშვი ტირის, ის არ გამოგცდის - ის გეუბნება, რომ რაღაც სჭირდება. '
+           'მოუსმინე, დაარქვი გრძნობას სახელი და აჩვენე, რომ მის გვერდით ხარ. '
+           'მშვიდი ხმა და ჩახუტება ბავშვს ამშვიდებს.')
+
+
+def legacy_wrap(text, font, max_width):
+    """Original bbox-per-candidate-line wrapping"""
+    lines = []
+    current_line = []
+    for word in text.split():
+        test_line = ' '.join(current_line + [word])
+        bbox = font.getbbox(test_line)
+        if bbox[2] - bbox[0] <= max_width:
+            current_line.append(word)
+        else:
+            if current_line:
+                lines.append(' '.join(current_line))
+            current_line = [word]
+    if current_line:
+        lines.append(' '.join(current_line))
+    return lines
+
+
+def test_wrap_matches_legacy():
+    generator = DesignGenerator()
+    font = generator.fonts['main']
+    for max_width in (400, 780, 880):
+        wrapped = [line for line, _ in generator.text_layout.wrap(CAPTION, font, max_width)]
+        assert wrapped == legacy_wrap(CAPTION, font, max_width)
+
+
+def test_layout_centers_lines():
+    generator = DesignGenerator()
+    boxes = generator.text_layout.layout(CAPTION, generator.fonts['main'], 880, 100, 80,
+                                         center_width=generator.width)
+    assert [box.y for box in boxes] == [100 + 80 * i for i in range(len(boxes))]
+    for box in boxes:
+        assert box.width <= 880
+        assert abs((box.x + box.width / 2) - generator.width / 2) <= 1
+
+
+def test_long_word_gets_its_own_line():
+    generator = DesignGenerator()
+    layout = TextLayout()
+    lines = layout.wrap('ა ' + 'ბ' * 60 + ' გ', generator.fonts['main'], 200)
+    assert [line for line, _ in lines] == ['ა', 'ბ' * 60, 'გ']
+
+
+def test_georgian_caption_lays_out_under_a_millisecond():
+    generator = DesignGenerator()
+    font = generator.fonts['main']
+    generator.text_layout.layout(CAPTION[:200], font, 880, 0, 80, center_width=1080)
+
+    # Fresh paragraph cache, warm advance cache: the steady state for new captions
+    generator.text_layout.layouts.clear()
+    start = time.perf_counter()
+    generator.text_layout.layout(CAPTION[:200], font, 880, 0, 80, center_width=1080)
+    elapsed = time.perf_counter() - start
+    print(f"\n200-char Georgian layout: {elapsed * 1e6:.0f} µs")
+    assert elapsed < 0.001
+
+
+def test_advance_cache_is_bounded():
+    generator = DesignGenerator()
+    layout = TextLayout(max_fonts=3, max_words=5)
+    path = generator.font_paths['main']
+    for size in range(20, 80, 2):
+        layout.fit(CAPTION, lambda s: generator.font_cache.get(path, s), size, 20, 880, 600, 80)
+    assert len(layout.advances) <= 3
+    assert all(len(widths) <= 5 for widths in layout.advances.values())
+
+    # Eviction never changes the result
+    wrapped = layout.wrap(CAPTION, generator.fonts['main'], 780)
+    assert [line for line, _ in wrapped] == legacy_wrap(CAPTION, generator.fonts['main'], 780)
@@ -0,0 +1,154 @@
+"""
+Tests for the pre-generated variant pool (with a fake API client and an in-thread renderer)
+"""
+import asyncio
+import itertools
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import config
+
+
+class FakeMessages:
+    """Returns as many distinct variants as the prompt asks for"""
+
+    def __init__(self):
+        self.calls = 0
+        self.counter = itertools.count(1)
+
+    async def create(self, **request):
+        self.calls += 1
+        count = request['messages'][0]['content'].count('ვარიანტი ')
+        variants = [{'format': 'quick_tip', 'title': f'სათაური {n}', 'main_text': f'ტექსტი {n}',
+                     'caption': 'აღწერა', 'hashtags': ['#მშობლობა']}
+                    for n in itertools.islice(self.counter, count)]
+        text = json.dumps({'variants': variants}, ensure_ascii=False)
+        return SimpleNamespace(content=[SimpleNamespace(text=text)], usage=None)
+
+
+@pytest.fixture
+def pool(creator, render_service, monkeypatch, fake_client):
+    monkeypatch.setattr(config, 'PREVIEW_MODE', True)
+    monkeypatch.setattr(config, 'PREVIEW_SCALE', 0.25)
+    monkeypatch.setattr(config, 'VARIANT_POOL_REFILL_BATCH', 3)
+    from variant_pool import VariantPool
+    creator._async_client = fake_client(FakeMessages())
+    return VariantPool(creator, render_service, size=3, ttl=3600)
+
+
+def test_refilled_variants_are_served_prerendered(pool):
+    assert pool.take(1) == []
+    assert asyncio.run(pool.refill()) == 3
+    assert pool.creator.async_client.fake.calls == 1
+
+    taken = pool.take(2)
+    assert len(taken) == 2 and len(pool.entries) == 1
+    preview = pool.prerendered(taken[0], 0.25)
+    full = pool.prerendered(taken[0], 1.0)
+    assert preview is not None and full is not None
+    assert preview.style == full.style
+    assert pool.prerendered(dict(taken[0]), 0.25) is preview  # Looked up by pool_id, not object identity
+    rewrite = {field: value for field, value in taken[0].items() if field != 'pool_id'}
+    assert pool.prerendered(rewrite, 0.25) is None
+    assert pool.prerendered(pool.entries[0]['content'], 0.25) is None  # Not handed out yet
+
+    stats = pool.get_stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (1, 1, 1)
+    assert stats['hit_rate'] == 0.5
+
+
+def test_expired_and_outdated_entries_are_dropped(pool):
+    asyncio.run(pool.refill())
+    pool.entries[0]['created'] -= 7200
+    pool.prune()
+    assert len(pool.entries) == 2 and pool.expired == 1
+
+    # A single rating keeps the pool, a new style note or a larger shift doesn't
+    pool.creator.preferences['liked_formats']['quick_tip'] = 1
+    pool.prune()
+    assert len(pool.entries) == 2
+    pool.creator.preferences['liked_formats']['quick_tip'] = 3
+    pool.prune()
+    assert pool.entries == [] and pool.invalidated == 2
+
+    asyncio.run(pool.refill())
+    pool.creator.preferences['custom_edits'] = ['უფრო მოკლედ']
+    pool.prune()
+    assert pool.entries == [] and pool.invalidated == 5
+
+
+def test_producer_refills_only_when_idle(pool, monkeypatch):
+    monkeypatch.setattr(config, 'VARIANT_POOL_IDLE_SECONDS', 0.01)
+    busy = [True]
+    pool.is_busy = lambda: busy[0]
+
+    async def run():
+        pool.start()
+        await asyncio.sleep(0.05)
+        filled_while_busy = len(pool.entries)
+        busy[0] = False
+        for _ in range(200):
+            await asyncio.sleep(0.01)
+            if len(pool.entries) == pool.size:
+                break
+        pool.stop()
+        return filled_while_busy
+
+    assert asyncio.run(run()) == 0
+    assert len(pool.entries) == 3
+
+
+def test_refill_keeps_each_variant_with_its_spec(pool, monkeypatch, fake_client):
+    monkeypatch.setattr(config, 'GENERATION_RETRIES', 0)
+    specs = [{'format': fmt, 'tone': 'friendly', 'age_group': 'school'}
+             for fmt in ('myth_vs_reality', 'self_assessment', 'quick_tip')]
+    monkeypatch.setattr(pool.creator, 'pick_variants', lambda count: [dict(spec) for spec in specs[:count]])
+
+    async def create(**request):
+        variants = [{'format': spec['format'], 'title': spec['format'], 'main_text': 'ტექსტი',
+                     'caption': 'აღწერა', 'hashtags': []} for spec in specs]
+        del variants[1]['caption']  # The middle variant fails validation
+        text = json.dumps({'variants': variants}, ensure_ascii=False)
+        return SimpleNamespace(content=[SimpleNamespace(text=text)], usage=None)
+
+    pool.creator._async_client = fake_client(SimpleNamespace(create=create))
+    assert asyncio.run(pool.refill()) == 2
+    assert [(e['spec']['format'], e['content']['format']) for e in pool.entries] == [
+        ('myth_vs_reality', 'myth_vs_reality'), ('quick_tip', 'quick_tip')
+    ]
+    assert pool.get_stats()['by_format'] == {'myth_vs_reality': 1, 'quick_tip': 1}
+
+
+def test_pool_variants_are_indexed_when_handed_out(pool, monkeypatch):
+    monkeypatch.setattr(config, 'DUPLICATE_CHECK', True)
+    duplicates = pool.creator.duplicates
+    asyncio.run(pool.refill())
+    assert duplicates.get_stats()['indexed'] == 0
+    assert duplicates.avoid_digest() == []
+
+    taken = pool.take(1)
+    assert duplicates.get_stats()['indexed'] == 1
+    assert duplicates.avoid_digest() == [taken[0]['title']]
+
+    # The fake's variants differ only by a number, so the rest now repeat a delivered one
+    pool.prune()
+    assert pool.entries == [] and pool.get_stats()['repeated'] == 2
+
+
+def test_refill_renders_the_batch_together_and_skips_failed_renders(pool, monkeypatch):
+    service = pool.render_service
+    batches = []
+    render_many = service.render_many
+
+    async def recording_render_many(jobs, scale=1.0):
+        batches.append((len(jobs), scale))
+        results = await render_many(jobs, scale)
+        return [RuntimeError('render failed') if content['title'] == 'სათაური 2' else result
+                for (content, _), result in zip(jobs, results)]
+
+    monkeypatch.setattr(service, 'render_many', recording_render_many)
+    assert asyncio.run(pool.refill()) == 2
+    assert sorted(batches) == [(3, 0.25), (3, 1.0)]
+    assert [entry['content']['title'] for entry in pool.entries] == ['სათაური 1', 'სათაური 3']
@@ -0,0 +1,126 @@
+"""
+Text Layout - Greedy word wrapping with memoized glyph advances
+"""
+from collections import OrderedDict, namedtuple
+
+# One laid out line: text, top-left position and advance width in pixels
+LineBox = namedtuple('LineBox', ['text', 'x', 'y', 'width'])
+
+
+def font_key(font):
+    """Identify a font by file and size (falls back to the object for bitmap fonts)"""
+    path = getattr(font, 'path', None)
+    size = getattr(font, 'size', None)
+    if path is None:
+        return ('object', id(font))
+    return (path, size)
+
+
+class TextLayout:
+    def __init__(self, max_layouts=512, max_fonts=32, max_words=4096):
+        self.max_layouts = max_layouts
+        self.max_fonts = max_fonts
+        self.max_words = max_words
+        self.advances = OrderedDict()  # font key -> {word: advance width}, least recently used font first
+        self.layouts = OrderedDict()  # (font key, text, max width) -> wrapped lines with widths
+
+    def advance(self, font, word):
+        """Get advance width of a word (or space), measured once per font
+
+        Keeps the max_fonts most recently used fonts (fit() probes many sizes
+        that are never drawn) and at most max_words words per font, dropping
+        the oldest measured word first.
+        """
+        key = font_key(font)
+        widths = self.advances.get(key)
+        if widths is None:
+            widths = self.advances[key] = {}
+            if len(self.advances) > self.max_fonts:
+                self.advances.popitem(last=False)
+        else:
+            self.advances.move_to_end(key)
+        width = widths.get(word)
+        if width is None:
+            width = font.getlength(word)
+            widths[word] = width
+            if len(widths) > self.max_words:
+                del widths[next(iter(widths))]
+        return width
+
+    def wrap(self, text, font, max_width):
+        """Wrap text greedily, returns list of (line, width) tuples
+
+        Line widths are sums of cached word and space advances, so every word
+        is measured once per font no matter how many lines are tried.
+        """
+        key = (font_key(font), text, max_width)
+        if key in self.layouts:
+            self.layouts.move_to_end(key)
+            return self.layouts[key]
+
+        space = self.advance(font, ' ')
+        lines = []
+        current_words = []
+        current_width = 0
+
+        for word in text.split():
+            word_width = self.advance(font, word)
+            test_width = current_width + space + word_width if current_words else word_width
+
+            if test_width <= max_width or not current_words:
+                current_words.append(word)
+                current_width = test_width
+            else:
+                lines.append((' '.join(current_words), current_width))
+                current_words = [word]
+                current_width = word_width
+
+        if current_words:
+            lines.append((' '.join(current_words), current_width))
+
+        self.layouts[key] = lines
+        if len(self.layouts) > self.max_layouts:
+            self.layouts.popitem(last=False)
+
+        return lines
+
+    def layout(self, text, font, max_width, y, line_height, x=0, center_width=None):
+        """Lay out text into LineBoxes starting at y
+
+        With center_width each line is centered in [0, center_width), otherwise
+        lines are left aligned at x.
+        """
+        boxes = []
+        for line, width in self.wrap(text, font, max_width):
+            if center_width is not None:
+                line_x = int(center_width - width) // 2
+            else:
+                line_x = x
+            boxes.append(LineBox(line, line_x, y, width))
+            y += line_height
+        return boxes
+
+    def fit(self, text, font_for_size, max_size, min_size, max_width, max_height, line_height):
+        """Binary-search the largest font size whose wrapped text fits the box
+
+        font_for_size(size) returns a font; line_height is given for max_size and
+        scaled with the size. Returns min_size if even that does not fit.
+        """
+        def fits(size):
+            lines = self.wrap(text, font_for_size(size), max_width)
+            block_height = len(lines) * round(line_height * size / max_size)
+            return block_height <= max_height and all(width <= max_width for _, width in lines)
+
+        if fits(max_size):
+            return max_size
+
+        best = min_size
+        low, high = min_size, max_size - 1
+        while low <= high:
+            size = (low + high) // 2
+            if fits(size):
+                best = size
+                low = size + 1
+            else:
+                high = size - 1
+        return best
@@ -0,0 +1,205 @@
+"""
+Variant Pool - Ready-made, already rendered variants for instant /generate and 🔄 regenerate
+
+A background producer keeps up to VARIANT_POOL_SIZE variants across
+format/tone/age buckets, generating only while the bot is idle. Entries
+expire after VARIANT_POOL_TTL_HOURS and are dropped when the learned
+format/tone weights drift more than VARIANT_POOL_PREFERENCE_DRIFT or a new
+style note is added since they were generated.
+
+Pool variants enter the duplicate index only when they are handed out, so
+entries that are never shown don't block their topics; an entry that
+repeats something delivered since it was generated is dropped instead.
+
+Every pool variant carries a pool_id field, the token its renders are looked
+up by once it is handed out. Rewrites (e.g. ✏️ edits) are new variants
+without one, so they never pick up a pool render.
+"""
+import asyncio
+import itertools
+import time
+from collections import OrderedDict
+import config
+
+
+def bucket_of(spec):
+    """Pool bucket of a variant spec"""
+    return (spec['format'], spec['tone'], spec['age_group'])
+
+
+def weight_drift(old, new):
+    """Total change (L1 distance) between two preference_weights() snapshots"""
+    drift = 0.0
+    for group in ('formats', 'tones'):
+        for key in set(old.get(group, {})) | set(new.get(group, {})):
+            drift += abs(old.get(group, {}).get(key, 0.0) - new.get(group, {}).get(key, 0.0))
+    return drift
+
+
+class VariantPool:
+    def __init__(self, creator, render_service, size=None, ttl=None, is_busy=None):
+        self.creator = creator
+        self.render_service = render_service
+        self.size = config.VARIANT_POOL_SIZE if size is None else size
+        self.ttl = config.VARIANT_POOL_TTL_HOURS * 3600 if ttl is None else ttl
+        self.is_busy = is_busy or (lambda: False)
+        self.entries = []
+        # Renders of variants handed out, looked up once by delivery (pool_id -> entry)
+        self.handed_out = OrderedDict()
+        self.ids = itertools.count(1)
+        self.wake = None
+        self.task = None
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidated = 0
+        self.repeated = 0
+        self.produced = 0
+
+    def _style_snapshot(self):
+        """What entries remember about preferences at generation time"""
+        return {
+            'weights': self.creator.preference_weights(),
+            'last_edit': (self.creator.preferences.get('custom_edits') or [None])[-1]
+        }
+
+    def _repeats_delivered(self, content):
+        """Whether a pool variant nearly repeats one delivered since it was generated"""
+        if not config.DUPLICATE_CHECK:
+            return False
+        duplicates = self.creator.duplicates
+        return duplicates.similarity(content) >= duplicates.threshold
+
+    def prune(self):
+        """Drop expired entries, ones generated for preferences that changed since and new repeats"""
+        now = time.time()
+        current = self._style_snapshot()
+        kept = []
+        for entry in self.entries:
+            if now - entry['created'] > self.ttl:
+                self.expired += 1
+            elif (entry['style']['last_edit'] != current['last_edit'] or
+                  weight_drift(entry['style']['weights'], current['weights']) > config.VARIANT_POOL_PREFERENCE_DRIFT):
+                self.invalidated += 1
+            elif self._repeats_delivered(entry['content']):
+                self.repeated += 1
+            else:
+                kept.append(entry)
+        self.entries = kept
+
+    def take(self, count=1):
+        """Take count ready variants (best bucket matches first), or [] if the pool can't cover them
+
+        Returns the variant contents; their renders are found with prerendered().
+        """
+        self.prune()
+        if count > len(self.entries):
+            self.misses += 1
+            self._wake()
+            return []
+
+        taken = []
+        for spec in self.creator.pick_variants(count):
+            entry = max(self.entries, key=lambda e: (
+                bucket_of(e['spec']) == bucket_of(spec), e['spec']['format'] == spec['format'], -e['created']
+            ))
+            self.entries.remove(entry)
+            taken.append(entry)
+            self.handed_out[entry['content']['pool_id']] = entry
+            if config.DUPLICATE_CHECK:
+                self.creator.duplicates.add(entry['content'])
+        while len(self.handed_out) > max(self.size, 1) * 2:
+            self.handed_out.popitem(last=False)
+
+        self.hits += 1
+        self._wake()
+        return [entry['content'] for entry in taken]
+
+    def prerendered(self, content, scale=1.0):
+        """Render of a variant handed out by take() at this scale, or None"""
+        entry = self.handed_out.get(content.get('pool_id'))
+        if entry is None:
+            return None
+        return entry['renders'].get(scale)
+
+    async def refill(self):
+        """Generate and render one batch of variants for the pool, returns how many were added"""
+        wanted = min(config.VARIANT_POOL_REFILL_BATCH, self.size - len(self.entries))
+        if wanted <= 0:
+            return 0
+
+        specs = self.creator.pick_variants(wanted)
+        style = self._style_snapshot()
+        pairs = await self.creator.agenerate_pairs(specs, record=False)
+
+        # Delivery renders previews; 🔄 regenerate sends full resolution. Every
+        # variant keeps one visual style across scales, the batch renders in parallel.
+        pairs = [(spec, content) for spec, content in pairs if content is not None]
+        jobs = [(content, self.render_service.resolve_style()) for _, content in pairs]
+        scales = sorted({1.0, config.PREVIEW_SCALE if config.PREVIEW_MODE else 1.0})
+        results = await asyncio.gather(*(self.render_service.render_many(jobs, scale) for scale in scales))
+        added = 0
+        for idx, (spec, content) in enumerate(pairs):
+            renders = {scale: by_scale[idx] for scale, by_scale in zip(scales, results)}
+            failed = [result for result in renders.values() if isinstance(result, Exception)]
+            if failed:
+                print(f"Error rendering pool variant: {failed[0]}")
+                continue
+            content['pool_id'] = next(self.ids)
+            self.entries.append({'content': content, 'spec': spec, 'renders': renders,
+                                 'style': style, 'created': time.time()})
+            added += 1
+        self.produced += added
+        return added
+
+    def _wake(self):
+        if self.wake is not None:
+            self.wake.set()
+
+    async def run(self):
+        """Producer loop: refill while the bot is idle, otherwise wait to be woken or re-check"""
+        self.wake = asyncio.Event()
+        while True:
+            self.prune()
+            added = 0
+            if len(self.entries) < self.size and not self.is_busy():
+                try:
+                    added = await self.refill()
+                except Exception as e:
+                    print(f"Error refilling variant pool: {e}")
+            if added:
+                continue
+            self.wake.clear()
+            try:
+                await asyncio.wait_for(self.wake.wait(), config.VARIANT_POOL_IDLE_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Start the background producer in the running event loop"""
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self.run())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def get_stats(self):
+        """Pool size, hit/miss counts and hit rate, expired/invalidated/repeated entries"""
+        requests = self.hits + self.misses
+        buckets = {}
+        for entry in self.entries:
+            buckets[entry['spec']['format']] = buckets.get(entry['spec']['format'], 0) + 1
+        return {
+            'size': len(self.entries),
+            'capacity': self.size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / requests, 2) if requests else 0.0,
+            'expired': self.expired,
+            'invalidated': self.invalidated,
+            'repeated': self.repeated,
+            'produced': self.produced,
+            'by_format': buckets
+        }